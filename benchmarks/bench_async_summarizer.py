@@ -0,0 +1,82 @@
+"""
+Drive the sync and async summarizer backends against the local stub LLM server.
+
+    python -m benchmarks.bench_async_summarizer --papers 50 --latency 0.3 --rate-limit-rate 0.1
+"""
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from modules.config import Config
+from modules.summarizer import create_summarizer
+from benchmarks.stub_llm_server import StubLLMServer
+
+
+def make_items(count: int) -> List[Tuple[Dict[str, Any], List[str]]]:
+    items = []
+    for i in range(count):
+        content = {
+            "title": f"Synthetic paper {i}",
+            "abstract": "We study a synthetic problem and report synthetic results. " * 5,
+            "category": "cs.LG"
+        }
+        items.append((content, [f"Representative chunk {j} of paper {i}. " * 20 for j in range(5)]))
+    return items
+
+
+def run_backend(config: Config, items: List[Tuple[Dict[str, Any], List[str]]], threads: int) -> Dict[str, Any]:
+    summarizer = create_summarizer(config)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        summaries = list(executor.map(lambda item: summarizer.generate_summary(*item), items))
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for summary in summaries if summary.get("tldr") == "Error generating summary.")
+    return {
+        "elapsed": elapsed,
+        "failed": failed,
+        "retries": getattr(summarizer, "retries", 0)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--papers", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.1)
+    parser.add_argument("--rpm", type=float, default=600)
+    args = parser.parse_args()
+
+    server = StubLLMServer(latency=args.latency, error_rate=args.error_rate,
+                           rate_limit_rate=args.rate_limit_rate, retry_after=0.2).start()
+    items = make_items(args.papers)
+
+    results = {}
+    for backend in ("sync", "async"):
+        config = Config("nonexistent-config.json")
+        config.api_base_url = server.base_url
+        config.api_key = "stub"
+        config.cache_dir = None
+        config.llm_backend = backend
+        config.rate_limit_pause = 0
+        config.requests_per_minute = args.rpm
+        config.llm_backoff_base = 0.1
+        results[backend] = run_backend(config, items, args.threads)
+
+    server.stop()
+
+    print(f"\n==== Summarizer backends ({args.papers} papers, stub latency {args.latency}s) ====")
+    print(f"{'Backend':<8} | {'Time (sec)':<10} | {'Papers/sec':<10} | {'Failed':<6} | {'Retries':<7}")
+    print("-" * 55)
+    for backend, data in results.items():
+        print(f"{backend:<8} | {data['elapsed']:<10.2f} | {args.papers / data['elapsed']:<10.2f} | "
+              f"{data['failed']:<6} | {data['retries']:<7}")
+    print(f"Stub server: {server.requests} requests, errors by status {server.errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare representative-chunk selectors on synthetic paper embeddings.
+
+Reports latency per paper for each selector and how many of its picks overlap
+with the original per-paper FAISS k-means selection.
+
+    python -m benchmarks.bench_chunk_selector --papers 500 --min-chunks 6 --max-chunks 60
+"""
+import time
+import argparse
+from typing import Callable, List
+
+import numpy as np
+
+from modules.chunk_selector import ChunkSelector, FaissKMeansSelector, KMeansSelector, MMRSelector
+
+
+def make_papers(count: int, min_chunks: int, max_chunks: int, dim: int, seed: int = 0) -> List[np.ndarray]:
+    # Each paper is a handful of topics with chunks scattered around them, like real sections
+    rng = np.random.RandomState(seed)
+    papers = []
+    for _ in range(count):
+        topics = rng.randn(rng.randint(2, 8), dim).astype(np.float32)
+        chunks = rng.randint(min_chunks, max_chunks + 1)
+        vectors = topics[rng.randint(len(topics), size=chunks)] + 0.4 * rng.randn(chunks, dim).astype(np.float32)
+        papers.append(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+    return papers
+
+
+def legacy_select(embeddings: np.ndarray, k: int) -> List[int]:
+    # get_representative_chunks as it was: unseeded FAISS k-means, set() order
+    import faiss
+
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    kmeans = faiss.Kmeans(embeddings.shape[1], k, niter=20)
+    kmeans.train(embeddings)
+    _, nearest = index.search(kmeans.centroids, 1)
+    indices = list(set([idx[0] for idx in nearest]))
+    if len(indices) < k:
+        remaining = [i for i in range(len(embeddings)) if i not in indices]
+        indices.extend(remaining[:k - len(indices)])
+    return indices
+
+
+def timed(select: Callable[[List[np.ndarray]], List[List[int]]], papers: List[np.ndarray]):
+    start = time.perf_counter()
+    selections = select(papers)
+    return time.perf_counter() - start, selections
+
+
+def overlap(selections: List[List[int]], reference: List[List[int]]) -> float:
+    shared = sum(len(set(a) & set(b)) for a, b in zip(selections, reference))
+    return shared / max(1, sum(len(b) for b in reference))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--papers", type=int, default=500)
+    parser.add_argument("--min-chunks", type=int, default=6)
+    parser.add_argument("--max-chunks", type=int, default=60)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    papers = make_papers(args.papers, args.min_chunks, args.max_chunks, args.dim)
+    k = args.k
+
+    def per_paper(selector: ChunkSelector):
+        return lambda batch: [selector.select_indices(e, k) for e in batch]
+
+    kmeans = KMeansSelector()
+    runs = [
+        ("faiss (original)", lambda batch: [legacy_select(e, k) for e in batch]),
+        ("faiss (seeded)", per_paper(FaissKMeansSelector())),
+        ("kmeans++", per_paper(kmeans)),
+        ("kmeans++ batched", lambda batch: kmeans.select_batch(batch, k)),
+        ("mmr 0.5", per_paper(MMRSelector(0.5))),
+        ("farthest point", per_paper(MMRSelector(1.0))),
+    ]
+
+    results = {}
+    for name, select in runs:
+        elapsed, selections = timed(select, papers)
+        _, again = timed(select, papers)
+        results[name] = (elapsed, selections, again == selections)
+
+    reference = results["faiss (original)"][1]
+    print(f"\n==== Chunk selectors ({args.papers} papers, {args.min_chunks}-{args.max_chunks} chunks, k={k}) ====")
+    print(f"{'Selector':<18} | {'ms/paper':<8} | {'overlap w/ faiss':<16} | {'deterministic':<13}")
+    print("-" * 66)
+    for name, (elapsed, selections, stable) in results.items():
+        print(f"{name:<18} | {1000 * elapsed / len(papers):<8.3f} | {overlap(selections, reference):<16.1%} | {str(stable):<13}")
+
+    batched, single = results["kmeans++ batched"][1], results["kmeans++"][1]
+    print(f"Batched matches per-paper kmeans++ on {sum(a == b for a, b in zip(batched, single))}/{len(papers)} papers")
+
+
+if __name__ == "__main__":
+    main()
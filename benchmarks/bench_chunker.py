@@ -0,0 +1,89 @@
+"""
+Check that the native OffsetChunker matches langchain's RecursiveCharacterTextSplitter
+on a sample corpus and compare their speed.
+
+Uses the papers in --input-dir when given (cleaned exactly as the pipeline does),
+otherwise a synthetic corpus. Exits non-zero if any paper chunks differently.
+
+    python -m benchmarks.bench_chunker --input-dir ../arvix_tmp --limit 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from typing import List
+
+from modules.text_processor import TextProcessor, load_langchain_splitter
+from modules.chunker import OffsetChunker
+
+WORDS = "the model data learning network results method approach performance task dataset".split()
+
+
+def load_corpus(input_dir: str, limit: int) -> List[str]:
+    from modules.codec import JsonCodec
+
+    codec = JsonCodec()
+    processor = TextProcessor()
+    texts = []
+    for filename in sorted(os.listdir(input_dir))[:limit]:
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(input_dir, filename), "rb") as f:
+            paper = codec.loads(f.read())
+        texts.append(processor.extract_paper_content(paper)["full_text"])
+    return texts
+
+
+def synthetic_corpus(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(50, 8000))]
+        # Sprinkle in paragraph breaks and overlong tokens to exercise every separator
+        for _ in range(rng.randint(0, 5)):
+            words.insert(rng.randrange(len(words)), rng.choice(["\n\n", "\n", "x" * rng.randint(900, 2500)]))
+        texts.append(" ".join(words))
+    return texts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input-dir", default=None)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.input_dir, args.limit) if args.input_dir else synthetic_corpus(args.limit)
+    total_mb = sum(len(text) for text in texts) / 1e6
+
+    reference = load_langchain_splitter()(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    native = OffsetChunker(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+
+    start = time.perf_counter()
+    expected = [reference.split_text(text) for text in texts]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    offsets = [native.split_offsets(text) for text in texts]
+    native_time = time.perf_counter() - start
+
+    mismatches = [
+        i for i, (text, spans, chunks) in enumerate(zip(texts, offsets, expected))
+        if [text[a:b] for a, b in spans] != chunks
+    ]
+
+    print(f"\n==== Chunker ({len(texts)} papers, {total_mb:.1f} MB) ====")
+    print(f"{'Splitter':<10} | {'Time (sec)':<10} | {'MB/sec':<8}")
+    print("-" * 34)
+    for name, elapsed in (("langchain", reference_time), ("native", native_time)):
+        print(f"{name:<10} | {elapsed:<10.3f} | {total_mb / elapsed:<8.1f}")
+    print(f"Mismatching papers: {len(mismatches)}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
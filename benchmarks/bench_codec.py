@@ -0,0 +1,101 @@
+"""
+Compare JSON backends on paper decoding and output encoding.
+
+Reports parse time for full decoding versus schema decoding of input papers,
+and encode time plus bytes written for pretty and compact output records.
+
+    python -m benchmarks.bench_codec --papers 2000 --sections 20
+"""
+import time
+import random
+import argparse
+from typing import Any, Dict, List
+
+from modules.codec import JsonCodec, msgspec, orjson
+
+WORDS = "model data learning network results method approach performance task dataset evaluation".split()
+
+
+def make_paper(index: int, sections: int, rng: random.Random) -> Dict[str, Any]:
+    def text(words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    return {
+        "category": "cs.LG",
+        "scraper_id": f"scraper-{index}",
+        "website_url": f"https://arxiv.org/abs/2503.{index:05d}",
+        "timestamp": "2025-03-26T22:04:35",
+        "author": "A. Author, B. Author",
+        "image_url": None,
+        "source_type": "arxiv",
+        "hyperlinks": [f"https://arxiv.org/pdf/2503.{index:05d}"],
+        "raw_html": "<html>" + text(400) + "</html>",
+        "data": {
+            "headline": text(10),
+            "description": text(200),
+            "content": text(600),
+            "sections": [{"title": text(4), "text": text(300)} for _ in range(sections)],
+            "references": [text(20) for _ in range(40)]
+        }
+    }
+
+
+def make_output(paper: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "category": paper["category"],
+        "scraper_id": paper["scraper_id"],
+        "website_url": paper["website_url"],
+        "timestamp": paper["timestamp"],
+        "author": paper["author"],
+        "image_url": paper["image_url"],
+        "source_type": paper["source_type"],
+        "hyperlinks": paper["hyperlinks"],
+        "data": {"headline": paper["data"]["headline"]},
+        "summary": {
+            "headline": paper["data"]["headline"],
+            "tldr": paper["data"]["description"][:200],
+            "key_points": [paper["data"]["description"][:100]] * 4,
+            "accessible_explanation": paper["data"]["content"][:1500]
+        }
+    }
+
+
+def timed(fn, items: List[Any]) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--papers", type=int, default=2000)
+    parser.add_argument("--sections", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    papers = [make_paper(i, args.sections, rng) for i in range(args.papers)]
+    outputs = [make_output(paper) for paper in papers]
+    raw_papers = [JsonCodec("json").dumps(paper, compact=True) for paper in papers]
+    input_mb = sum(len(raw) for raw in raw_papers) / 1e6
+
+    backends = ["json"] + [name for name, module in (("orjson", orjson), ("msgspec", msgspec)) if module]
+
+    print(f"\n==== JSON codecs ({args.papers} papers, {input_mb:.1f} MB input) ====")
+    print(f"{'Backend':<8} | {'loads (s)':<9} | {'schema (s)':<10} | {'pretty (s)':<10} | "
+          f"{'pretty MB':<9} | {'compact (s)':<11} | {'compact MB':<10}")
+    print("-" * 86)
+    for backend in backends:
+        codec = JsonCodec(backend)
+        loads_time = timed(codec.loads, raw_papers)
+        schema_time = timed(codec.decode_paper, raw_papers)
+        pretty_time = timed(lambda record: codec.dumps(record, compact=False), outputs)
+        compact_time = timed(lambda record: codec.dumps(record, compact=True), outputs)
+        pretty_mb = sum(len(codec.dumps(record, compact=False)) for record in outputs) / 1e6
+        compact_mb = sum(len(codec.dumps(record, compact=True)) for record in outputs) / 1e6
+        print(f"{backend:<8} | {loads_time:<9.3f} | {schema_time:<10.3f} | {pretty_time:<10.3f} | "
+              f"{pretty_mb:<9.2f} | {compact_time:<11.3f} | {compact_mb:<10.2f}")
+
+
+if __name__ == "__main__":
+    main()
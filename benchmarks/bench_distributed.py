@@ -0,0 +1,165 @@
+"""
+Run several nodes in distributed mode against one shared directory.
+
+Writes a synthetic corpus, as JSON files or JSONL shards, starts one stub LLM
+server and launches --nodes separate `python main.py` processes with
+distributed=true and their own node_id. --kill-after SIGKILLs the first node
+mid-run, so the others have to reclaim its leases once they expire. The report
+checks that every paper has an output, counts papers processed more than once
+and gives each node's share of the work.
+
+    python -m benchmarks.bench_distributed --nodes 3 --papers 60 --kill-after 5 --lease-ttl 4
+    python -m benchmarks.bench_distributed --io-mode jsonl --shards 12 --set embedding_model_name=...
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+from typing import Any, Dict, List
+
+from benchmarks.bench_e2e import arxiv_corpus, parse_overrides
+from benchmarks.stub_llm_server import StubLLMServer
+from modules.config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_corpus(config: Config, papers: List[Dict[str, Any]], shards: int) -> List[str]:
+    """
+    Write the papers to config.input_dir and return the ids their outputs will carry.
+    """
+    os.makedirs(config.input_dir)
+    if config.io_mode != "jsonl":
+        ids = [f"paper_{i:05d}.json" for i in range(len(papers))]
+        for paper_id, paper in zip(ids, papers):
+            with open(os.path.join(config.input_dir, paper_id), "w") as f:
+                json.dump(paper, f)
+        return ids
+
+    ids = []
+    per_shard = -(-len(papers) // shards)
+    for shard in range(shards):
+        name = f"input-{shard:04d}.jsonl"
+        chunk = papers[shard * per_shard:(shard + 1) * per_shard]
+        with open(os.path.join(config.input_dir, name), "w") as f:
+            for paper in chunk:
+                f.write(json.dumps(paper) + "\n")
+        ids.extend(f"{name}:{line}" for line in range(1, len(chunk) + 1))
+    return ids
+
+
+def collect_outputs(config: Config) -> Counter:
+    """
+    How many outputs each paper id has.
+    """
+    outputs: Counter = Counter()
+    for entry in os.scandir(config.output_dir):
+        if entry.name.startswith(".") or ".tmp." in entry.name:
+            continue
+        if config.io_mode != "jsonl":
+            outputs[entry.name] += 1
+            continue
+        with open(entry.path) as f:
+            for line in f:
+                if line.strip():
+                    outputs[json.loads(line)["id"]] += 1
+    return outputs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.json", help="base config, paths are replaced by a temp dir")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--papers", type=int, default=60)
+    parser.add_argument("--words", type=int, default=1500, help="body words per paper")
+    parser.add_argument("--io-mode", choices=("files", "jsonl"), default="files")
+    parser.add_argument("--shards", type=int, default=12, help="input shards in jsonl mode")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean stub LLM latency in seconds")
+    parser.add_argument("--lease-ttl", type=float, default=6.0)
+    parser.add_argument("--kill-after", type=float, default=None, help="SIGKILL the first node after this many seconds")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="config override, VALUE parsed as JSON when possible")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config = Config(args.config)
+        for key, value in parse_overrides(args.set).items():
+            if not hasattr(config, key):
+                raise SystemExit(f"Unknown config key: {key}")
+            setattr(config, key, value)
+
+        config.io_mode = args.io_mode
+        config.input_dir = os.path.join(work_dir, "input")
+        config.output_dir = os.path.join(work_dir, "output")
+        config.cache_dir = os.path.join(work_dir, "summary_cache")
+        config.embedding_cache_dir = os.path.join(work_dir, "embedding_cache")
+        config.vector_index_dir = os.path.join(work_dir, "vector_index")
+        config.dedup_index_path = None
+        config.force_regenerate = False
+        config.rate_limit_pause = 0
+        config.distributed = True
+        config.lease_ttl = args.lease_ttl
+        config.lease_heartbeat_interval = args.lease_ttl / 4
+        config.lease_poll_interval = max(0.5, args.lease_ttl / 4)
+
+        ids = write_corpus(config, arxiv_corpus(args.papers, args.words), args.shards)
+        server = StubLLMServer(latency=args.latency).start()
+        config.api_base_url = server.base_url
+
+        nodes = []
+        start = time.perf_counter()
+        try:
+            for i in range(args.nodes):
+                config.node_id = f"node{i}"
+                config_path = os.path.join(work_dir, f"config-{config.node_id}.json")
+                config.save_to_file(config_path)
+                log = open(os.path.join(work_dir, f"{config.node_id}.log"), "w+")
+                process = subprocess.Popen([sys.executable, "main.py", "--config", config_path],
+                                           cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+                nodes.append((config.node_id, process, log))
+
+            if args.kill_after is not None:
+                time.sleep(args.kill_after)
+                nodes[0][1].send_signal(signal.SIGKILL)
+                print(f"Killed {nodes[0][0]} after {args.kill_after:g}s")
+
+            for _, process, _ in nodes:
+                process.wait()
+            elapsed = time.perf_counter() - start
+        finally:
+            for _, process, _ in nodes:
+                if process.poll() is None:
+                    process.kill()
+            server.stop()
+
+        print(f"\n==== Distributed run ({args.nodes} nodes, {args.papers} papers, {args.io_mode}, "
+              f"lease ttl {args.lease_ttl:g}s) ====")
+        print(f"{'Node':<8} | {'Exit':<5} | {'Processed':<9} | {'Reclaimed':<9}")
+        print("-" * 42)
+        for node_id, process, log in nodes:
+            log.seek(0)
+            output = log.read()
+            log.close()
+            # Skipped papers count as successful in the run stats, so count the papers this node summarized
+            print(f"{node_id:<8} | {process.returncode:<5} | {output.count('Successfully processed'):<9} | "
+                  f"{output.count('Reclaiming expired lease'):<9}")
+
+        outputs = collect_outputs(config)
+        missing = [paper_id for paper_id in ids if not outputs[paper_id]]
+        repeated = sum(count - 1 for count in outputs.values() if count > 1)
+        print(f"\nWall: {elapsed:.2f}s, {len(ids) / elapsed:.2f} papers/sec")
+        print(f"Outputs: {len(ids) - len(missing)}/{len(ids)} papers, missing {len(missing)}, "
+              f"written more than once {repeated}")
+        print(f"LLM requests: {server.requests} for {len(ids)} papers")
+        if missing:
+            print(f"Missing: {', '.join(missing[:10])}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+End-to-end benchmark: run ResearchSummarizerApp over a synthetic arXiv-style corpus
+against the local stub LLM server.
+
+Each stage of the app is timed per call, and every paper from mark_started to its
+output being saved, in threaded and pipeline mode alike. The report gives calls,
+busy time, throughput and p50/p95/p99 latency per stage, end-to-end papers/sec and
+the peak RSS of the process. --output writes the same numbers as JSON, and
+--baseline compares this run against such a file.
+
+    python -m benchmarks.bench_e2e --papers 200 --words 4000 --latency 0.3 --error-rate 0.02 \\
+        --set pipeline_mode=true --set rate_limit_pause=0 --output results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.bench_embedding import WORDS
+from benchmarks.stub_llm_server import StubLLMServer
+from modules.config import Config
+
+SECTION_TITLES = ("Introduction", "Related Work", "Method", "Experiments", "Results", "Discussion", "Conclusion")
+
+
+def arxiv_corpus(count: int, words: int, duplicate_rate: float = 0.0, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Scraped-arXiv-shaped records with about `words` words of body text each,
+    a duplicate_rate share of them being copies of an earlier paper.
+    """
+    rng = random.Random(seed)
+
+    def text(length: int) -> str:
+        sentences = []
+        while length > 0:
+            size = min(length, rng.randint(8, 30))
+            sentences.append(" ".join(rng.choice(WORDS) for _ in range(size)).capitalize() + ".")
+            length -= size
+        return " ".join(sentences)
+
+    papers = []
+    for i in range(count):
+        if papers and rng.random() < duplicate_rate:
+            papers.append(json.loads(json.dumps(rng.choice(papers))))
+            continue
+
+        section_words = max(1, words // len(SECTION_TITLES))
+        papers.append({
+            "data": {
+                "headline": f"Synthetic paper {i}: " + text(8).rstrip("."),
+                "description": text(180),
+                "sections": [{"title": title, "text": text(section_words)} for title in SECTION_TITLES]
+            },
+            "author": "A. Author",
+            "category": rng.choice(["cs.LG", "cs.CL", "cs.CV", "stat.ML"]),
+            "scraper_id": f"synthetic-{i}",
+            "website_url": f"https://arxiv.org/abs/0000.{i:05d}",
+            "timestamp": "2024-01-01T00:00:00"
+        })
+    return papers
+
+
+class StageTimer:
+    """
+    Per-call durations of wrapped methods, grouped by stage name.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {}
+        self.started: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def wrap(self, owner: Any, method: str, stage: str) -> None:
+        original = getattr(owner, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.durations.setdefault(stage, []).append(elapsed)
+
+        # Set on the instance, so the app's own self.<method> calls go through it too
+        setattr(owner, method, timed)
+
+    def track_papers(self, file_manager: Any) -> None:
+        mark_started = file_manager.mark_started
+        save_processed_paper = file_manager.save_processed_paper
+
+        def started(filename: str) -> None:
+            self.started[filename] = time.perf_counter()
+            mark_started(filename)
+
+        def saved(filename: str, *args, **kwargs) -> bool:
+            result = save_processed_paper(filename, *args, **kwargs)
+            start = self.started.pop(filename, None)
+            if result and start is not None:
+                with self._lock:
+                    self.latencies.append(time.perf_counter() - start)
+            return result
+
+        file_manager.mark_started = started
+        file_manager.save_processed_paper = saved
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    values = np.asarray(durations, dtype=np.float64)
+    if len(values) == 0:
+        return {"calls": 0, "busy_sec": 0.0, "per_sec": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+    busy = float(values.sum())
+    return {
+        "calls": int(len(values)),
+        "busy_sec": round(busy, 4),
+        # Calls per second of time spent in the stage, summed over threads
+        "per_sec": round(len(values) / busy, 2) if busy > 0 else 0.0,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2)
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def parse_overrides(pairs: List[str]) -> Dict[str, Any]:
+    overrides = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return overrides
+
+
+def run_benchmark(args: argparse.Namespace, work_dir: str) -> Dict[str, Any]:
+    config = Config(args.config)
+    for key, value in parse_overrides(args.set).items():
+        if not hasattr(config, key):
+            raise SystemExit(f"Unknown config key: {key}")
+        setattr(config, key, value)
+
+    config.input_dir = os.path.join(work_dir, "input")
+    config.output_dir = os.path.join(work_dir, "output")
+    config.cache_dir = os.path.join(work_dir, "summary_cache")
+    config.embedding_cache_dir = os.path.join(work_dir, "embedding_cache") if config.embedding_cache_dir else None
+    config.vector_index_dir = os.path.join(work_dir, "vector_index")
+    config.dedup_index_path = None
+    config.force_regenerate = False
+
+    os.makedirs(config.input_dir)
+    papers = arxiv_corpus(args.papers, args.words, duplicate_rate=args.duplicate_rate, seed=args.seed)
+    for i, paper in enumerate(papers):
+        with open(os.path.join(config.input_dir, f"paper_{i:05d}.json"), "w") as f:
+            json.dump(paper, f)
+    corpus_mb = sum(entry.stat().st_size for entry in os.scandir(config.input_dir)) / 1e6
+
+    server = StubLLMServer(latency=args.latency, error_rate=args.error_rate,
+                           rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after).start()
+    try:
+        config.api_base_url = server.base_url
+        config_path = os.path.join(work_dir, "config.json")
+        config.save_to_file(config_path)
+
+        from main import ResearchSummarizerApp
+        app = ResearchSummarizerApp(config_path)
+        # Load the embedding model and the OpenAI client outside the timing
+        app.embedding_engine.encode(["warm up"])
+        app.summarizer.client
+
+        timer = StageTimer()
+        timer.track_papers(app.file_manager)
+        stages: List[tuple] = [
+            (app.file_manager, "load_paper", "load"),
+            (app, "prepare_paper", "clean_chunk"),
+            (app, "find_duplicate", "dedup"),
+            (app.embedding_engine, "embed_chunks", "embed"),
+            (app, "index_chunks", "index"),
+            (app, "select_chunks", "select"),
+            (app, "select_chunks_batch", "select"),
+            (app.summarizer, "generate_summary", "summarize"),
+            (app.file_manager, "save_processed_paper", "save"),
+        ]
+        if app.process_pool is not None:
+            stages.append((app.process_pool, "prepare", "load_clean_chunk"))
+        for owner, method, stage in stages:
+            timer.wrap(owner, method, stage)
+
+        start = time.perf_counter()
+        stats = app.run()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "params": {
+            "papers": args.papers,
+            "words": args.words,
+            "duplicate_rate": args.duplicate_rate,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "corpus_mb": round(corpus_mb, 2),
+            "overrides": parse_overrides(args.set)
+        },
+        "end_to_end": {
+            "wall_sec": round(elapsed, 3),
+            "papers_per_sec": round(stats.get("successful", 0) / elapsed, 2) if elapsed > 0 else 0.0,
+            "mb_per_sec": round(corpus_mb / elapsed, 3) if elapsed > 0 else 0.0,
+            "latency": summarize(timer.latencies),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "llm_requests": server.requests,
+            "llm_errors": {str(status): count for status, count in server.errors.items()},
+            "stats": stats
+        },
+        "stages": {stage: summarize(durations) for stage, durations in timer.durations.items()}
+    }
+
+
+def print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    params, e2e = results["params"], results["end_to_end"]
+    print(f"\n==== End-to-end ({params['papers']} papers, ~{params['words']} words, "
+          f"{params['corpus_mb']} MB, LLM latency {params['latency']}s) ====")
+    print(f"{'Stage':<17} | {'Calls':<6} | {'Busy (sec)':<10} | {'Per sec':<9} | {'p50 ms':<9} | {'p95 ms':<9} | {'p99 ms':<9}")
+    print("-" * 86)
+    rows = list(results["stages"].items()) + [("paper (e2e)", e2e["latency"])]
+    for stage, row in rows:
+        print(f"{stage:<17} | {row['calls']:<6} | {row['busy_sec']:<10.3f} | {row['per_sec']:<9.1f} | "
+              f"{row['p50_ms']:<9.1f} | {row['p95_ms']:<9.1f} | {row['p99_ms']:<9.1f}")
+
+    stats = e2e["stats"]
+    print(f"\nWall: {e2e['wall_sec']:.2f}s, {e2e['papers_per_sec']:.2f} papers/sec, {e2e['mb_per_sec']:.3f} MB/sec")
+    print(f"Successful: {stats.get('successful', 0)}/{stats.get('total', 0)}, "
+          f"LLM requests: {e2e['llm_requests']}, errors: {e2e['llm_errors'] or 'none'}")
+    print(f"Peak RSS: {e2e['peak_rss_mb']:.1f} MB")
+
+    if baseline is not None:
+        old = baseline["end_to_end"]
+        print(f"\n==== Against baseline ({baseline['meta'].get('commit')}) ====")
+        for label, new_value, old_value in (
+            ("papers/sec", e2e["papers_per_sec"], old["papers_per_sec"]),
+            ("p95 latency ms", e2e["latency"]["p95_ms"], old["latency"]["p95_ms"]),
+            ("peak RSS MB", e2e["peak_rss_mb"], old["peak_rss_mb"]),
+        ):
+            change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+            print(f"{label:<15} {old_value:>10.2f} -> {new_value:<10.2f} ({change:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.json", help="base config, paths are replaced by a temp dir")
+    parser.add_argument("--papers", type=int, default=100)
+    parser.add_argument("--words", type=int, default=3000, help="body words per paper")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean stub LLM latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="config override, VALUE parsed as JSON when possible")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument("--baseline", default=None, help="results JSON of an earlier run to compare with")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmark(args, work_dir)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
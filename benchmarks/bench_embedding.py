@@ -0,0 +1,90 @@
+"""
+Compare chunk embedding throughput of the per-chunk loop against the batched service.
+
+Run from the repository root:
+    python -m benchmarks.bench_embedding --papers 32 --chunks-per-paper 20 --threads 4
+"""
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from modules.config import Config
+from modules.embedding_engine import EmbeddingEngine
+
+WORDS = (
+    "model data learning network training results method approach performance task "
+    "dataset evaluation neural graph attention layer feature representation loss accuracy "
+    "transformer optimization gradient benchmark baseline experiment analysis proposed"
+).split()
+
+
+def make_papers(num_papers: int, chunks_per_paper: int, chunk_words: int, seed: int = 0) -> List[List[str]]:
+    rng = random.Random(seed)
+    return [
+        [" ".join(rng.choice(WORDS) for _ in range(chunk_words)) for _ in range(chunks_per_paper)]
+        for _ in range(num_papers)
+    ]
+
+
+def bench_loop(engine: EmbeddingEngine, papers: List[List[str]], threads: int) -> float:
+    # Previous behaviour: one encode call per chunk, each worker hitting the model directly
+    def embed_paper(chunks: List[str]) -> None:
+        for chunk in chunks:
+            engine.embedding_model.encode(chunk)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(embed_paper, papers))
+    return time.perf_counter() - start
+
+
+def bench_batched(engine: EmbeddingEngine, papers: List[List[str]], threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(engine.embed_chunks, papers))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--papers", type=int, default=32)
+    parser.add_argument("--chunks-per-paper", type=int, default=20)
+    parser.add_argument("--chunk-words", type=int, default=160)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--max-wait", type=float, default=None)
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    config.use_embedding_batcher = True
+    # The corpus is the same on every run, so cached vectors would turn repeat runs into cache hits
+    config.embedding_cache_dir = None
+    if args.batch_size is not None:
+        config.embedding_batch_size = args.batch_size
+    if args.max_wait is not None:
+        config.embedding_batch_max_wait = args.max_wait
+
+    engine = EmbeddingEngine(config)
+    papers = make_papers(args.papers, args.chunks_per_paper, args.chunk_words)
+    total_chunks = sum(len(chunks) for chunks in papers)
+
+    # Warm up the model so load time is not counted
+    engine.encode(papers[0][:2])
+
+    loop_time = bench_loop(engine, papers, args.threads)
+    batched_time = bench_batched(engine, papers, args.threads)
+    engine.close()
+
+    print(f"\n==== Embedding throughput ({total_chunks} chunks, {args.threads} threads) ====")
+    print(f"{'Mode':<12} | {'Time (sec)':<10} | {'Chunks/sec':<10}")
+    print("-" * 38)
+    for mode, elapsed in (("loop", loop_time), ("batched", batched_time)):
+        print(f"{mode:<12} | {elapsed:<10.2f} | {total_chunks / elapsed:<10.1f}")
+    print(f"Speedup: {loop_time / batched_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
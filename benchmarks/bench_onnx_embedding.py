@@ -0,0 +1,79 @@
+"""
+Check the ONNX embedding backend against the fp32 SentenceTransformer model and compare CPU throughput.
+
+Agreement is the cosine similarity between each chunk's ONNX vector and its
+reference vector; the run fails if any chunk falls below --min-cosine.
+
+    python -m benchmarks.bench_onnx_embedding --chunks 512 --threads 4
+"""
+import sys
+import time
+import argparse
+from typing import Tuple
+
+import numpy as np
+
+from benchmarks.bench_embedding import make_papers
+from modules.config import Config
+from modules.onnx_embedder import OnnxEmbedder
+
+
+def timed_encode(model, texts, batch_size: int) -> Tuple[np.ndarray, float]:
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm up outside the timing
+    start = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=batch_size)
+    return np.asarray(embeddings, dtype=np.float32), time.perf_counter() - start
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return (a * b).sum(axis=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--chunk-words", type=int, default=160)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="torch and onnxruntime threads, 0 for their defaults")
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    texts = make_papers(1, args.chunks, args.chunk_words)[0]
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    reference, reference_time = timed_encode(
+        SentenceTransformer(config.embedding_model_name, device="cpu"), texts, args.batch_size
+    )
+    rows = [("torch fp32", reference_time, 1.0, 1.0)]
+
+    failed = False
+    for name, quantize in (("onnx fp32", False), ("onnx int8", True)):
+        model = OnnxEmbedder(config.embedding_model_name, model_dir=config.onnx_model_dir,
+                             quantize=quantize, intra_op_threads=args.threads)
+        embeddings, elapsed = timed_encode(model, texts, args.batch_size)
+        agreement = cosine(embeddings, reference)
+        rows.append((name, elapsed, float(agreement.mean()), float(agreement.min())))
+        failed = failed or float(agreement.min()) < args.min_cosine
+
+    print(f"\n==== {config.embedding_model_name} on CPU ({len(texts)} chunks, {args.threads or 'default'} threads) ====")
+    print(f"{'Backend':<11} | {'Time (sec)':<10} | {'Chunks/sec':<10} | {'Speedup':<7} | {'Mean cos':<8} | {'Min cos':<8}")
+    print("-" * 70)
+    for name, elapsed, mean_cos, min_cos in rows:
+        print(f"{name:<11} | {elapsed:<10.2f} | {len(texts) / elapsed:<10.1f} | "
+              f"{reference_time / elapsed:<7.2f} | {mean_cos:<8.4f} | {min_cos:<8.4f}")
+
+    if failed:
+        print(f"Agreement below {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare load/clean/chunk throughput of a thread pool against the process pool.
+
+Writes a synthetic corpus to a temporary input directory, then prepares every
+paper with threads (the GIL-bound default) and with PreprocessPool workers.
+
+    python -m benchmarks.bench_process_pool --papers 400 --workers 8
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_text_processor import synthetic_corpus
+from modules.codec import JsonCodec
+from modules.config import Config
+from modules.process_pool import PreprocessPool
+from modules.text_processor import TextProcessor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--papers", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as input_dir:
+        filenames = []
+        for i, paper in enumerate(synthetic_corpus(args.papers)):
+            filenames.append(f"paper_{i:05d}.json")
+            with open(os.path.join(input_dir, filenames[-1]), "w") as f:
+                json.dump(paper, f)
+        total_mb = sum(os.path.getsize(os.path.join(input_dir, name)) for name in filenames) / 1e6
+
+        config = Config(os.path.join(input_dir, "missing.json"))
+        config.input_dir = input_dir
+        config.process_pool_workers = args.workers
+
+        codec = JsonCodec(config.json_backend)
+        processor = TextProcessor(config.chunk_size, config.chunk_overlap)
+
+        def prepare_in_thread(filename: str) -> int:
+            with open(os.path.join(input_dir, filename), "rb") as f:
+                content = processor.extract_paper_content(codec.decode_paper(f.read()))
+            return len(processor.chunk_paper(content["full_text"]))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            thread_chunks = sum(executor.map(prepare_in_thread, filenames))
+        thread_time = time.perf_counter() - start
+
+        pool = PreprocessPool(config)
+        pool.prepare(filenames[0])  # start the workers outside the timing
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(pool.prepare, filenames))
+        pool_time = time.perf_counter() - start
+        pool.close()
+        pool_chunks = sum(len(result[2]) for result in results if result is not None)
+
+    print(f"\n==== Preprocessing ({args.papers} papers, {total_mb:.1f} MB, {args.workers} workers) ====")
+    print(f"{'Mode':<14} | {'Time (sec)':<10} | {'Papers/sec':<10} | {'MB/sec':<8} | {'Chunks':<8}")
+    print("-" * 62)
+    for name, elapsed, chunks in (("threads", thread_time, thread_chunks), ("processes", pool_time, pool_chunks)):
+        print(f"{name:<14} | {elapsed:<10.3f} | {args.papers / elapsed:<10.1f} | {total_mb / elapsed:<8.1f} | {chunks:<8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Load test for the HTTP service (`python main.py serve`) against the local stub LLM.
+
+Starts the service in-process on a free port, then sends --requests requests to
+/summarize and to /embed at each concurrency level and reports throughput,
+latency percentiles and 503s shed by the bounded queues. For /embed it also
+counts the model's encode calls, which shows how many requests each shared
+batch served.
+
+    python -m benchmarks.bench_service --requests 200 --concurrency 1,8,32,128 --latency 0.3 \\
+        --set service_queue_size=16
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.bench_e2e import arxiv_corpus, parse_overrides
+from benchmarks.stub_llm_server import StubLLMServer
+from modules.config import Config
+
+
+async def load(url: str, payloads: List[bytes], concurrency: int) -> Dict[str, Any]:
+    import aiohttp
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    pending = iter(payloads)
+
+    async def worker(session: "aiohttp.ClientSession") -> None:
+        for payload in pending:
+            start = time.perf_counter()
+            async with session.post(url, data=payload, headers={"Content-Type": "application/json"}) as response:
+                await response.read()
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            if response.status == 200:
+                latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(payloads),
+        "ok": statuses.get(200, 0),
+        "shed": statuses.get(503, 0),
+        "errors": sum(count for status, count in statuses.items() if status not in (200, 503)),
+        "per_sec": round(statuses.get(200, 0) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.json", help="base config, paths are replaced by a temp dir")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and concurrency level")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--words", type=int, default=1500, help="body words per paper")
+    parser.add_argument("--chunks", type=int, default=8, help="chunks per /embed request")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean stub LLM latency in seconds")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="config override, VALUE parsed as JSON when possible")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config = Config(args.config)
+        for key, value in parse_overrides(args.set).items():
+            if not hasattr(config, key):
+                raise SystemExit(f"Unknown config key: {key}")
+            setattr(config, key, value)
+        config.input_dir = os.path.join(work_dir, "input")
+        config.output_dir = os.path.join(work_dir, "output")
+        # Every request is a fresh paper, so caches would only hide the work being measured
+        config.cache_dir = None
+        config.embedding_cache_dir = None
+        config.dedup_enabled = False
+        config.rate_limit_pause = 0
+
+        server = StubLLMServer(latency=args.latency).start()
+        config.api_base_url = server.base_url
+        config_path = os.path.join(work_dir, "config.json")
+        config.save_to_file(config_path)
+
+        from main import ResearchSummarizerApp
+        from modules.service import SummaryService
+        app = ResearchSummarizerApp(config_path)
+        service = SummaryService(app, host="127.0.0.1", port=0)
+        thread = threading.Thread(target=asyncio.run, args=(service.serve(),), name="service", daemon=True)
+        thread.start()
+        service.ready.wait()
+        base_url = f"http://127.0.0.1:{service.port}"
+
+        # Count encode calls on the loaded model to see how requests were batched
+        model = app.embedding_engine.embedding_model
+        encode_calls = [0]
+        encode = model.encode
+
+        def counted(*encode_args, **encode_kwargs):
+            encode_calls[0] += 1
+            return encode(*encode_args, **encode_kwargs)
+
+        model.encode = counted
+
+        papers = arxiv_corpus(args.requests * len(levels), args.words, seed=1)
+        rows = []
+        try:
+            for i, concurrency in enumerate(levels):
+                batch = papers[i * args.requests:(i + 1) * args.requests]
+                summarize_payloads = [json.dumps(paper).encode("utf-8") for paper in batch]
+                embed_payloads = [json.dumps({"chunks": [section["text"] for section in paper["data"]["sections"]][:args.chunks]
+                                              + [f"request {i}-{n}"]}).encode("utf-8")
+                                  for n, paper in enumerate(batch)]
+
+                requests_before = server.requests
+                row = asyncio.run(load(f"{base_url}/summarize", summarize_payloads, concurrency))
+                rows.append(dict(row, endpoint="summarize", concurrency=concurrency,
+                                 llm_requests=server.requests - requests_before))
+
+                encode_calls[0] = 0
+                row = asyncio.run(load(f"{base_url}/embed", embed_payloads, concurrency))
+                rows.append(dict(row, endpoint="embed", concurrency=concurrency, encode_calls=encode_calls[0]))
+        finally:
+            service.shutdown()
+            thread.join()
+            server.stop()
+
+    print(f"\n==== Service load test ({args.requests} requests per level, LLM latency {args.latency}s) ====")
+    print(f"{'Endpoint':<10} | {'Conc':<5} | {'OK':<5} | {'503':<5} | {'Err':<4} | {'Req/s':<8} | "
+          f"{'p50 ms':<8} | {'p95 ms':<8} | {'p99 ms':<8} | {'Calls':<6}")
+    print("-" * 92)
+    for row in rows:
+        calls = row.get("encode_calls", row.get("llm_requests"))
+        print(f"{row['endpoint']:<10} | {row['concurrency']:<5} | {row['ok']:<5} | {row['shed']:<5} | "
+              f"{row['errors']:<4} | {row['per_sec']:<8.1f} | {row['p50_ms']:<8.1f} | {row['p95_ms']:<8.1f} | "
+              f"{row['p99_ms']:<8.1f} | {calls:<6}")
+    print("\nCalls are LLM requests for summarize and model encode calls for embed.")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
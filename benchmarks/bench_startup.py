@@ -0,0 +1,114 @@
+"""
+Measure start-up cost: what importing main pulls in, and how long a re-run takes
+when every input paper has already been summarized.
+
+The import report is parsed from `python -X importtime`. The cached re-run writes
+a synthetic corpus, marks every paper processed, then times a fresh interpreter
+that builds the app and runs it. None of the heavy dependencies (torch,
+sentence_transformers, openai, faiss, langchain) should be imported by that run.
+
+    python -m benchmarks.bench_startup --papers 500 --top 15
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import List, Tuple
+
+from benchmarks.bench_text_processor import synthetic_corpus
+from modules.config import Config
+from modules.file_manager import FileManager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("torch", "sentence_transformers", "openai", "faiss", "langchain", "langchain_text_splitters")
+
+CACHED_RUN = """
+import sys, time, json
+start = time.perf_counter()
+from main import ResearchSummarizerApp
+imported = time.perf_counter()
+stats = ResearchSummarizerApp(sys.argv[1]).run()
+done = time.perf_counter()
+heavy = sorted(name for name in sys.modules if name.split(".")[0] in {heavy!r})
+print(json.dumps({{"import": imported - start, "run": done - imported, "stats": stats, "heavy": heavy}}))
+"""
+
+
+def import_times(module: str) -> List[Tuple[int, int, str]]:
+    """
+    (self us, cumulative us, name) for every module imported by `import module`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--papers", type=int, default=500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = import_times("main")
+    total_us = next(cumulative for _, cumulative, name in rows if name.strip() == "main")
+    print(f"\n==== python -X importtime -c 'import main' ({total_us / 1e6:.3f} sec) ====")
+    print(f"{'Cumulative (ms)':<16} | {'Self (ms)':<10} | Module")
+    print("-" * 62)
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"{cumulative_us / 1e3:<16.1f} | {self_us / 1e3:<10.1f} | {name}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config = Config(os.path.join(work_dir, "missing.json"))
+        config.input_dir = os.path.join(work_dir, "input")
+        config.output_dir = os.path.join(work_dir, "output")
+        config.cache_dir = os.path.join(work_dir, "cache")
+        config.embedding_cache_dir = os.path.join(work_dir, "embedding_cache")
+        config.vector_index_dir = os.path.join(work_dir, "vector_index")
+        os.makedirs(config.input_dir)
+        os.makedirs(config.output_dir)
+
+        # Every paper already has its summary on disk, as after a completed run
+        file_manager = FileManager(config)
+        summary = {"tldr": "Cached.", "motivation": "", "method": "", "result": "", "conclusion": ""}
+        for i, paper in enumerate(synthetic_corpus(args.papers)):
+            filename = f"paper_{i:05d}.json"
+            with open(os.path.join(config.input_dir, filename), "w") as f:
+                json.dump(paper, f)
+            file_manager.save_processed_paper(filename, paper, summary)
+        file_manager.close()
+
+        config_path = os.path.join(work_dir, "config.json")
+        config.save_to_file(config_path)
+
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", CACHED_RUN.format(heavy=HEAVY_MODULES), config_path],
+            cwd=work_dir, env=env, capture_output=True, text=True, check=True
+        )
+        wall = time.perf_counter() - start
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    print(f"\n==== Fully cached re-run ({args.papers} papers) ====")
+    print(f"{'Wall (sec)':<11} | {'Import (sec)':<12} | {'Run (sec)':<10} | {'Skipped':<8} | Heavy imports")
+    print("-" * 70)
+    print(f"{wall:<11.3f} | {report['import']:<12.3f} | {report['run']:<10.3f} | "
+          f"{report['stats']['successful']:<8} | {', '.join(report['heavy']) or 'none'}")
+
+    if report["heavy"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
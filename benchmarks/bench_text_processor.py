@@ -0,0 +1,138 @@
+"""
+Check that single-pass paper extraction matches the previous multi-pass cleaning
+and compare their throughput, in-process and as batches across a process pool.
+
+Uses the papers in --input-dir when given, otherwise a synthetic corpus full of
+escape sequences, symbols and empty sections. Exits non-zero on any mismatch.
+
+    python -m benchmarks.bench_text_processor --input-dir ../arvix_tmp --workers 4
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+from modules.text_processor import TextProcessor, extract_papers
+
+WORDS = "the model data learning network results (method) approach: 95% task; \"dataset\" x-y".split()
+NOISE = ["\\n", "\\r", "\\t", "\n", "\t", "  ", "@", "#", "é", "–", "{", "}", "\\", "$", "<br>", " "]
+
+
+def legacy_clean_text(text: str) -> str:
+    # clean_text as it was before the single-pass pattern
+    if not text or not isinstance(text, str):
+        return ""
+    text = text.replace("\\n", " ").replace("\\r", " ").replace("\\t", " ")
+    cleaned = re.sub(r'[^\w\s.,!?()-:;"\'%]', ' ', text)
+    return re.sub(r'\s+', ' ', cleaned).strip()
+
+
+def legacy_full_text(paper: Dict[str, Any]) -> str:
+    data = paper.get('data', {})
+    abstract = legacy_clean_text(data['description']) if data.get('description') else ""
+    parts = [abstract] if abstract else []
+    if isinstance(data.get('content'), str):
+        parts.append(legacy_clean_text(data['content']))
+    if isinstance(data.get('sections'), list):
+        for section in data['sections']:
+            if isinstance(section, dict) and 'text' in section:
+                parts.append(legacy_clean_text(section['text']))
+            elif isinstance(section, str):
+                parts.append(legacy_clean_text(section))
+    return " ".join(parts)
+
+
+def load_corpus(input_dir: str, limit: int) -> List[Dict[str, Any]]:
+    from modules.codec import JsonCodec
+
+    codec = JsonCodec()
+    papers = []
+    for filename in sorted(os.listdir(input_dir))[:limit]:
+        if filename.endswith(".json"):
+            with open(os.path.join(input_dir, filename), "rb") as f:
+                papers.append(codec.decode_paper(f.read()))
+    return papers
+
+
+def synthetic_corpus(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+
+    def text(words: int) -> str:
+        return "".join(rng.choice(WORDS) + (rng.choice(NOISE) if rng.random() < 0.05 else " ") for _ in range(words))
+
+    def section() -> Any:
+        roll = rng.random()
+        if roll < 0.05:
+            return {"text": rng.choice(["", None, "@@ \\n ##", 42])}
+        if roll < 0.15:
+            return text(rng.randint(20, 200))
+        return {"title": text(4), "text": text(rng.randint(50, 1500))}
+
+    papers = []
+    for _ in range(count):
+        data = {
+            "headline": text(8),
+            "description": rng.choice([text(150), "", "\\n\\t"]),
+            "sections": [section() for _ in range(rng.randint(0, 25))]
+        }
+        if rng.random() < 0.7:
+            data["content"] = rng.choice([text(400), "", "  "])
+        papers.append({"data": data, "author": "A. Author", "category": "cs.LG"})
+    return papers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input-dir", default=None)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    papers = load_corpus(args.input_dir, args.limit) if args.input_dir else synthetic_corpus(args.limit)
+    processor = TextProcessor()
+
+    raw_mb = sum(
+        sum(len(part) for part in processor._body_parts(paper.get("data", {})) if isinstance(part, str))
+        + len(paper.get("data", {}).get("description") or "")
+        for paper in papers
+    ) / 1e6
+
+    start = time.perf_counter()
+    expected = [legacy_full_text(paper) for paper in papers]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extracted = processor.extract_batch(papers)
+    single_time = time.perf_counter() - start
+
+    batches = [papers[i:i + args.batch_size] for i in range(0, len(papers), args.batch_size)]
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(extract_papers, batches[:args.workers]))  # warm up the workers
+        start = time.perf_counter()
+        pooled = [item for batch in executor.map(extract_papers, batches) for item in batch]
+        pool_time = time.perf_counter() - start
+
+    mismatches = sum(
+        1 for want, got, got_pooled in zip(expected, extracted, pooled)
+        if got["full_text"] != want or got_pooled["full_text"] != want
+    )
+
+    print(f"\n==== Text extraction ({len(papers)} papers, {raw_mb:.1f} MB raw text) ====")
+    print(f"{'Path':<22} | {'Time (sec)':<10} | {'MB/sec':<8}")
+    print("-" * 46)
+    for name, elapsed in (("legacy multi-pass", legacy_time), ("single-pass", single_time),
+                          (f"process pool x{args.workers}", pool_time)):
+        print(f"{name:<22} | {elapsed:<10.3f} | {raw_mb / elapsed:<8.1f}")
+    print(f"Mismatching papers: {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
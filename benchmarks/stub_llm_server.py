@@ -0,0 +1,233 @@
+"""
+Local stub of an OpenAI-compatible chat completions endpoint.
+
+Point config.api_base_url at http://127.0.0.1:<port>/v1 to exercise the summarizer
+without a real provider. Latency and the share of 429/500 responses are configurable.
+Batched prompts ("### Paper <id>" blocks) get a JSON array, and --batch-drop-rate
+leaves entries out of it to exercise the re-issue path. Requests with "stream" are
+answered as server-sent events, and --malformed-rate replaces the JSON with prose.
+
+    python -m benchmarks.stub_llm_server --port 8901 --latency 0.5 --error-rate 0.05
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+PAPER_PATTERN = re.compile(r"^### Paper (\S+)$", re.MULTILINE)
+MALFORMED_TEXT = "Sure! Here is an engaging, accurate and layered summary of the paper you sent. " * 4
+# Characters per streamed delta, roughly one token
+STREAM_PIECE_CHARS = 4
+
+
+def prompt_title(prompt: str) -> str:
+    if "Title:" in prompt:
+        return prompt.split("Title:", 1)[1].split("\n", 1)[0].strip()
+    return "Untitled"
+
+
+def make_summary(title: str) -> Dict[str, Any]:
+    return {
+        "headline": title,
+        "tldr": f"A short summary of {title}.",
+        "context": "Stub context explaining why the work matters.",
+        "methodology": "Stub description of the methods used.",
+        "key_points": ["First finding.", "Second finding.", "Third finding."],
+        "accessible_explanation": "Stub explanation for a general audience.",
+        "significance": "Stub description of the broader impact.",
+        "questions_raised": ["What comes next?", "Does it generalize?"]
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubLLMServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        stub = self.server
+        stub.record_request()
+        time.sleep(max(0.0, random.gauss(stub.latency, stub.latency * 0.2)))
+
+        roll = random.random()
+        if roll < stub.rate_limit_rate:
+            stub.record_error(429)
+            self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                            {"Retry-After": str(stub.retry_after)})
+            return
+        if roll < stub.rate_limit_rate + stub.error_rate:
+            stub.record_error(500)
+            self._send_json(500, {"error": {"message": "internal error", "type": "server_error"}})
+            return
+
+        messages = request.get("messages", [])
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+
+        parts = PAPER_PATTERN.split(prompt)
+        if random.random() < stub.malformed_rate:
+            content = MALFORMED_TEXT
+        elif len(parts) > 1:
+            # parts is [preamble, id, block, id, block, ...]
+            entries = [dict(make_summary(prompt_title(block)), paper_id=paper_id)
+                       for paper_id, block in zip(parts[1::2], parts[2::2])
+                       if random.random() >= stub.batch_drop_rate]
+            content = "```json\n" + json.dumps(entries, indent=2) + "\n```"
+        else:
+            content = "```json\n" + json.dumps(make_summary(prompt_title(prompt)), indent=2) + "\n```"
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+        if request.get("stream"):
+            include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+            self._send_stream(request, content, usage if include_usage else None)
+            return
+
+        self._send_json(200, {
+            "id": f"stub-{stub.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    def _send_stream(self, request: Dict[str, Any], content: str, usage: Optional[Dict[str, int]]) -> None:
+        stub = self.server
+        base = {
+            "id": f"stub-{stub.requests}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "stub")
+        }
+        pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+        events = [dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}])
+                  for piece in pieces]
+        events.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if usage is not None:
+            events.append(dict(base, choices=[], usage=usage))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for event in events:
+                self.wfile.write(b"data: " + json.dumps(event).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+                if stub.token_latency:
+                    time.sleep(stub.token_latency)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early
+            stub.record_abort()
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering chat completions with a canned summary."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0,
+                 batch_drop_rate: float = 0.0, malformed_rate: float = 0.0, token_latency: float = 0.0):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.batch_drop_rate = batch_drop_rate
+        self.malformed_rate = malformed_rate
+        self.token_latency = token_latency
+
+        self.requests = 0
+        self.errors: Dict[int, int] = {}
+        self.aborted_streams = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_error(self, status: int) -> None:
+        with self._lock:
+            self.errors[status] = self.errors.get(status, 0) + 1
+
+    def record_abort(self) -> None:
+        with self._lock:
+            self.aborted_streams += 1
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean response latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--batch-drop-rate", type=float, default=0.0,
+                        help="share of papers left out of batched responses")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of responses that are not JSON")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed deltas")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.latency, args.error_rate,
+                           args.rate_limit_rate, args.retry_after, args.batch_drop_rate,
+                           args.malformed_rate, args.token_latency)
+    print(f"Stub LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
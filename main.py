@@ -1,18 +1,32 @@
 import os
 import json
-import logging
 import time
-from typing import Dict, List, Any
+import asyncio
+import signal
+import logging
+import random
+import argparse
+import itertools
+import threading
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+import numpy as np
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
 
 
 from modules.config import Config
 from modules.logger import setup_logger
 from modules.text_processor import TextProcessor
 from modules.embedding_engine import EmbeddingEngine
-from modules.summarizer import Summarizer
+from modules.summarizer import create_summarizer, is_fallback_summary
 from modules.file_manager import FileManager
+from modules.pipeline import StagedPipeline
+from modules.dedup_index import DedupIndex
+from modules.vector_index import VectorIndex
+from modules.process_pool import PreprocessPool
+from modules.metrics import create_metrics
+from modules.model_comparison import ModelComparison
+from modules.input_watcher import InputWatcher
 
 logger = setup_logger("main")
 
@@ -20,89 +34,301 @@ class ResearchSummarizerApp:
     def __init__(self, config_path: str = "config.json"):
 
         self.config = Config(config_path)
+        if self.config.distributed:
+            self._use_node_stores()
 
         os.makedirs(self.config.output_dir, exist_ok=True)
         if self.config.cache_dir:
             os.makedirs(self.config.cache_dir, exist_ok=True)
         
+        # Stage timings, LLM usage and cache gauges, a no-op unless metrics_enabled is set
+        self.metrics = create_metrics(self.config)
+        
         self.file_manager = FileManager(self.config)
         self.text_processor = TextProcessor(
             chunk_size=self.config.chunk_size, 
-            chunk_overlap=self.config.chunk_overlap
+            chunk_overlap=self.config.chunk_overlap,
+            splitter=self.config.text_splitter,
+            length_unit=self.config.chunk_length_unit
+        )
+        # Loading, cleaning and chunking (and optionally encoding) in worker processes
+        self.process_pool = None
+        if self.config.process_pool_workers > 0:
+            self.process_pool = PreprocessPool(self.config, on_read=self.file_manager.input_read)
+        self.embedding_engine = EmbeddingEngine(
+            self.config,
+            encode_pool=self.process_pool if self.config.process_pool_embedding else None
+        )
+        # With a process pool more threads are in flight than max_workers, but LLM calls stay capped at it
+        self._llm_slots = threading.BoundedSemaphore(max(1, self.config.max_workers))
+        self.summarizer = create_summarizer(self.config, metrics=self.metrics)
+
+        # Near-duplicate papers (re-versions, mirrors) reuse the summary of the first copy
+        self.dedup_index = None
+        if self.config.dedup_enabled:
+            dedup_path = self.config.dedup_index_path or os.path.join(
+                self.config.cache_dir or self.config.output_dir, "dedup_index.sqlite3"
+            )
+            self.dedup_index = DedupIndex(
+                dedup_path,
+                threshold=self.config.dedup_threshold,
+                num_perm=self.config.dedup_num_perm,
+                shingle_size=self.config.dedup_shingle_size,
+                codec=self.file_manager.codec
+            )
+
+        self.metrics.add_collector(self._cache_gauges)
+
+        # Corpus-wide chunk index for semantic search, opened on first use since it needs
+        # the embedding dimension and a fully cached run never touches it
+        self._vector_index = None
+        self._vector_index_lock = threading.Lock()
+
+    def _use_node_stores(self) -> None:
+        """
+        Give this node its own caches, dedup index and vector index under its node_id.
+        """
+        # SQLite locking cannot be relied on over a shared filesystem and the vector index
+        # has a single writer, so nodes never share these stores. The id has to stay the
+        # same across restarts for them (and the node's run manifest) to be reused.
+        node_id = self.config.node_id
+        if not node_id:
+            raise ValueError("distributed needs a node_id that stays the same across runs, "
+                             "each node keeps its caches, indexes and run manifest under it")
+        if self.config.cache_dir:
+            self.config.cache_dir = os.path.join(self.config.cache_dir, node_id)
+        if self.config.embedding_cache_dir:
+            self.config.embedding_cache_dir = os.path.join(self.config.embedding_cache_dir, node_id)
+        if self.config.dedup_index_path:
+            root, ext = os.path.splitext(self.config.dedup_index_path)
+            self.config.dedup_index_path = f"{root}.{node_id}{ext}"
+        elif not self.config.cache_dir:
+            self.config.dedup_index_path = os.path.join(self.config.output_dir, f"dedup_index.{node_id}.sqlite3")
+        self.config.vector_index_dir = os.path.join(self.config.vector_index_dir, node_id)
+
+    @property
+    def vector_index(self) -> Optional[VectorIndex]:
+        if self._vector_index is None and self.config.vector_index_enabled:
+            dimension = self.embedding_engine.dimension
+            with self._vector_index_lock:
+                if self._vector_index is None:
+                    self._vector_index = VectorIndex(
+                        self.config.vector_index_dir,
+                        self.config.embedding_model_name,
+                        dimension,
+                        index_type=self.config.vector_index_type,
+                        nlist=self.config.vector_index_nlist,
+                        pq_m=self.config.vector_index_pq_m,
+                        nprobe=self.config.vector_index_nprobe,
+                        train_size=self.config.vector_index_train_size,
+                        save_every=self.config.vector_index_save_every
+                    )
+        return self._vector_index
+        
+    def _cache_gauges(self) -> Dict[str, float]:
+        gauges = {f"embedding_cache_{name}": value for name, value in self.embedding_engine.cache_stats().items()}
+        if self.dedup_index is not None:
+            gauges["dedup_hits"] = self.dedup_index.hits
+        return gauges
+
+    def prepare_paper(self, filename: str, paper: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], List[str]]]:
+        """
+        Extract and chunk a loaded paper, returns None if it has too little text.
+        """
+        paper_content = self.text_processor.extract_paper_content(paper)
+        
+        if not paper_content.get("full_text") or len(paper_content.get("full_text", "")) < 100:
+            logger.warning(f"Skipping {filename} - insufficient text content")
+            return None
+        
+        full_text = paper_content["full_text"]
+        chunks = self.text_processor.chunk_paper(full_text)
+        return paper_content, chunks
+
+    def load_and_prepare(self, filename: str, record: Optional[bytes] = None) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], List[str]]]:
+        """
+        Load a paper then extract and chunk it, in the process pool when configured.
+        Returns (paper, paper_content, chunks) or None.
+        """
+        if self.process_pool is not None:
+            return self.process_pool.prepare(filename, record)
+        
+        paper = self.file_manager.load_paper(filename, record)
+        if not paper:
+            logger.warning(f"Failed to load {filename}")
+            return None
+        
+        prepared = self.prepare_paper(filename, paper)
+        if prepared is None:
+            return None
+        return (paper,) + prepared
+
+    def find_duplicate(self, filename: str, paper_content: Dict[str, Any]) -> Tuple[Optional[np.ndarray], Optional[Dict[str, Any]]]:
+        """
+        Look a prepared paper up in the dedup index, returns (signature, reused summary or None).
+        """
+        if self.dedup_index is None:
+            return None, None
+        
+        signature = self.dedup_index.signature(paper_content.get("full_text", ""))
+        if signature is None or self.config.force_regenerate:
+            return signature, None
+        
+        match = self.dedup_index.query(signature, filename)
+        if match is None:
+            return signature, None
+        
+        duplicate_of, similarity, summary = match
+        logger.info(f"Reusing summary of {duplicate_of} for near-duplicate {filename} (similarity {similarity:.2f})")
+        return signature, summary
+
+    def remember_summary(self, filename: str, signature: Optional[np.ndarray], summary: Dict[str, Any]) -> None:
+        if self.dedup_index is not None and signature is not None and not is_fallback_summary(summary):
+            self.dedup_index.add(filename, signature, summary)
+
+    def index_chunks(self, filename: str, paper_content: Dict[str, Any], chunks: List[str], embeddings: np.ndarray) -> None:
+        if self.vector_index is not None:
+            self.vector_index.add_paper(filename, paper_content.get("title", ""), chunks, embeddings)
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Semantic search over the chunks of processed papers.
+        """
+        if self.vector_index is None:
+            logger.warning("Vector index is disabled, nothing to search")
+            return []
+        return self.vector_index.search(self.embedding_engine.encode([query])[0], k)
+
+    def rebuild_index(self, compact: bool = True) -> Dict[str, int]:
+        if self.vector_index is None:
+            logger.warning("Vector index is disabled, nothing to rebuild")
+            return {}
+        return self.vector_index.rebuild(compact=compact)
+
+    def select_chunks(self, chunks: List[str], embeddings: np.ndarray) -> List[str]:
+        # top k representative chunks
+        num_representative_chunks = min(5, len(chunks)) 
+        return self.embedding_engine.get_representative_chunks(
+            chunks, embeddings, num_chunks=num_representative_chunks
         )
-        self.embedding_engine = EmbeddingEngine(self.config)
-        self.summarizer = Summarizer(self.config)
+
+    def select_chunks_batch(self, chunk_lists: List[List[str]], embeddings_list: List[np.ndarray]) -> List[List[str]]:
+        """
+        select_chunks for several papers at once.
+        """
+        return self.embedding_engine.get_representative_chunks_batch(chunk_lists, embeddings_list, num_chunks=5)
         
-    def process_file(self, filename: str) -> bool:
+    def warm_up(self) -> None:
+        """
+        Load the embedding model and build the LLM client before the first paper arrives.
+        """
+        self.embedding_engine.encode(["warm up"])
+        self.summarizer.client
+
+    def summarize_paper(self, paper: Dict[str, Any], name: str = "request") -> Optional[Dict[str, Any]]:
+        """
+        Summary of an already loaded paper, None if it has too little text. Nothing is written
+        to output_dir or the indexes, so requests from other services leave the corpus alone.
+        """
+        prepared = self.prepare_paper(name, paper)
+        if prepared is None:
+            return None
+
+        paper_content, chunks = prepared
+        _, summary = self.find_duplicate(name, paper_content)
+        if summary is not None:
+            return summary
+
+        embeddings = self.embedding_engine.embed_chunks(chunks)
+        representative_chunks = self.select_chunks(chunks, embeddings)
+        with self._llm_slots:
+            return self.summarizer.generate_summary(paper_content, representative_chunks)
+
+    def process_file(self, filename: str, record: Optional[bytes] = None) -> bool:
         try:
             if self.file_manager.should_skip_file(filename):
                 logger.info(f"Skipping {filename} - already processed")
                 return True
             
-            paper = self.file_manager.load_paper(filename)
-            if not paper:
-                logger.warning(f"Failed to load {filename}")
-                return False
-            
-            paper_content = self.text_processor.extract_paper_content(paper)
+            self.file_manager.mark_started(filename)
+            self.metrics.start_paper(filename)
             
-            if not paper_content.get("full_text") or len(paper_content.get("full_text", "")) < 100:
-                logger.warning(f"Skipping {filename} - insufficient text content")
+            with self.metrics.span("load", filename):
+                loaded = self.load_and_prepare(filename, record)
+            if loaded is None:
+                self.file_manager.mark_failed(filename)
+                self.metrics.finish_paper(filename, "failed")
                 return False
             
-            full_text = paper_content["full_text"]
-            chunks = self.text_processor.chunk_paper(full_text)
-            embeddings = self.embedding_engine.embed_chunks(chunks)
-            
-            # top k representative chunks
-            num_representative_chunks = min(5, len(chunks)) 
-            representative_chunks = self.embedding_engine.get_representative_chunks(
-                chunks, embeddings, num_chunks=num_representative_chunks
-            )
+            paper, paper_content, chunks = loaded
+            with self.metrics.span("dedup", filename):
+                signature, summary = self.find_duplicate(filename, paper_content)
             
-            summary = self.summarizer.generate_summary(paper_content, representative_chunks)
+            if summary is None:
+                with self.metrics.span("embed", filename):
+                    embeddings = self.embedding_engine.embed_chunks(chunks)
+                with self.metrics.span("index", filename):
+                    self.index_chunks(filename, paper_content, chunks, embeddings)
+                with self.metrics.span("select", filename):
+                    representative_chunks = self.select_chunks(chunks, embeddings)
+                
+                with self._llm_slots:
+                    with self.metrics.span("summarize", filename):
+                        summary = self.summarizer.generate_summary(paper_content, representative_chunks)
+                self.remember_summary(filename, signature, summary)
             
-            self.file_manager.save_processed_paper(filename, paper, summary)
+            with self.metrics.span("save", filename):
+                saved = self.file_manager.save_processed_paper(filename, paper, summary)
+            if not saved:
+                self.file_manager.mark_failed(filename)
+                self.metrics.finish_paper(filename, "failed")
+                return False
             
             logger.info(f"Successfully processed {filename}")
+            self.metrics.finish_paper(filename, "fallback" if is_fallback_summary(summary) else "ok")
             return True
             
         except Exception as e:
             logger.error(f"Error processing {filename}: {str(e)}")
+            self.file_manager.mark_failed(filename)
+            self.metrics.finish_paper(filename, "failed")
             return False
     
     def run(self) -> Dict[str, Any]:
 
-        json_files = self.file_manager.get_input_files()
-        total_files = len(json_files)
-        
-        if total_files == 0:
-            logger.warning(f"No JSON files found in {self.config.input_dir}")
-            return {"total": 0, "successful": 0, "failed": 0, "completion_percentage": 0}
+        if self.file_manager.leases is not None:
+            # Other nodes take part of the corpus, so the total is only known at the end
+            work = self.file_manager.iter_leased_work()
+            total_files = None
+        elif self.file_manager.streaming:
+            # Shards are streamed, so the total is only known at the end
+            work = self.file_manager.iter_input_records()
+            total_files = None
+        else:
+            json_files = self.file_manager.get_input_files()
+            total_files = len(json_files)
             
-        logger.info(f"Found {total_files} JSON files to process")
-        
-        successful = 0
-        failed = 0
-        
-        # (IMPROVEMENT) Process files with parallel execution
-        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
-            futures = {executor.submit(self.process_file, filename): filename for filename in json_files}
-            
-            with tqdm(total=len(futures), desc="Processing papers") as pbar:
-                for future in as_completed(futures):
-                    try:
-                        result = future.result()
-                        if result:
-                            successful += 1
-                        else:
-                            failed += 1
-                    except Exception as e:
-                        logger.error(f"Error in future: {str(e)}")
-                        failed += 1
-                    finally:
-                        pbar.update(1)
+            if total_files == 0:
+                logger.warning(f"No JSON files found in {self.config.input_dir}")
+                return {"total": 0, "successful": 0, "failed": 0, "completion_percentage": 0}
+                
+            logger.info(f"Found {total_files} JSON files to process")
+            work = ((filename, None) for filename in json_files)
         
+        successful, failed = self._process(work, total=total_files)
+        return self._finish(successful, failed)
+
+    def _process(self, work: Iterable[Tuple[str, Optional[bytes]]], total: Optional[int] = None) -> Tuple[int, int]:
+        if self.config.pipeline_mode:
+            return StagedPipeline(self).run(work, total=total)
+        return self._run_threaded(work, total=total)
+
+    def _finish(self, successful: int, failed: int) -> Dict[str, Any]:
+        """
+        Flush outputs, release the models' workers and collect the run stats.
+        """
+        self.file_manager.close()
+        total_files = successful + failed
 
         stats = {
             "total": total_files,
@@ -110,65 +336,259 @@ class ResearchSummarizerApp:
             "failed": failed,
             "completion_percentage": round((successful / total_files) * 100, 2) if total_files > 0 else 0
         }
+
+        self.embedding_engine.close()
+        self.summarizer.close()
+        if self.process_pool is not None:
+            self.process_pool.close()
+        cache_stats = self.embedding_engine.cache_stats()
+        if cache_stats:
+            stats["embedding_cache"] = cache_stats
+        if self.dedup_index is not None:
+            stats["duplicates_reused"] = self.dedup_index.hits
+        if self._vector_index is not None:
+            self._vector_index.save()
+            stats["vector_index"] = self._vector_index.stats()
+        if self.metrics.enabled:
+            stats["stages"] = self.metrics.stage_summary()
+            self.metrics.close()
         
         logger.info(f"Processing complete. Stats: {stats}")
         return stats
 
-    def test_models(self, test_file: str) -> Dict[str, Any]:
+    def watch(self, stop: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
-        To test different models
+        Daemon mode: process new and changed files in input_dir as they arrive, until stop is set.
+
+        The models and clients stay loaded between batches. A batch in flight when
+        stop is set is finished first, then everything is closed as after run().
         """
-        models = [
-            {
-                "name": "meta-llama/llama-3.3-70b-instruct:free",
-                "description": "Llama 3.3 70B"
-            }
-        ]
+        if self.file_manager.streaming or self.file_manager.leases is not None:
+            raise ValueError("Watch mode needs io_mode 'files' and distributed turned off")
+        stop = stop or threading.Event()
+
+        self.warm_up()
+        watcher = InputWatcher(
+            self.config.input_dir,
+            backend=self.config.watch_backend,
+            poll_interval=self.config.watch_poll_interval,
+            debounce=self.config.watch_debounce,
+            max_wait=self.config.watch_max_wait,
+            batch_size=self.config.watch_batch_size
+        )
+        # Started before the catch-up pass, so files arriving during it are reported too
+        watcher.start()
+
+        successful = failed = batches = 0
+        try:
+            if self.config.watch_initial_scan:
+                existing = sorted(self.file_manager.get_input_files())
+                logger.info(f"Checking {len(existing)} files already in {self.config.input_dir}")
+                for start in range(0, len(existing), self.config.watch_batch_size):
+                    if stop.is_set():
+                        break
+                    done, errors = self._process_batch(existing[start:start + self.config.watch_batch_size])
+                    successful, failed = successful + done, failed + errors
+
+            while not stop.is_set():
+                batch = watcher.next_batch(stop)
+                if batch:
+                    done, errors = self._process_batch(batch)
+                    successful, failed, batches = successful + done, failed + errors, batches + 1
+        finally:
+            watcher.stop()
+            logger.info(f"Stopping after {batches} batches")
+            stats = self._finish(successful, failed)
+
+        stats["batches"] = batches
+        return stats
+
+    def _process_batch(self, filenames: List[str]) -> Tuple[int, int]:
+        start = time.perf_counter()
+        successful, failed = self._process(((filename, None) for filename in filenames), total=len(filenames))
+
+        # Send queued embeddings and summaries and persist the caches and index, so the batch is durable
+        self.embedding_engine.close()
+        self.summarizer.close()
+        if self._vector_index is not None:
+            self._vector_index.save()
+        logger.info(f"Batch of {len(filenames)} files: {successful} successful, {failed} failed "
+                    f"in {time.perf_counter() - start:.1f}s")
+        return successful, failed
+
+    def _run_threaded(self, work: Iterable[Tuple[str, Optional[bytes]]], total: Optional[int] = None) -> Tuple[int, int]:
+        successful = 0
+        failed = 0
         
-        results = {}
-        original_model = self.config.model_name
+        def collect(futures, return_when):
+            nonlocal successful, failed
+            done, not_done = wait(futures, return_when=return_when)
+            for future in done:
+                try:
+                    result = future.result()
+                    if result:
+                        successful += 1
+                    else:
+                        failed += 1
+                except Exception as e:
+                    logger.error(f"Error in future: {str(e)}")
+                    failed += 1
+                finally:
+                    pbar.update(1)
+            return not_done
         
-        for model in models:
-            model_name = model["name"]
-            description = model["description"]
-            
-            print(f"\nTesting model: {description} ({model_name})")
+        # (IMPROVEMENT) Process files with parallel execution, keeping a bounded window in flight
+        workers = self.config.max_workers
+        if self.process_pool is not None:
+            # Enough threads to keep every worker process busy
+            workers = max(workers, self.process_pool.workers)
+        max_pending = max(1, workers) * 4
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            with tqdm(total=total, desc="Processing papers") as pbar:
+                pending = set()
+                for filename, record in work:
+                    pending.add(executor.submit(self.process_file, filename, record))
+                    if len(pending) >= max_pending:
+                        pending = collect(pending, FIRST_COMPLETED)
+                if pending:
+                    collect(pending, ALL_COMPLETED)
 
-            self.config.model_name = model_name
-            self.summarizer = Summarizer(self.config) 
-            
-            start_time = time.time()
-            result = self.process_file(test_file)
-            end_time = time.time()
-            
-            results[model_name] = {
-                "success": result,
-                "time_taken": round(end_time - start_time, 2),
-                "description": description
-            }
-            
-            print(f"Result: {'Success' if result else 'Failed'}")
-            print(f"Time taken: {results[model_name]['time_taken']} seconds")
+        return successful, failed
+
+    def sample_papers(self, test_files: Optional[List[str]] = None, sample_size: int = 20,
+                      seed: int = 0) -> List[Tuple[Dict[str, Any], List[str]]]:
+        """
+        (paper_content, representative_chunks) for test_files, or a random sample of the input papers.
+        """
+        if test_files:
+            work = [(filename, None) for filename in test_files]
+        elif self.file_manager.streaming:
+            # Shards can only be read in order
+            work = list(itertools.islice(self.file_manager.iter_input_records(), sample_size))
+        else:
+            json_files = self.file_manager.get_input_files()
+            work = [(filename, None) for filename in random.Random(seed).sample(json_files, min(sample_size, len(json_files)))]
         
-        self.config.model_name = original_model
-        self.summarizer = Summarizer(self.config)
+        papers = []
+        for filename, record in work:
+            loaded = self.load_and_prepare(filename, record)
+            if loaded is None:
+                continue
+            _, paper_content, chunks = loaded
+            embeddings = self.embedding_engine.embed_chunks(chunks)
+            papers.append((paper_content, self.select_chunks(chunks, embeddings)))
+        return papers
+    
+    def test_models(self, test_files: Optional[List[str]] = None, models: Optional[List[Dict[str, Any]]] = None,
+                    sample_size: Optional[int] = None, use_cache: bool = False) -> Dict[str, Any]:
+        """
+        Compare models on the same sample of papers, see ModelComparison. Models default to config.compare_models.
+        """
+        models = models or self.config.compare_models
+        papers = self.sample_papers(test_files, sample_size or self.config.compare_sample_size)
+        if not papers:
+            logger.warning("No papers to compare models on")
+            return {}
+        
+        print(f"\nComparing {len(models)} models on {len(papers)} papers")
+        comparison = ModelComparison(self.config, models, concurrency=self.config.compare_concurrency, use_cache=use_cache)
+        results = comparison.run(papers)
+        recommended = comparison.recommend(results, self.config.compare_min_valid_rate)
+        for model_name, data in results.items():
+            data["recommended"] = model_name == recommended
 
         print("\n==== Model Comparison ====")
-        print(f"{'Model':<20} | {'Success':<10} | {'Time (sec)':<10}")
-        print("-" * 45)
+        print(f"{'Model':<20} | {'Valid':<6} | {'p50 (s)':<7} | {'p95 (s)':<7} | {'p99 (s)':<7} | "
+              f"{'Tok/s':<7} | {'$/paper':<9} | {'Errors':<6} | {'Cache':<8}")
+        print("-" * 100)
         
         for model_name, data in results.items():
-            print(f"{data['description']:<20} | {str(data['success']):<10} | {data['time_taken']:<10}")
+            cache = f"{data['cached']} hits" if data["cache"] == "used" else data["cache"]
+            print(f"{data['description'][:20]:<20} | {data['valid_rate']:<6.0%} | {data['p50_seconds']:<7.2f} | "
+                  f"{data['p95_seconds']:<7.2f} | {data['p99_seconds']:<7.2f} | {data['tokens_per_second']:<7.1f} | "
+                  f"{data['cost_per_paper']:<9.5f} | {data['errors']:<6} | {cache:<8}")
+        
+        if recommended:
+            print(f"\nFastest model with at least {self.config.compare_min_valid_rate:.0%} valid JSON: "
+                  f"{results[recommended]['description']} ({recommended})")
+        else:
+            print(f"\nNo model reached {self.config.compare_min_valid_rate:.0%} valid JSON")
             
         return results
 
 
 if __name__ == "__main__":
-    app = ResearchSummarizerApp()
-    
-    stats = app.run()
+    parser = argparse.ArgumentParser(description="Summarize research papers and search the processed corpus.")
+    parser.add_argument("--config", default="config.json", help="Path to the JSON config file")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("run", help="Process the papers in input_dir (default)")
+    search_parser = subparsers.add_parser("search", help="Semantic search over processed paper chunks")
+    search_parser.add_argument("query")
+    search_parser.add_argument("-k", type=int, default=10, help="Number of chunks to return")
+    rebuild_parser = subparsers.add_parser("rebuild-index", help="Rebuild the vector index from stored vectors")
+    rebuild_parser.add_argument("--no-compact", action="store_true", help="Keep chunks of re-processed papers")
+    compare_parser = subparsers.add_parser("compare", help="Compare LLMs on a sample of papers")
+    compare_parser.add_argument("files", nargs="*", help="Papers to use instead of a random sample of input_dir")
+    compare_parser.add_argument("--models", help="Comma-separated model names instead of config.compare_models")
+    compare_parser.add_argument("--sample", type=int, help="Number of papers to sample")
+    compare_parser.add_argument("--use-cache", action="store_true", help="Reuse and fill the summary cache")
+    compare_parser.add_argument("--output", help="Write the results as JSON to this path")
+    subparsers.add_parser("watch", help="Keep running and process papers as they land in input_dir")
+    serve_parser = subparsers.add_parser("serve", help="Serve summaries and embeddings over a local HTTP API")
+    serve_parser.add_argument("--host", help="Address to bind instead of config.service_host")
+    serve_parser.add_argument("--port", type=int, help="Port instead of config.service_port")
+    args = parser.parse_args()
+
+    app = ResearchSummarizerApp(args.config)
+
+    if args.command == "search":
+        for rank, result in enumerate(app.search(args.query, args.k), 1):
+            print(f"{rank}. [{result['score']:.3f}] {result['title']} ({result['paper_id']}, chunk {result['chunk_no']})")
+            print(f"   {result['text'][:200]}")
+    elif args.command == "compare":
+        models = [{"name": name.strip()} for name in args.models.split(",")] if args.models else None
+        results = app.test_models(args.files, models=models, sample_size=args.sample, use_cache=args.use_cache)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    elif args.command == "watch":
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            logger.info("Shutting down once the current batch is finished")
+            stop.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        stats = app.watch(stop)
+        print(f"Processed: {stats['total']} files in {stats['batches']} batches")
+        print(f"Successful: {stats['successful']} ({stats['completion_percentage']}%)")
+        print(f"Failed: {stats['failed']}")
+    elif args.command == "serve":
+        from modules.service import SummaryService
+        service = SummaryService(app, host=args.host, port=args.port)
+
+        async def serve():
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signum, service.shutdown)
+            await service.serve()
+
+        asyncio.run(serve())
+    elif args.command == "rebuild-index":
+        rebuilt = app.rebuild_index(compact=not args.no_compact)
+        print(f"Rebuilt index: {rebuilt.get('chunks', 0)} chunks, {rebuilt.get('removed', 0)} dead chunks removed")
+    else:
+        stats = app.run()
 
-    print(f"Processed: {stats['total']} files")
-    print(f"Successful: {stats['successful']} ({stats['completion_percentage']}%)")
-    print(f"Failed: {stats['failed']}")
+        print(f"Processed: {stats['total']} files")
+        print(f"Successful: {stats['successful']} ({stats['completion_percentage']}%)")
+        print(f"Failed: {stats['failed']}")
+        if "embedding_cache" in stats:
+            cache_stats = stats["embedding_cache"]
+            print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+        if "duplicates_reused" in stats:
+            print(f"Near-duplicates reused: {stats['duplicates_reused']}")
+        if "vector_index" in stats:
+            print(f"Vector index: {stats['vector_index']['chunks']} chunks from {stats['vector_index']['papers']} papers")
     
\ No newline at end of file
@@ -0,0 +1,317 @@
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.config import Config
+from modules.llm_stream import StreamAbort
+from modules.logger import setup_logger
+from modules.metrics import Metrics
+from modules.summarizer import Summarizer
+
+logger = setup_logger("async_summarizer")
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = float(rate_per_minute) / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Wait until the bucket holds enough tokens, then take them.
+        """
+        if not self.enabled:
+            return
+
+        amount = min(float(amount), self.capacity)
+        # Holding the lock while sleeping keeps callers in FIFO order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """
+        Correct an earlier estimate, positive amounts take more tokens and negative ones refund them.
+        """
+        if not self.enabled:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AIMDLimiter:
+    """
+    In-flight request limit with additive increase and multiplicative decrease.
+
+    The limit grows by one after a full window of successful requests and is
+    halved when the provider throttles or fails. Requests already in flight at a
+    decrease belong to the same congestion event, so their failures do not halve
+    it again; each decrease starts a new epoch and only requests sent in the
+    current one can lower the limit.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 16):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.limit = min(self.maximum, max(self.minimum, int(initial)))
+        self.in_flight = 0
+        self.epoch = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> "AIMDLimiter":
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    async def on_success(self) -> None:
+        async with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    async def on_throttle(self, epoch: int) -> None:
+        """
+        Back off for a failed request sent during epoch, the value of self.epoch when it started.
+        """
+        async with self._condition:
+            if epoch != self.epoch:
+                return
+            new_limit = max(self.minimum, self.limit // 2)
+            if new_limit != self.limit:
+                logger.info(f"Lowering LLM concurrency from {self.limit} to {new_limit}")
+            self.limit = new_limit
+            self.epoch += 1
+            self._successes = 0
+
+
+class AsyncSummarizer(Summarizer):
+    """
+    Summarizer backend built on the asyncio OpenAI client.
+
+    All requests share one requests-per-minute and one tokens-per-minute bucket,
+    retry 429/5xx responses with jittered exponential backoff and adapt the number
+    of in-flight requests to the errors they see. generate_summary can still be
+    called from worker threads, it runs the request on a background event loop.
+    """
+
+    def __init__(self, config: Config, metrics: Optional[Metrics] = None):
+        super().__init__(config, metrics=metrics)
+
+        self._async_client = None
+
+        self.retries = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+        # Created lazily on the event loop that uses them
+        self.request_bucket: Optional[TokenBucket] = None
+        self.token_bucket: Optional[TokenBucket] = None
+        self.limiter: Optional[AIMDLimiter] = None
+
+    @property
+    def async_client(self):
+        # Only touched from the event loop thread, so no lock is needed
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(
+                base_url=self.config.api_base_url,
+                api_key=self.config.api_key,
+                max_retries=0,
+                timeout=self.config.llm_timeout,
+            )
+        return self._async_client
+
+    def _ensure_limits(self) -> None:
+        if self.limiter is not None:
+            return
+        self.request_bucket = TokenBucket(self.config.requests_per_minute)
+        self.token_bucket = TokenBucket(self.config.tokens_per_minute)
+        self.limiter = AIMDLimiter(
+            self.config.llm_initial_concurrency,
+            minimum=self.config.llm_min_concurrency,
+            maximum=self.config.llm_max_concurrency
+        )
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="async-summarizer", daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def generate_summary(self, paper_content: Dict[str, Any], representative_chunks: List[str]) -> Dict[str, Any]:
+        future = asyncio.run_coroutine_threadsafe(
+            self.generate_summary_async(paper_content, representative_chunks), self._get_loop()
+        )
+        return future.result()
+
+    async def generate_many(self, items: List[tuple]) -> List[Dict[str, Any]]:
+        """
+        Summarize (paper_content, representative_chunks) pairs concurrently.
+        """
+        return await asyncio.gather(*(self.generate_summary_async(content, chunks) for content, chunks in items))
+
+    async def generate_summary_async(self, paper_content: Dict[str, Any],
+                                     representative_chunks: List[str]) -> Dict[str, Any]:
+        cache_key = self.cache_key(paper_content, representative_chunks)
+        cached_summary = self.load_from_cache(cache_key)
+        if cached_summary:
+            logger.info(f"Using cached summary for {paper_content['title']}")
+            return cached_summary
+
+        # Single-flight on the event loop, later callers await the first request
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[cache_key] = future
+        try:
+            summary = await self._generate_async(paper_content, representative_chunks, cache_key)
+            future.set_result(summary)
+            return summary
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._in_flight.pop(cache_key, None)
+
+    async def _generate_async(self, paper_content: Dict[str, Any], representative_chunks: List[str],
+                              cache_key: str) -> Dict[str, Any]:
+        prompt = self.build_messages(paper_content, representative_chunks)
+
+        if self.batcher is not None and self.batcher.accepts(prompt):
+            summary = await asyncio.wrap_future(self.batcher.submit(paper_content['title'], prompt))
+            if summary is not None:
+                self.save_to_cache(cache_key, summary)
+                return summary
+
+        try:
+            response_text = await self._complete(prompt, paper_content['title'])
+            summary = self.parse_response(response_text)
+        except Exception as e:
+            logger.error(f"Error generating summary for {paper_content['title']}: {str(e)}")
+            return self.fallback_summary(paper_content)
+
+        self.save_to_cache(cache_key, summary)
+        return summary
+
+    def complete(self, prompt: Dict[str, Any], title: str) -> str:
+        # Called from the batcher thread, never from the event loop
+        future = asyncio.run_coroutine_threadsafe(self._complete(prompt, title), self._get_loop())
+        return future.result()
+
+    async def _complete(self, prompt: Dict[str, Any], title: str) -> str:
+        from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+        self._ensure_limits()
+        papers = prompt["tokens"].get("papers", 1)
+        estimated_tokens = prompt["tokens"]["total"] + self.config.llm_expected_completion_tokens * papers
+
+        attempt = 0
+        aborts = 0
+        while True:
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(estimated_tokens)
+
+            options = self.request_options(prompt)
+            try:
+                async with self.limiter:
+                    epoch = self.limiter.epoch
+                    start = time.perf_counter()
+                    response_text, usage, first_token = await self._request_async(prompt, options, start)
+            except StreamAbort as e:
+                self.metrics.inc("llm_stream_aborts_total", model=self.config.model_name, reason=e.reason)
+                aborts += 1
+                if aborts > self.config.llm_stream_retries:
+                    raise
+                logger.warning(f"Aborted streamed response for {title} ({str(e)}), retrying")
+                continue
+            except (APIStatusError, APIConnectionError, APITimeoutError) as e:
+                if self.response_format_rejected(e, options):
+                    continue
+                status = getattr(e, "status_code", None)
+                self.metrics.inc("llm_errors_total", model=self.config.model_name, status=status or type(e).__name__)
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == self.config.llm_max_retries:
+                    raise
+
+                await self.limiter.on_throttle(epoch)
+                self.retries += 1
+                self.metrics.inc("llm_retries_total", model=self.config.model_name)
+                delay = self._backoff_delay(attempt, e)
+                attempt += 1
+                logger.warning(f"LLM request failed ({status or type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            await self.limiter.on_success()
+            self.record_response(usage, time.perf_counter() - start, title, prompt["tokens"], first_token)
+
+            if getattr(usage, "total_tokens", None):
+                self.token_bucket.adjust(usage.total_tokens - estimated_tokens)
+
+            return response_text
+
+    async def _request_async(self, prompt: Dict[str, Any], options: Dict[str, Any],
+                             start: float) -> Tuple[str, Any, Optional[float]]:
+        response = await self.async_client.chat.completions.create(**options)
+        if not options.get("stream"):
+            return response.choices[0].message.content, getattr(response, "usage", None), None
+
+        reader = self.stream_reader(prompt, start)
+        try:
+            async for chunk in response:
+                if reader.feed(chunk):
+                    break
+        finally:
+            await response.close()
+        return reader.finish(), reader.usage_or_estimate(), reader.first_token
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        # Honour Retry-After when the provider sends it, otherwise full jitter
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            try:
+                if retry_after is not None:
+                    return min(self.config.llm_backoff_max, float(retry_after))
+            except ValueError:
+                pass
+
+        ceiling = min(self.config.llm_backoff_max, self.config.llm_backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
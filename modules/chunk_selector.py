@@ -0,0 +1,231 @@
+import numpy as np
+from typing import List
+
+from modules.config import Config
+from modules.logger import setup_logger
+
+logger = setup_logger("chunk_selector")
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def _pick_nearest(distances: np.ndarray, k: int) -> List[int]:
+    """
+    For each column (one per centroid) take the closest row not already taken,
+    then fill up to k with the remaining rows in document order.
+    """
+    chosen: List[int] = []
+    taken = set()
+    for column in distances.T:
+        for index in np.argsort(column, kind="stable"):
+            index = int(index)
+            if not np.isfinite(column[index]):
+                break
+            if index not in taken:
+                taken.add(index)
+                chosen.append(index)
+                break
+
+    if len(chosen) < k:
+        remaining = [i for i in range(distances.shape[0]) if i not in taken and np.isfinite(distances[i, 0])]
+        chosen.extend(remaining[:k - len(chosen)])
+    return sorted(chosen)
+
+
+class ChunkSelector:
+    """
+    Picks the indices of the k most representative chunks of a paper from their embeddings.
+
+    Selections are deterministic and returned in document order.
+    """
+
+    def select_indices(self, embeddings: np.ndarray, k: int) -> List[int]:
+        raise NotImplementedError
+
+    def select_batch(self, embeddings_list: List[np.ndarray], k: int) -> List[List[int]]:
+        """
+        Select for several papers at once.
+        """
+        return [self.select_indices(embeddings, k) for embeddings in embeddings_list]
+
+
+class KMeansSelector(ChunkSelector):
+    """
+    Seeded k-means++ with Lloyd iterations that stop once no assignment changes.
+
+    The chunk nearest each centroid is selected. select_batch pads papers of
+    similar length into one (papers, chunks, dim) array and clusters them all
+    in the same vectorized pass.
+    """
+
+    def __init__(self, seed: int = 0, max_iter: int = 20):
+        self.seed = seed
+        self.max_iter = max_iter
+        self._draws = {}
+
+    def select_indices(self, embeddings: np.ndarray, k: int) -> List[int]:
+        return self.select_batch([embeddings], k)[0]
+
+    def select_batch(self, embeddings_list: List[np.ndarray], k: int) -> List[List[int]]:
+        results: List[List[int]] = [list(range(len(embeddings))) for embeddings in embeddings_list]
+
+        # Papers that need clustering, grouped by size so padding stays small
+        order = sorted((i for i, embeddings in enumerate(embeddings_list) if len(embeddings) > k),
+                       key=lambda i: len(embeddings_list[i]))
+        group: List[int] = []
+        for i in order:
+            if group and len(embeddings_list[i]) > 2 * len(embeddings_list[group[0]]):
+                self._cluster_group(embeddings_list, group, k, results)
+                group = []
+            group.append(i)
+        if group:
+            self._cluster_group(embeddings_list, group, k, results)
+
+        return results
+
+    def _cluster_group(self, embeddings_list: List[np.ndarray], group: List[int], k: int,
+                       results: List[List[int]]) -> None:
+        counts = np.array([len(embeddings_list[i]) for i in group])
+        batch, longest = len(group), int(counts.max())
+        dim = embeddings_list[group[0]].shape[1]
+
+        X = np.zeros((batch, longest, dim), dtype=np.float32)
+        mask = np.zeros((batch, longest), dtype=bool)
+        for row, i in enumerate(group):
+            X[row, :counts[row]] = embeddings_list[i]
+            mask[row, :counts[row]] = True
+
+        squared = np.einsum("bnd,bnd->bn", X, X)
+        centroids = self._init_centroids(X, squared, mask, counts, k)
+        labels = None
+
+        for _ in range(self.max_iter):
+            distances = self._distances(X, squared, centroids)
+            new_labels = np.where(mask, distances.argmin(axis=2), -1)
+            if labels is not None and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+            members = (labels[:, :, None] == np.arange(k)).astype(np.float32)
+            sizes = members.sum(axis=1)[:, :, None]
+            sums = np.matmul(members.transpose(0, 2, 1), X)
+            # An empty cluster keeps its previous centroid
+            centroids = np.where(sizes > 0, sums / np.maximum(sizes, 1), centroids)
+
+        distances = self._distances(X, squared, centroids)
+        distances[~mask] = np.inf
+        for row, i in enumerate(group):
+            results[i] = _pick_nearest(distances[row], k)
+
+    def _init_centroids(self, X: np.ndarray, squared: np.ndarray, mask: np.ndarray, counts: np.ndarray,
+                        k: int) -> np.ndarray:
+        """
+        k-means++ seeding, vectorized over the batch with the same draws for every paper.
+        """
+        rows = np.arange(X.shape[0])
+        draws = self._draws.get(k)
+        if draws is None:
+            # Seeding a RandomState costs more than clustering a small paper, so keep the draws
+            draws = self._draws[k] = np.random.RandomState(self.seed).random_sample(k)
+
+        picks = np.minimum((draws[0] * counts).astype(int), counts - 1)
+        centroids = [X[rows, picks]]
+        closest = np.zeros_like(squared)
+
+        for step in range(k):
+            centroid = centroids[-1]
+            distance = squared - 2 * np.einsum("bnd,bd->bn", X, centroid) + squared[rows, picks][:, None]
+            distance = np.where(mask, np.maximum(distance, 0.0), 0.0)
+            closest = distance if step == 0 else np.minimum(closest, distance)
+            if step + 1 == k:
+                break
+
+            cumulative = np.cumsum(closest, axis=1)
+            target = draws[step + 1] * cumulative[:, -1]
+            picks = np.minimum((cumulative <= target[:, None]).sum(axis=1), counts - 1)
+            centroids.append(X[rows, picks])
+
+        return np.stack(centroids, axis=1)
+
+    @staticmethod
+    def _distances(X: np.ndarray, squared: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # Squared L2 distances of every chunk to every centroid, shape (batch, chunks, k)
+        cross = np.matmul(X, centroids.transpose(0, 2, 1))
+        return squared[:, :, None] - 2 * cross + np.einsum("bkd,bkd->bk", centroids, centroids)[:, None, :]
+
+
+class MMRSelector(ChunkSelector):
+    """
+    Maximal marginal relevance on normalized vectors.
+
+    Relevance is cosine similarity to the paper's mean embedding; diversity
+    weighs the penalty for similarity to chunks already picked. diversity=1
+    is pure farthest-point selection.
+    """
+
+    def __init__(self, diversity: float = 0.5):
+        self.diversity = diversity
+
+    def select_indices(self, embeddings: np.ndarray, k: int) -> List[int]:
+        if len(embeddings) <= k:
+            return list(range(len(embeddings)))
+
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        relevance = vectors @ _normalize(vectors.mean(axis=0))
+
+        selected = [int(np.argmax(relevance))]
+        max_similarity = vectors @ vectors[selected[0]]
+        while len(selected) < k:
+            scores = (1 - self.diversity) * relevance - self.diversity * max_similarity
+            scores[selected] = -np.inf
+            selected.append(int(np.argmax(scores)))
+            max_similarity = np.maximum(max_similarity, vectors @ vectors[selected[-1]])
+
+        return sorted(selected)
+
+
+class FaissKMeansSelector(ChunkSelector):
+    """
+    The original selector: FAISS k-means with the chunk nearest each centroid, seeded and in document order.
+    """
+
+    def __init__(self, seed: int = 0, max_iter: int = 20):
+        import faiss
+
+        self.faiss = faiss
+        self.seed = seed
+        self.max_iter = max_iter
+
+    def select_indices(self, embeddings: np.ndarray, k: int) -> List[int]:
+        if len(embeddings) <= k:
+            return list(range(len(embeddings)))
+
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        index = self.faiss.IndexFlatL2(embeddings.shape[1])
+        index.add(embeddings)
+
+        kmeans = self.faiss.Kmeans(embeddings.shape[1], k, niter=self.max_iter, seed=self.seed)
+        kmeans.train(embeddings)
+
+        _, nearest = index.search(kmeans.centroids, 1)
+        indices = sorted(set(int(idx[0]) for idx in nearest))
+        if len(indices) < k:
+            remaining = [i for i in range(len(embeddings)) if i not in indices]
+            indices = sorted(indices + remaining[:k - len(indices)])
+        return indices
+
+
+def create_chunk_selector(config: Config) -> ChunkSelector:
+    """
+    Build the chunk selector named by config.chunk_selector.
+    """
+    if config.chunk_selector == "mmr":
+        return MMRSelector(diversity=config.mmr_diversity)
+    if config.chunk_selector == "faiss":
+        return FaissKMeansSelector(seed=config.chunk_selector_seed, max_iter=config.chunk_selector_max_iter)
+    if config.chunk_selector != "kmeans":
+        logger.warning(f"Unknown chunk selector {config.chunk_selector}, using kmeans")
+    return KMeansSelector(seed=config.chunk_selector_seed, max_iter=config.chunk_selector_max_iter)
@@ -0,0 +1,146 @@
+import re
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+Span = Tuple[int, int]
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+def token_length_function(encoding_name: str = "cl100k_base") -> Callable[[str], int]:
+    """
+    Count tokens with tiktoken when installed, otherwise approximate with word and punctuation pieces.
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(encoding_name)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except ImportError:
+        pattern = re.compile(r"\w+|[^\w\s]")
+        return lambda text: sum(1 for _ in pattern.finditer(text))
+
+
+_SEPARATOR_PATTERNS = {}
+
+
+def _separator_pattern(separator: str) -> "re.Pattern":
+    pattern = _SEPARATOR_PATTERNS.get(separator)
+    if pattern is None:
+        pattern = _SEPARATOR_PATTERNS[separator] = re.compile(re.escape(separator))
+    return pattern
+
+
+class OffsetChunker:
+    """
+    Recursive character splitter that works on (start, end) offsets.
+
+    Follows the same rules as langchain's RecursiveCharacterTextSplitter with its
+    defaults (separators tried in order, separators kept at the start of the next
+    piece, pieces merged up to chunk_size with chunk_overlap carried over, chunks
+    stripped), so the chunk texts are identical. Chunks are returned as offsets
+    into the input text and only sliced when asked for.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 separators: Optional[List[str]] = None, length_unit: str = "chars"):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self.length_unit = length_unit
+
+        self._text_length: Optional[Callable[[str], int]] = None
+        if length_unit == "tokens":
+            self._text_length = token_length_function()
+        elif length_unit != "chars":
+            raise ValueError(f"Unknown length unit: {length_unit}")
+
+    def split_offsets(self, text: str) -> List[Span]:
+        if not text:
+            return []
+        return self._split(text, 0, len(text), self.separators)
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def _split(self, text: str, start: int, end: int, separators: List[str]) -> List[Span]:
+        separator = separators[-1]
+        remaining: List[str] = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        chunks: List[Span] = []
+        good: List[Tuple[int, int, int]] = []
+        text_length = self._text_length
+        for piece_start, piece_end in self._pieces(text, start, end, separator):
+            if text_length is None:
+                length = piece_end - piece_start
+            else:
+                length = text_length(text[piece_start:piece_end])
+            if length < self.chunk_size:
+                good.append((piece_start, piece_end, length))
+                continue
+
+            if good:
+                chunks.extend(self._merge(text, good))
+                good = []
+            if not remaining:
+                chunks.append((piece_start, piece_end))
+            else:
+                chunks.extend(self._split(text, piece_start, piece_end, remaining))
+
+        if good:
+            chunks.extend(self._merge(text, good))
+        return chunks
+
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str) -> List[Span]:
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+
+        # Each separator starts a new piece, like re.split with the separator kept in front
+        bounds = [start]
+        bounds.extend(match.start() for match in _separator_pattern(separator).finditer(text, start, end))
+        bounds.append(end)
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+    def _merge(self, text: str, pieces: List[Tuple[int, int, int]]) -> List[Span]:
+        chunks: List[Span] = []
+        window: deque = deque()
+        total = 0
+
+        for piece in pieces:
+            length = piece[2]
+            if total + length > self.chunk_size and window:
+                span = self._strip(text, window[0][0], window[-1][1])
+                if span is not None:
+                    chunks.append(span)
+                # Drop pieces from the front until what is left fits as overlap
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= window.popleft()[2]
+            window.append(piece)
+            total += length
+
+        if window:
+            span = self._strip(text, window[0][0], window[-1][1])
+            if span is not None:
+                chunks.append(span)
+        return chunks
+
+    @staticmethod
+    def _strip(text: str, start: int, end: int) -> Optional[Span]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start == end:
+            return None
+        return start, end
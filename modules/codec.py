@@ -0,0 +1,174 @@
+import json
+from typing import Any, Dict, List, Optional, TypedDict, Union
+
+from modules.logger import setup_logger
+
+logger = setup_logger("codec")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class PaperData(TypedDict, total=False):
+    headline: Optional[str]
+    description: Optional[str]
+    content: Any
+    sections: Optional[List[Any]]
+
+
+class Paper(TypedDict, total=False):
+    """Input paper, limited to the fields the pipeline reads."""
+    category: Any
+    scraper_id: Any
+    website_url: Any
+    timestamp: Any
+    author: Any
+    image_url: Any
+    source_type: Any
+    hyperlinks: Optional[List[Any]]
+    data: PaperData
+
+
+class OutputRecord(TypedDict, total=False):
+    """Processed paper as written to output_dir."""
+    id: str
+    category: Any
+    scraper_id: Any
+    website_url: Any
+    timestamp: Any
+    author: Any
+    image_url: Any
+    source_type: Any
+    hyperlinks: List[Any]
+    data: Dict[str, Any]
+    summary: Dict[str, Any]
+
+
+PAPER_FIELDS = tuple(Paper.__annotations__)
+PAPER_DATA_FIELDS = tuple(PaperData.__annotations__)
+
+
+if msgspec is not None:
+    # Same schema as Paper; unknown fields are skipped by the decoder and never built
+    UNSET = msgspec.UNSET
+
+    class _PaperDataStruct(msgspec.Struct):
+        headline: Union[str, None, msgspec.UnsetType] = UNSET
+        description: Union[str, None, msgspec.UnsetType] = UNSET
+        content: Any = UNSET
+        sections: Union[List[Any], None, msgspec.UnsetType] = UNSET
+
+    class _PaperStruct(msgspec.Struct):
+        category: Any = UNSET
+        scraper_id: Any = UNSET
+        website_url: Any = UNSET
+        timestamp: Any = UNSET
+        author: Any = UNSET
+        image_url: Any = UNSET
+        source_type: Any = UNSET
+        hyperlinks: Union[List[Any], None, msgspec.UnsetType] = UNSET
+        data: Union[_PaperDataStruct, msgspec.UnsetType] = UNSET
+
+
+def _check_optional(value: Any, expected: type, name: str) -> None:
+    if value is not None and not isinstance(value, expected):
+        raise ValueError(f"Expected {name} to be {expected.__name__}, got {type(value).__name__}")
+
+
+def project_paper(obj: Any) -> Paper:
+    """
+    Validate a decoded paper and keep only the fields of the Paper schema.
+    """
+    if not isinstance(obj, dict):
+        raise ValueError(f"Expected a JSON object, got {type(obj).__name__}")
+
+    paper: Dict[str, Any] = {key: obj[key] for key in PAPER_FIELDS if key in obj and key != "data"}
+    _check_optional(paper.get("hyperlinks"), list, "hyperlinks")
+
+    if "data" in obj:
+        data = obj["data"]
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected data to be an object, got {type(data).__name__}")
+        projected = {key: data[key] for key in PAPER_DATA_FIELDS if key in data}
+        _check_optional(projected.get("headline"), str, "data.headline")
+        _check_optional(projected.get("description"), str, "data.description")
+        _check_optional(projected.get("sections"), list, "data.sections")
+        paper["data"] = projected
+
+    return paper
+
+
+class JsonCodec:
+    """
+    JSON encoder/decoder backed by msgspec or orjson when installed, stdlib json otherwise.
+
+    Encoded output is UTF-8 bytes, pretty-printed with two-space indentation
+    unless compact is set.
+    """
+
+    BACKENDS = ("msgspec", "orjson", "json")
+
+    def __init__(self, backend: str = "auto", compact: bool = False):
+        self.backend = self._resolve_backend(backend)
+        self.compact = compact
+
+        if self.backend == "msgspec":
+            self._encoder = msgspec.json.Encoder()
+            self._decoder = msgspec.json.Decoder()
+            self._paper_decoder = msgspec.json.Decoder(_PaperStruct)
+
+    @staticmethod
+    def _resolve_backend(backend: str) -> str:
+        available = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+        if backend == "auto":
+            return next(name for name in JsonCodec.BACKENDS if available[name])
+        if backend not in available:
+            raise ValueError(f"Unknown JSON backend: {backend}")
+        if not available[backend]:
+            logger.warning(f"JSON backend {backend} is not installed, falling back to stdlib json")
+            return "json"
+        return backend
+
+    def dumps(self, obj: Any, compact: Optional[bool] = None) -> bytes:
+        compact = self.compact if compact is None else compact
+
+        if self.backend == "orjson":
+            return orjson.dumps(obj) if compact else orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        if self.backend == "msgspec":
+            encoded = self._encoder.encode(obj)
+            return encoded if compact else msgspec.json.format(encoded, indent=2)
+
+        if compact:
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """
+        Decode JSON, raises ValueError on malformed input whatever the backend.
+        """
+        if self.backend == "orjson":
+            return orjson.loads(data)
+        if self.backend == "msgspec":
+            try:
+                return self._decoder.decode(data)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e))
+        return json.loads(data)
+
+    def decode_paper(self, data: Union[bytes, str]) -> Paper:
+        """
+        Decode and validate an input paper, raises ValueError if it does not match the schema.
+        """
+        if self.backend == "msgspec":
+            try:
+                return msgspec.to_builtins(self._paper_decoder.decode(data))
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e))
+        return project_paper(self.loads(data))
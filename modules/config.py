@@ -1,4 +1,5 @@
 import os
+import copy
 import json
 from typing import Optional, Dict, Any
 
@@ -13,9 +14,115 @@ class Config:
         self.max_workers = 4
         self.chunk_size = 1000
         self.chunk_overlap = 200
+        self.text_splitter = "native"
+        self.chunk_length_unit = "chars"
         self.embedding_model_name = "all-MiniLM-L6-v2"
+        self.embedding_backend = "sentence_transformers"
+        self.onnx_model_dir = "onnx_models"
+        self.onnx_quantize = True
+        self.onnx_intra_op_threads = 0
         self.force_regenerate = False
         self.rate_limit_pause = 0.5
+        self.summary_cache_max_entries = 50000
+        self.summary_cache_max_age_days = 0
+        self.dedup_enabled = False
+        self.dedup_threshold = 0.9
+        self.dedup_num_perm = 128
+        self.dedup_shingle_size = 5
+        self.dedup_index_path = None
+        self.use_run_manifest = True
+        self.manifest_path = None
+        self.io_mode = "files"
+        self.input_shard_pattern = "*.jsonl*"
+        self.output_shard_max_records = 10000
+        self.output_flush_every = 100
+        self.output_fsync = True
+        self.json_backend = "auto"
+        self.json_compact = False
+        self.use_embedding_batcher = True
+        self.embedding_batch_size = 128
+        self.embedding_batch_max_wait = 0.02
+        self.embedding_cache_dir = "embedding_cache"
+        self.embedding_cache_max_entries = 200000
+        self.embedding_cache_max_age_days = 30
+        self.embedding_cache_float16 = True
+        self.chunk_selector = "kmeans"
+        self.chunk_selector_seed = 0
+        self.chunk_selector_max_iter = 20
+        self.mmr_diversity = 0.5
+        self.vector_index_enabled = False
+        self.vector_index_dir = "vector_index"
+        self.vector_index_type = "ivfpq"
+        self.vector_index_nlist = 1024
+        self.vector_index_pq_m = 48
+        self.vector_index_nprobe = 16
+        self.vector_index_train_size = 50000
+        self.vector_index_save_every = 1000
+        self.pipeline_mode = False
+        self.pipeline_queue_size = 32
+        self.pipeline_reader_workers = 4
+        self.pipeline_preprocess_workers = 4
+        self.pipeline_llm_workers = 16
+        self.process_pool_workers = 0
+        self.process_pool_embedding = False
+        self.process_pool_start_method = "spawn"
+        self.process_pool_shm_threshold = 65536
+        self.metrics_enabled = False
+        self.metrics_file = None
+        self.metrics_port = 0
+        self.metrics_host = "127.0.0.1"
+        self.metrics_interval = 15
+        self.metrics_trace_path = None
+        self.api_base_url = "https://openrouter.ai/api/v1"
+        self.llm_backend = "sync"
+        self.llm_timeout = 120
+        self.requests_per_minute = 20
+        self.tokens_per_minute = 0
+        self.llm_expected_completion_tokens = 1024
+        self.prompt_token_budget = 2000
+        self.prompt_abstract_max_tokens = 400
+        self.llm_batch_enabled = False
+        self.llm_batch_max_papers = 8
+        self.llm_batch_token_budget = 6000
+        self.llm_batch_max_paper_tokens = 1200
+        self.llm_batch_max_output_tokens = 4096
+        self.llm_batch_max_wait = 0.5
+        self.llm_stream = False
+        self.llm_stream_max_tokens = 2048
+        self.llm_stream_retries = 1
+        self.llm_response_format = "none"
+        # Costs are USD per million tokens, "config" holds per-model setting overrides
+        self.compare_models = [
+            {"name": "meta-llama/llama-3.3-70b-instruct:free", "description": "Llama 3.3 70B",
+             "input_cost": 0.0, "output_cost": 0.0}
+        ]
+        self.compare_sample_size = 20
+        self.compare_concurrency = 2
+        self.compare_min_valid_rate = 0.9
+        self.distributed = False
+        self.node_id = None
+        self.lease_dir = None
+        self.lease_ttl = 120
+        self.lease_heartbeat_interval = 30
+        self.lease_poll_interval = 10
+        self.watch_backend = "auto"
+        self.watch_poll_interval = 2.0
+        self.watch_debounce = 1.0
+        self.watch_max_wait = 10.0
+        self.watch_batch_size = 64
+        self.watch_initial_scan = True
+        self.service_host = "127.0.0.1"
+        self.service_port = 8080
+        self.service_summarize_concurrency = 4
+        self.service_embed_concurrency = 8
+        self.service_queue_size = 64
+        self.service_max_request_mb = 16
+        self.llm_initial_concurrency = 4
+        self.llm_min_concurrency = 1
+        self.llm_max_concurrency = 16
+        self.llm_max_retries = 5
+        self.llm_backoff_base = 1.0
+        self.llm_backoff_max = 60.0
         
         if os.path.exists(config_path):
             self.load_from_file(config_path)
@@ -34,6 +141,17 @@ class Config:
         except Exception as e:
             print(f"Failed to load config : {config_path}: {str(e)}")
     
+    def copy(self, **overrides: Any) -> "Config":
+        """
+        An independent copy with some settings replaced, safe to use alongside this one.
+        """
+        duplicate = copy.deepcopy(self)
+        for key, value in overrides.items():
+            if not hasattr(duplicate, key):
+                raise AttributeError(f"Unknown config key: {key}")
+            setattr(duplicate, key, value)
+        return duplicate
+    
     def save_to_file(self, config_path: str) -> None:
         config_data = {
             "input_dir": self.input_dir,
@@ -45,9 +163,111 @@ class Config:
             "max_workers": self.max_workers,
             "chunk_size": self.chunk_size,
             "chunk_overlap": self.chunk_overlap,
+            "text_splitter": self.text_splitter,
+            "chunk_length_unit": self.chunk_length_unit,
             "embedding_model_name": self.embedding_model_name,
+            "embedding_backend": self.embedding_backend,
+            "onnx_model_dir": self.onnx_model_dir,
+            "onnx_quantize": self.onnx_quantize,
+            "onnx_intra_op_threads": self.onnx_intra_op_threads,
             "force_regenerate": self.force_regenerate,
-            "rate_limit_pause": self.rate_limit_pause
+            "rate_limit_pause": self.rate_limit_pause,
+            "summary_cache_max_entries": self.summary_cache_max_entries,
+            "summary_cache_max_age_days": self.summary_cache_max_age_days,
+            "dedup_enabled": self.dedup_enabled,
+            "dedup_threshold": self.dedup_threshold,
+            "dedup_num_perm": self.dedup_num_perm,
+            "dedup_shingle_size": self.dedup_shingle_size,
+            "dedup_index_path": self.dedup_index_path,
+            "use_run_manifest": self.use_run_manifest,
+            "manifest_path": self.manifest_path,
+            "io_mode": self.io_mode,
+            "input_shard_pattern": self.input_shard_pattern,
+            "output_shard_max_records": self.output_shard_max_records,
+            "output_flush_every": self.output_flush_every,
+            "output_fsync": self.output_fsync,
+            "json_backend": self.json_backend,
+            "json_compact": self.json_compact,
+            "use_embedding_batcher": self.use_embedding_batcher,
+            "embedding_batch_size": self.embedding_batch_size,
+            "embedding_batch_max_wait": self.embedding_batch_max_wait,
+            "embedding_cache_dir": self.embedding_cache_dir,
+            "embedding_cache_max_entries": self.embedding_cache_max_entries,
+            "embedding_cache_max_age_days": self.embedding_cache_max_age_days,
+            "embedding_cache_float16": self.embedding_cache_float16,
+            "chunk_selector": self.chunk_selector,
+            "chunk_selector_seed": self.chunk_selector_seed,
+            "chunk_selector_max_iter": self.chunk_selector_max_iter,
+            "mmr_diversity": self.mmr_diversity,
+            "vector_index_enabled": self.vector_index_enabled,
+            "vector_index_dir": self.vector_index_dir,
+            "vector_index_type": self.vector_index_type,
+            "vector_index_nlist": self.vector_index_nlist,
+            "vector_index_pq_m": self.vector_index_pq_m,
+            "vector_index_nprobe": self.vector_index_nprobe,
+            "vector_index_train_size": self.vector_index_train_size,
+            "vector_index_save_every": self.vector_index_save_every,
+            "pipeline_mode": self.pipeline_mode,
+            "pipeline_queue_size": self.pipeline_queue_size,
+            "pipeline_reader_workers": self.pipeline_reader_workers,
+            "pipeline_preprocess_workers": self.pipeline_preprocess_workers,
+            "pipeline_llm_workers": self.pipeline_llm_workers,
+            "process_pool_workers": self.process_pool_workers,
+            "process_pool_embedding": self.process_pool_embedding,
+            "process_pool_start_method": self.process_pool_start_method,
+            "process_pool_shm_threshold": self.process_pool_shm_threshold,
+            "metrics_enabled": self.metrics_enabled,
+            "metrics_file": self.metrics_file,
+            "metrics_port": self.metrics_port,
+            "metrics_host": self.metrics_host,
+            "metrics_interval": self.metrics_interval,
+            "metrics_trace_path": self.metrics_trace_path,
+            "api_base_url": self.api_base_url,
+            "llm_backend": self.llm_backend,
+            "llm_timeout": self.llm_timeout,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "llm_expected_completion_tokens": self.llm_expected_completion_tokens,
+            "prompt_token_budget": self.prompt_token_budget,
+            "prompt_abstract_max_tokens": self.prompt_abstract_max_tokens,
+            "llm_batch_enabled": self.llm_batch_enabled,
+            "llm_batch_max_papers": self.llm_batch_max_papers,
+            "llm_batch_token_budget": self.llm_batch_token_budget,
+            "llm_batch_max_paper_tokens": self.llm_batch_max_paper_tokens,
+            "llm_batch_max_output_tokens": self.llm_batch_max_output_tokens,
+            "llm_batch_max_wait": self.llm_batch_max_wait,
+            "llm_stream": self.llm_stream,
+            "llm_stream_max_tokens": self.llm_stream_max_tokens,
+            "llm_stream_retries": self.llm_stream_retries,
+            "llm_response_format": self.llm_response_format,
+            "compare_models": self.compare_models,
+            "compare_sample_size": self.compare_sample_size,
+            "compare_concurrency": self.compare_concurrency,
+            "compare_min_valid_rate": self.compare_min_valid_rate,
+            "distributed": self.distributed,
+            "node_id": self.node_id,
+            "lease_dir": self.lease_dir,
+            "lease_ttl": self.lease_ttl,
+            "lease_heartbeat_interval": self.lease_heartbeat_interval,
+            "lease_poll_interval": self.lease_poll_interval,
+            "watch_backend": self.watch_backend,
+            "watch_poll_interval": self.watch_poll_interval,
+            "watch_debounce": self.watch_debounce,
+            "watch_max_wait": self.watch_max_wait,
+            "watch_batch_size": self.watch_batch_size,
+            "watch_initial_scan": self.watch_initial_scan,
+            "service_host": self.service_host,
+            "service_port": self.service_port,
+            "service_summarize_concurrency": self.service_summarize_concurrency,
+            "service_embed_concurrency": self.service_embed_concurrency,
+            "service_queue_size": self.service_queue_size,
+            "service_max_request_mb": self.service_max_request_mb,
+            "llm_initial_concurrency": self.llm_initial_concurrency,
+            "llm_min_concurrency": self.llm_min_concurrency,
+            "llm_max_concurrency": self.llm_max_concurrency,
+            "llm_max_retries": self.llm_max_retries,
+            "llm_backoff_base": self.llm_backoff_base,
+            "llm_backoff_max": self.llm_backoff_max
         }
         
         try:
@@ -67,9 +287,114 @@ default_config = {
     "max_workers": 4,
     "chunk_size": 1000,
     "chunk_overlap": 200,
+    "text_splitter": "native",
+    "chunk_length_unit": "chars",
     "embedding_model_name": "all-MiniLM-L6-v2",
+    "embedding_backend": "sentence_transformers",
+    "onnx_model_dir": "onnx_models",
+    "onnx_quantize": True,
+    "onnx_intra_op_threads": 0,
     "force_regenerate": False,
-    "rate_limit_pause": 0.5
+    "rate_limit_pause": 0.5,
+    "summary_cache_max_entries": 50000,
+    "summary_cache_max_age_days": 0,
+    "dedup_enabled": False,
+    "dedup_threshold": 0.9,
+    "dedup_num_perm": 128,
+    "dedup_shingle_size": 5,
+    "dedup_index_path": None,
+    "use_run_manifest": True,
+    "manifest_path": None,
+    "io_mode": "files",
+    "input_shard_pattern": "*.jsonl*",
+    "output_shard_max_records": 10000,
+    "output_flush_every": 100,
+    "output_fsync": True,
+    "json_backend": "auto",
+    "json_compact": False,
+    "use_embedding_batcher": True,
+    "embedding_batch_size": 128,
+    "embedding_batch_max_wait": 0.02,
+    "embedding_cache_dir": "embedding_cache",
+    "embedding_cache_max_entries": 200000,
+    "embedding_cache_max_age_days": 30,
+    "embedding_cache_float16": True,
+    "chunk_selector": "kmeans",
+    "chunk_selector_seed": 0,
+    "chunk_selector_max_iter": 20,
+    "mmr_diversity": 0.5,
+    "vector_index_enabled": False,
+    "vector_index_dir": "vector_index",
+    "vector_index_type": "ivfpq",
+    "vector_index_nlist": 1024,
+    "vector_index_pq_m": 48,
+    "vector_index_nprobe": 16,
+    "vector_index_train_size": 50000,
+    "vector_index_save_every": 1000,
+    "pipeline_mode": False,
+    "pipeline_queue_size": 32,
+    "pipeline_reader_workers": 4,
+    "pipeline_preprocess_workers": 4,
+    "pipeline_llm_workers": 16,
+    "process_pool_workers": 0,
+    "process_pool_embedding": False,
+    "process_pool_start_method": "spawn",
+    "process_pool_shm_threshold": 65536,
+    "metrics_enabled": False,
+    "metrics_file": None,
+    "metrics_port": 0,
+    "metrics_host": "127.0.0.1",
+    "metrics_interval": 15,
+    "metrics_trace_path": None,
+    "api_base_url": "https://openrouter.ai/api/v1",
+    "llm_backend": "sync",
+    "llm_timeout": 120,
+    "requests_per_minute": 20,
+    "tokens_per_minute": 0,
+    "llm_expected_completion_tokens": 1024,
+    "prompt_token_budget": 2000,
+    "prompt_abstract_max_tokens": 400,
+    "llm_batch_enabled": False,
+    "llm_batch_max_papers": 8,
+    "llm_batch_token_budget": 6000,
+    "llm_batch_max_paper_tokens": 1200,
+    "llm_batch_max_output_tokens": 4096,
+    "llm_batch_max_wait": 0.5,
+    "llm_stream": False,
+    "llm_stream_max_tokens": 2048,
+    "llm_stream_retries": 1,
+    "llm_response_format": "none",
+    "compare_models": [
+        {"name": "meta-llama/llama-3.3-70b-instruct:free", "description": "Llama 3.3 70B",
+         "input_cost": 0.0, "output_cost": 0.0}
+    ],
+    "compare_sample_size": 20,
+    "compare_concurrency": 2,
+    "compare_min_valid_rate": 0.9,
+    "distributed": False,
+    "node_id": None,
+    "lease_dir": None,
+    "lease_ttl": 120,
+    "lease_heartbeat_interval": 30,
+    "lease_poll_interval": 10,
+    "watch_backend": "auto",
+    "watch_poll_interval": 2.0,
+    "watch_debounce": 1.0,
+    "watch_max_wait": 10.0,
+    "watch_batch_size": 64,
+    "watch_initial_scan": True,
+    "service_host": "127.0.0.1",
+    "service_port": 8080,
+    "service_summarize_concurrency": 4,
+    "service_embed_concurrency": 8,
+    "service_queue_size": 64,
+    "service_max_request_mb": 16,
+    "llm_initial_concurrency": 4,
+    "llm_min_concurrency": 1,
+    "llm_max_concurrency": 16,
+    "llm_max_retries": 5,
+    "llm_backoff_base": 1.0,
+    "llm_backoff_max": 60.0
 }
 
 if __name__ == "__main__":
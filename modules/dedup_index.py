@@ -0,0 +1,190 @@
+import os
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from modules.codec import JsonCodec
+from modules.logger import setup_logger
+
+logger = setup_logger("dedup_index")
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_PERMUTATION_SEED = 1
+
+
+class DedupIndex:
+    """
+    Near-duplicate detection for papers with MinHash signatures and an LSH band index.
+
+    Signatures are taken over lower-cased word shingles of the paper text. Each
+    signature is split into bands, papers sharing any band bucket become
+    candidates, and a candidate counts as a duplicate when the estimated Jaccard
+    similarity of the signatures reaches threshold. Signatures, buckets and the
+    summary produced for each paper live in one SQLite database, so duplicates
+    are found across runs.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 5,
+                 codec: Optional[JsonCodec] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.threshold = float(threshold)
+        self.num_perm = int(num_perm)
+        self.shingle_size = max(1, int(shingle_size))
+        self.codec = codec or JsonCodec()
+        self.bands, self.rows = self.choose_bands(self.num_perm, self.threshold)
+        self.hits = 0
+
+        rng = np.random.RandomState(_PERMUTATION_SEED)
+        self._a = rng.randint(1, 1 << 61, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 61, size=self.num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "doc_id TEXT PRIMARY KEY, signature BLOB NOT NULL, summary BLOB NOT NULL, updated REAL NOT NULL)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS buckets (band INTEGER, bucket BLOB, doc_id TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets(band, bucket)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS buckets_doc ON buckets(doc_id)")
+        self._check_layout()
+
+    @staticmethod
+    def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+        """
+        Pick (bands, rows) whose LSH threshold (1/bands)^(1/rows) is the highest one not above threshold.
+        """
+        best = (num_perm, 1)
+        best_threshold = -1.0
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            lsh_threshold = (1.0 / bands) ** (1.0 / rows)
+            if best_threshold < lsh_threshold <= threshold:
+                best, best_threshold = (bands, rows), lsh_threshold
+        return best
+
+    def _check_layout(self) -> None:
+        # Signatures are only comparable with the same permutations and shingles,
+        # a different band split just needs the buckets rebuilt
+        signature_layout = f"minhash:{self.num_perm}:{self.shingle_size}:{_PERMUTATION_SEED}"
+        band_layout = f"{self.bands}x{self.rows}"
+        stored = dict(self.db.execute("SELECT key, value FROM meta").fetchall())
+
+        with self.db:
+            if stored.get("signature_layout") not in (None, signature_layout):
+                logger.info(f"Dedup index layout changed, clearing {self.path}")
+                self.db.execute("DELETE FROM docs")
+                self.db.execute("DELETE FROM buckets")
+            elif stored.get("band_layout") not in (None, band_layout):
+                logger.info(f"Rebuilding dedup buckets as {band_layout}")
+                self.db.execute("DELETE FROM buckets")
+                for doc_id, signature in self.db.execute("SELECT doc_id, signature FROM docs").fetchall():
+                    self._insert_buckets(doc_id, np.frombuffer(signature, dtype=np.uint32))
+
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('signature_layout', ?)", (signature_layout,))
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('band_layout', ?)", (band_layout,))
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        MinHash signature of the text's word shingles, None if the text has no words.
+        """
+        words = text.lower().split() if text else []
+        if not words:
+            return None
+
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        # Blocks keep the (shingles, num_perm) intermediate small for long papers
+        for start in range(0, len(hashes), 4096):
+            block = hashes[start:start + 4096, None]
+            permuted = ((block * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _insert_buckets(self, doc_id: str, signature: np.ndarray) -> None:
+        self.db.executemany(
+            "INSERT INTO buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+            [(band, key, doc_id) for band, key in enumerate(self._band_keys(signature))]
+        )
+
+    def query(self, signature: np.ndarray, doc_id: Optional[str] = None) -> Optional[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Find the most similar indexed paper at or above threshold, returns (doc_id, similarity, summary).
+
+        The entry of doc_id itself is skipped, a paper processed again after its input
+        changed would otherwise match its own stale summary.
+        """
+        with self._lock:
+            try:
+                candidates = set()
+                for band, key in enumerate(self._band_keys(signature)):
+                    rows = self.db.execute(
+                        "SELECT doc_id FROM buckets WHERE band = ? AND bucket = ?", (band, key)
+                    ).fetchall()
+                    candidates.update(row[0] for row in rows)
+                candidates.discard(doc_id)
+
+                best = None
+                for candidate in candidates:
+                    row = self.db.execute("SELECT signature, summary FROM docs WHERE doc_id = ?", (candidate,)).fetchone()
+                    if row is None:
+                        continue
+                    similarity = float(np.mean(np.frombuffer(row[0], dtype=np.uint32) == signature))
+                    if similarity >= self.threshold and (best is None or similarity > best[1]):
+                        best = (candidate, similarity, row[1])
+
+                if best is None:
+                    return None
+                self.hits += 1
+                return best[0], best[1], self.codec.loads(best[2])
+            except Exception as e:
+                logger.warning(f"Dedup lookup failed: {e}")
+                return None
+
+    def add(self, doc_id: str, signature: np.ndarray, summary: Dict[str, Any]) -> bool:
+        """
+        Index a processed paper together with its summary, replacing any earlier entry for doc_id.
+        """
+        with self._lock:
+            try:
+                with self.db:
+                    self.db.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO docs (doc_id, signature, summary, updated) VALUES (?, ?, ?, ?)",
+                        (doc_id, signature.astype(np.uint32).tobytes(),
+                         self.codec.dumps(summary, compact=True), time.time())
+                    )
+                    self._insert_buckets(doc_id, signature)
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to index {doc_id} for dedup: {e}")
+                return False
+
+    def count(self) -> int:
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
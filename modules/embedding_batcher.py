@@ -0,0 +1,132 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from modules.logger import setup_logger
+
+logger = setup_logger("embedding_batcher")
+
+
+class _EmbeddingRequest:
+    __slots__ = ("chunks", "future")
+
+    def __init__(self, chunks: List[str]):
+        self.chunks = chunks
+        self.future: Future = Future()
+
+
+class EmbeddingBatcher:
+    """Collect chunks from many papers into shared encode batches."""
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], batch_size: int = 128, max_wait: float = 0.02):
+        self.encode_fn = encode_fn
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+
+        self._queue: "queue.Queue[Optional[_EmbeddingRequest]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def start(self) -> None:
+        with self._lock:
+            if not self._closed:
+                self._start_worker()
+
+    def _start_worker(self) -> None:
+        # Callers hold self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, chunks: List[str]) -> Future:
+        """
+        Queue chunks for embedding, the future resolves to an array of shape (len(chunks), dim).
+        """
+        request = _EmbeddingRequest(list(chunks))
+        if not request.chunks:
+            request.future.set_result(np.array([]))
+            return request.future
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            # Under the same lock as the put, a close() finishing in between would leave it without a worker
+            self._start_worker()
+            self._queue.put(request)
+        return request.future
+
+    def embed(self, chunks: List[str]) -> np.ndarray:
+        return self.submit(chunks).result()
+
+    def close(self) -> None:
+        """
+        Stop the worker once the queued requests are encoded. A later submit starts a new one.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+
+        if thread is not None:
+            thread.join()
+
+        with self._lock:
+            self._thread = None
+            self._closed = False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            request = self._queue.get()
+            if request is None:
+                break
+
+            pending = [request]
+            pending_chunks = len(request.chunks)
+            deadline = time.monotonic() + self.max_wait
+
+            # Keep pulling requests until the batch is full or the wait budget is spent
+            while pending_chunks < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        request = self._queue.get(timeout=remaining)
+                    else:
+                        request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if request is None:
+                    stopping = True
+                    break
+
+                pending.append(request)
+                pending_chunks += len(request.chunks)
+
+            self._encode_batch(pending)
+
+    def _encode_batch(self, pending: List[_EmbeddingRequest]) -> None:
+        texts = [chunk for request in pending for chunk in request.chunks]
+
+        try:
+            vectors = np.asarray(self.encode_fn(texts))
+        except Exception as e:
+            logger.error(f"Error encoding batch of {len(texts)} chunks: {str(e)}")
+            for request in pending:
+                request.future.set_exception(e)
+            return
+
+        # Route each slice of the batch back to the paper that asked for it
+        offset = 0
+        for request in pending:
+            count = len(request.chunks)
+            request.future.set_result(vectors[offset:offset + count])
+            offset += count
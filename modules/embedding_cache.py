@@ -0,0 +1,341 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from modules.logger import setup_logger
+
+logger = setup_logger("embedding_cache")
+
+
+# Recently read keys are written back in batches, not on every lookup
+_TOUCH_BATCH = 1024
+# Rows still unwritten this long after their slot was taken were left by a writer that died mid-put
+_PENDING_TIMEOUT = 3600
+
+
+class EmbeddingCache:
+    """
+    On-disk chunk embedding cache keyed by chunk text hash and model name.
+
+    Vectors live in a memory-mapped matrix, one row per slot, and a small SQLite
+    table maps each key to its slot with access times for eviction.
+
+    Lookups only read: a writer takes a slot out of the table before overwriting
+    it and maps it again under a new generation once the vector is written, so a
+    reader keeps a copied row only if its entry is unchanged after the copy.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, dim: int, max_entries: int = 200000,
+                 max_age_days: float = 0, use_float16: bool = True):
+        self.model_name = model_name
+        self.dim = int(dim)
+        self.capacity = max(1, int(max_entries))
+        self.max_age = float(max_age_days) * 86400
+        self.dtype = np.float16 if use_float16 else np.float32
+        self._row_bytes = self.dim * np.dtype(self.dtype).itemsize
+
+        # One store per model, since the vector width depends on it
+        model_key = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16]
+        self.store_dir = os.path.join(cache_dir, model_key)
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.index_path = os.path.join(self.store_dir, "index.sqlite3")
+        self.vectors_path = os.path.join(self.store_dir, "vectors.mmap")
+
+        self.hits = 0
+        self.misses = 0
+        # Guards the writer connection, the counters and the pending last_access updates
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+
+        # Autocommit, transactions are explicit so slot allocation can take the write lock up front
+        self.db = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # A NULL generation marks a slot that is taken but not written yet
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL, "
+            "generation INTEGER)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        # Slots given back by eviction, fresh ones come from the next_slot high-water mark
+        self.db.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+
+        self.vectors = self._open_vectors()
+        self._expire()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # IMMEDIATE takes the write lock at BEGIN, so processes sharing the store allocate slots one at a time
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def _reader(self) -> sqlite3.Connection:
+        # One connection per thread, so lookups neither wait on self._lock nor on writers
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._local.db = db
+            with self._lock:
+                self._readers.append(db)
+        return db
+
+    def _meta(self, name: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: Any) -> None:
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def _open_vectors(self) -> np.memmap:
+        layout = f"{self.model_name}|{self.dim}|{np.dtype(self.dtype).name}"
+
+        with self._transaction():
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(entries)")}
+            if "generation" not in columns:
+                # Stores from before lookups were validated, all their rows are written
+                self.db.execute("ALTER TABLE entries ADD COLUMN generation INTEGER")
+                self.db.execute("UPDATE entries SET generation = 0")
+
+            stored = self._meta("layout")
+            if stored is not None and stored.startswith(layout + "|"):
+                # Older stores had the size cap in the layout, it is handled by _resize now
+                stored = layout
+                self._set_meta("layout", layout)
+
+            if stored != layout or not os.path.exists(self.vectors_path):
+                # Layout changed (dim or dtype) so the old rows cannot be reused
+                if stored is not None:
+                    logger.info(f"Embedding cache layout changed, resetting {self.store_dir}")
+                self.db.execute("DELETE FROM entries")
+                self.db.execute("DELETE FROM free_slots")
+                self._set_meta("layout", layout)
+                self._set_meta("next_slot", 0)
+                self._set_meta("next_generation", 1)
+                np.memmap(self.vectors_path, dtype=self.dtype, mode="w+", shape=(self.capacity, self.dim)).flush()
+                return self._map()
+
+            if self._meta("next_slot") is None:
+                # Stores written before slots were tracked in SQLite
+                used = {slot for (slot,) in self.db.execute("SELECT slot FROM entries")}
+                next_slot = max(used) + 1 if used else 0
+                self.db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)",
+                                    [(slot,) for slot in range(next_slot) if slot not in used])
+                self._set_meta("next_slot", next_slot)
+            self._resize()
+
+        return self._map()
+
+    def _resize(self) -> None:
+        """
+        Fit the store to max_entries, called inside a transaction.
+        """
+        if os.path.getsize(self.vectors_path) < self.capacity * self._row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(self.capacity * self._row_bytes)
+
+        next_slot = int(self._meta("next_slot") or 0)
+        if next_slot > self.capacity:
+            # The file keeps its size, processes still running with a larger cap may use those rows
+            dropped = self.db.execute("DELETE FROM entries WHERE slot >= ?", (self.capacity,)).rowcount
+            self.db.execute("DELETE FROM free_slots WHERE slot >= ?", (self.capacity,))
+            self._set_meta("next_slot", self.capacity)
+            logger.info(f"Embedding cache shrunk to {self.capacity} entries, dropped {dropped}")
+
+    def _map(self) -> np.memmap:
+        rows = os.path.getsize(self.vectors_path) // self._row_bytes
+        return np.memmap(self.vectors_path, dtype=self.dtype, mode="r+", shape=(rows, self.dim))
+
+    def _ensure_rows(self, slot: int) -> np.memmap:
+        # Another process with a larger cap may have grown the file since it was mapped
+        vectors = self.vectors
+        if slot >= vectors.shape[0]:
+            vectors = self.vectors = self._map()
+        return vectors
+
+    def _expire(self) -> None:
+        conditions = ["(generation IS NULL AND last_access < ?)"]
+        params = [time.time() - _PENDING_TIMEOUT]
+        if self.max_age > 0:
+            conditions.append("created < ?")
+            params.append(time.time() - self.max_age)
+        where = " OR ".join(conditions)
+
+        with self._transaction():
+            expired = self.db.execute(f"SELECT slot FROM entries WHERE {where}", params).fetchall()
+            self.db.execute(f"DELETE FROM entries WHERE {where}", params)
+            self.db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", expired)
+        if expired:
+            logger.info(f"Evicted {len(expired)} expired embeddings from cache")
+
+    def _allocate(self, count: int) -> List[int]:
+        """
+        Take count slots, called inside a transaction: freed slots first, then unused ones, then LRU evictions.
+        """
+        slots = [slot for (slot,) in self.db.execute("SELECT slot FROM free_slots ORDER BY slot LIMIT ?", (count,))]
+        self.db.executemany("DELETE FROM free_slots WHERE slot = ?", [(slot,) for slot in slots])
+
+        if len(slots) < count:
+            next_slot = int(self._meta("next_slot") or 0)
+            fresh = min(count - len(slots), self.capacity - next_slot)
+            if fresh > 0:
+                slots.extend(range(next_slot, next_slot + fresh))
+                self._set_meta("next_slot", next_slot + fresh)
+
+        if len(slots) < count:
+            # Rows still being written by another put are left alone
+            evicted = self.db.execute(
+                "SELECT key, slot FROM entries WHERE generation IS NOT NULL ORDER BY last_access LIMIT ?",
+                (count - len(slots),)
+            ).fetchall()
+            self.db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+            slots.extend(slot for _, slot in evicted)
+        return slots
+
+    @staticmethod
+    def _existing(db: sqlite3.Connection, keys: List[str], columns: str = "key") -> List[Tuple]:
+        rows: List[Tuple] = []
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(db.execute(f"SELECT {columns} FROM entries WHERE key IN ({placeholders})", batch))
+        return rows
+
+    def _write_touched(self) -> None:
+        # Called inside a transaction with self._lock held
+        touched, self._touched = self._touched, {}
+        if touched:
+            self.db.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                [(when, key) for key, when in touched.items()])
+
+    def _flush_touched(self) -> None:
+        with self._lock:
+            if self._touched:
+                with self._transaction():
+                    self._write_touched()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up cached vectors, returns only the keys that were found.
+        """
+        if not keys:
+            return {}
+
+        unique_keys = list(dict.fromkeys(keys))
+        db = self._reader()
+
+        # One read transaction for the lookup and the copy, it never takes the write lock
+        db.execute("BEGIN")
+        try:
+            entries = [entry for entry in self._existing(db, unique_keys, "key, slot, generation")
+                       if entry[2] is not None]
+            copies = {}
+            if entries:
+                vectors = self._ensure_rows(max(slot for _, slot, _ in entries))
+                copies = {key: np.array(vectors[slot], dtype=np.float32) for key, slot, _ in entries}
+        finally:
+            db.execute("COMMIT")
+
+        # Keep a row only if its entry did not change while it was copied, a writer
+        # unmaps a slot before overwriting it
+        found: Dict[str, np.ndarray] = {}
+        if entries:
+            current = {key: (slot, generation)
+                       for key, slot, generation in self._existing(db, list(copies), "key, slot, generation")}
+            found = {key: copies[key] for key, slot, generation in entries if current.get(key) == (slot, generation)}
+
+        now = time.time()
+        with self._lock:
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+            self._touched.update((key, now) for key in found)
+            flush = len(self._touched) >= _TOUCH_BATCH
+        if flush:
+            self._flush_touched()
+
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """
+        Store vectors, evicting the least recently used entries when the cache is full.
+        """
+        if not keys:
+            return
+
+        with self._lock:
+            now = time.time()
+            items = dict(zip(keys, vectors))
+            item_keys = list(items)
+
+            with self._transaction():
+                # Checked inside the transaction, another process may have stored (or be storing) some of them
+                existing = {key for (key,) in self._existing(self.db, item_keys)}
+                new_keys = [key for key in item_keys if key not in existing][:self.capacity]
+                if not new_keys:
+                    self._write_touched()
+                    return
+                slots = self._allocate(len(new_keys))
+                # Mapped without a generation until written: readers skip them and eviction leaves them alone
+                self.db.executemany(
+                    "INSERT INTO entries (key, slot, created, last_access, generation) VALUES (?, ?, ?, ?, NULL)",
+                    [(key, slot, now, now) for key, slot in zip(new_keys, slots)]
+                )
+
+            # Evicted slots are out of the table now, so no reader keeps what it copies from them
+            try:
+                target = self._ensure_rows(max(slots))
+                for key, slot in zip(new_keys, slots):
+                    target[slot] = items[key]
+            except BaseException:
+                with self._transaction():
+                    self.db.executemany("DELETE FROM entries WHERE key = ? AND slot = ?", list(zip(new_keys, slots)))
+                    self.db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)",
+                                        [(slot,) for slot in slots])
+                raise
+
+            with self._transaction():
+                generation = int(self._meta("next_generation") or 1)
+                self.db.executemany("UPDATE entries SET generation = ? WHERE key = ? AND slot = ?",
+                                    [(generation, key, slot) for key, slot in zip(new_keys, slots)])
+                self._set_meta("next_generation", generation + 1)
+                self._write_touched()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def flush(self) -> None:
+        self._flush_touched()
+        with self._lock:
+            self.vectors.flush()
+
+    def close(self) -> None:
+        self._flush_touched()
+        with self._lock:
+            self.vectors.flush()
+            for reader in self._readers:
+                reader.close()
+            self._readers = []
+            self.db.close()
@@ -1,21 +1,111 @@
+import threading
 import numpy as np
-from typing import List, Any
-import faiss
-from sentence_transformers import SentenceTransformer
+from typing import Dict, List, Any, Optional
 
 from modules.config import Config
+from modules.chunk_selector import create_chunk_selector
 from modules.logger import setup_logger
+from modules.embedding_batcher import EmbeddingBatcher
+from modules.embedding_cache import EmbeddingCache
 
 logger = setup_logger("embedding_engine")
 
+
+def load_embedding_model(config: Config, threads: int = 0):
+    """
+    Load the model for config.embedding_backend, anything with encode() and get_sentence_embedding_dimension().
+    """
+    if config.embedding_backend == "onnx":
+        from modules.onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(
+            config.embedding_model_name,
+            model_dir=config.onnx_model_dir,
+            quantize=config.onnx_quantize,
+            intra_op_threads=config.onnx_intra_op_threads or threads
+        )
+
+    if config.embedding_backend != "sentence_transformers":
+        logger.warning(f"Unknown embedding backend {config.embedding_backend}, using sentence_transformers")
+    # Imported here so process pool workers that import this module do not pull in torch
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(config.embedding_model_name)
+
+
 class EmbeddingEngine:
     """Generate embeddings of text and find representative chunks."""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, encode_pool=None):
         self.config = config
+        # Process pool that encodes uncached chunks with a model per worker, if set
+        self.encode_pool = encode_pool
         
-        logger.info(f"Loading embedding model: {config.embedding_model_name}")
-        self.embedding_model = SentenceTransformer(config.embedding_model_name)
+        # The model and the cache that depends on its dimension are loaded on first use,
+        # so a run where every paper is already done never imports torch
+        self._embedding_model = None
+        self._cache: Optional[EmbeddingCache] = None
+        self._load_lock = threading.Lock()
+
+        # Shared batcher so chunks from concurrent papers go through one encode call
+        self.batcher = None
+        if config.use_embedding_batcher and encode_pool is None:
+            self.batcher = EmbeddingBatcher(
+                self.encode,
+                batch_size=config.embedding_batch_size,
+                max_wait=config.embedding_batch_max_wait
+            )
+
+        self.selector = create_chunk_selector(config)
+
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            with self._load_lock:
+                if self._embedding_model is None:
+                    logger.info(f"Loading embedding model: {self.config.embedding_model_name} "
+                                f"({self.config.embedding_backend})")
+                    self._embedding_model = load_embedding_model(self.config)
+        return self._embedding_model
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        if self._cache is None and self.config.embedding_cache_dir:
+            dimension = self.dimension
+            with self._load_lock:
+                if self._cache is None:
+                    self._cache = EmbeddingCache(
+                        self.config.embedding_cache_dir,
+                        self.model_key,
+                        dimension,
+                        max_entries=self.config.embedding_cache_max_entries,
+                        max_age_days=self.config.embedding_cache_max_age_days,
+                        use_float16=self.config.embedding_cache_float16
+                    )
+        return self._cache
+
+    @property
+    def model_key(self) -> str:
+        """
+        Name the cached vectors are stored under, quantized ONNX vectors are kept apart from the originals.
+        """
+        if self.config.embedding_backend == "onnx":
+            precision = "int8" if self.config.onnx_quantize else "fp32"
+            return f"{self.config.embedding_model_name}|onnx-{precision}"
+        return self.config.embedding_model_name
+
+    @property
+    def dimension(self) -> int:
+        return self.embedding_model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a list of texts in batches with the embedding model.
+        """
+        return self.embedding_model.encode(
+            texts,
+            batch_size=self.config.embedding_batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
         
     def embed_chunks(self, chunks: List[str]) -> np.ndarray:
         """
@@ -23,40 +113,64 @@ class EmbeddingEngine:
         """
         if not chunks:
             return np.array([])
-        
-        embeddings = [self.embedding_model.encode(chunk) for chunk in chunks]
-        return np.array(embeddings)
+
+        if self.cache is None:
+            return self._embed_uncached(chunks)
+
+        keys = [EmbeddingCache.hash_text(chunk) for chunk in chunks]
+        cached = self.cache.get_many(keys)
+
+        # Only encode the chunks that missed the cache
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            missing_vectors = self._embed_uncached([chunks[i] for i in missing])
+            self.cache.put_many([keys[i] for i in missing], missing_vectors)
+            for i, vector in zip(missing, missing_vectors):
+                cached[keys[i]] = vector
+
+        return np.stack([np.asarray(cached[key], dtype=np.float32) for key in keys])
+
+    def _embed_uncached(self, chunks: List[str]) -> np.ndarray:
+        if self.encode_pool is not None:
+            return self.encode_pool.encode(chunks)
+
+        if self.batcher is not None:
+            return self.batcher.embed(chunks)
+
+        return np.asarray(self.encode(chunks))
+
+    def cache_stats(self) -> Dict[str, float]:
+        if self._cache is None:
+            return {}
+        return self._cache.stats()
+
+    def close(self) -> None:
+        if self.batcher is not None:
+            self.batcher.close()
+        if self._cache is not None:
+            self._cache.flush()
     
     def get_representative_chunks(self, chunks: List[str], embeddings: np.ndarray, num_chunks: int = 3) -> List[str]:
         """
-        Select representative chunks by clustering embeddings.
+        Select representative chunks from their embeddings, in document order.
         """
         if len(chunks) <= num_chunks or len(embeddings) == 0:
             return chunks
         
-        n_clusters = min(num_chunks, len(chunks))
-        
-        embedding_dim = embeddings.shape[1]
-        index = faiss.IndexFlatL2(embedding_dim)
+        indices = self.selector.select_indices(np.asarray(embeddings, dtype=np.float32), num_chunks)
+        return [chunks[idx] for idx in indices]
 
-        embeddings_float32 = embeddings.astype(np.float32)
-        
-        index.add(embeddings_float32)
-        
-        # clustering
-        kmeans = faiss.Kmeans(embedding_dim, n_clusters, niter=20)
-        kmeans.train(embeddings_float32)
-        
-        # get centroids
-        centroids = kmeans.centroids
-        
-        # Find chunks closest to centroids
-        _, centroid_chunk_indices = index.search(centroids, 1)
-        
-        representative_indices = list(set([idx[0] for idx in centroid_chunk_indices]))
-        
-        if len(representative_indices) < num_chunks:
-            remaining_indices = [i for i in range(len(chunks)) if i not in representative_indices]
-            representative_indices.extend(remaining_indices[:num_chunks - len(representative_indices)])
-        
-        return [chunks[idx] for idx in representative_indices]
\ No newline at end of file
+    def get_representative_chunks_batch(self, chunk_lists: List[List[str]], embeddings_list: List[np.ndarray],
+                                        num_chunks: int = 3) -> List[List[str]]:
+        """
+        Select representative chunks for several papers in one pass of the selector.
+        """
+        pending = [i for i, chunks in enumerate(chunk_lists) if len(chunks) > num_chunks and len(embeddings_list[i])]
+        selections = self.selector.select_batch(
+            [np.asarray(embeddings_list[i], dtype=np.float32) for i in pending], num_chunks
+        )
+
+        results = list(chunk_lists)
+        for i, indices in zip(pending, selections):
+            results[i] = [chunk_lists[i][idx] for idx in indices]
+        return results
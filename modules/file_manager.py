@@ -1,15 +1,56 @@
 import os
-import json
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 
 from modules.config import Config
 from modules.logger import setup_logger
+from modules.summarizer import is_fallback_summary
+from modules.codec import JsonCodec
+from modules.jsonl_store import ShardedJsonlWriter, iter_shard_records, list_shards
+from modules.run_manifest import RunManifest, STATUS_DONE, STATUS_FAILED, STATUS_FALLBACK, STATUS_IN_PROGRESS
+from modules.work_leases import WorkLeases, default_node_id
 
 logger = setup_logger("file_manager")
 
 class FileManager:
     def __init__(self, config: Config):
         self.config = config
+        self.codec = JsonCodec(config.json_backend, compact=config.json_compact)
+        self.node_id = config.node_id or default_node_id()
+        
+        # Distributed mode: nodes sharing output_dir claim inputs through lease files
+        self.leases = None
+        if config.distributed:
+            self.leases = WorkLeases(
+                config.lease_dir or os.path.join(config.output_dir, ".leases"),
+                node_id=self.node_id,
+                ttl=config.lease_ttl,
+                heartbeat_interval=config.lease_heartbeat_interval,
+                poll_interval=config.lease_poll_interval
+            )
+        
+        self.manifest = None
+        # Input signatures taken in mark_started, written to the manifest once the paper finishes
+        self._signatures: Dict[str, Tuple] = {}
+        self._signatures_lock = threading.Lock()
+        if config.use_run_manifest:
+            # SQLite is not safe to share between machines, so each node keeps its own
+            default_name = f".run_manifest.{self.node_id}.sqlite3" if self.leases is not None else ".run_manifest.sqlite3"
+            manifest_path = config.manifest_path or os.path.join(config.output_dir, default_name)
+            self.manifest = RunManifest(manifest_path)
+        
+        # Streaming mode reads JSONL shards and appends results to rotating output shards
+        self.streaming = config.io_mode == "jsonl"
+        self.writer = None
+        if self.streaming:
+            self.writer = ShardedJsonlWriter(
+                config.output_dir,
+                prefix=f"part-{self.node_id}" if self.leases is not None else "part",
+                max_records=config.output_shard_max_records,
+                flush_every=config.output_flush_every,
+                fsync=config.output_fsync,
+                encode=lambda record: self.codec.dumps(record, compact=True)
+            )
     
     def get_input_files(self) -> List[str]:
 
@@ -19,16 +60,47 @@ class FileManager:
         
         return [f for f in os.listdir(self.config.input_dir) if f.endswith('.json')]
     
-    def load_paper(self, filename: str) -> Optional[Dict[str, Any]]:
+    def iter_input_records(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Stream (record_id, raw JSON line) pairs from the input shards.
+        """
+        if not os.path.exists(self.config.input_dir):
+            logger.warning(f"{self.config.input_dir} does not exist")
+            return iter(())
+        
+        shards = list_shards(self.config.input_dir, self.config.input_shard_pattern)
+        logger.info(f"Found {len(shards)} input shards in {self.config.input_dir}")
+        return iter_shard_records(shards)
+    
+    def iter_leased_work(self) -> Iterator[Tuple[str, Optional[bytes]]]:
         """
-        Load a paper from a JSON file.
+        Work for this node in distributed mode: input files, or whole shards when streaming.
+        """
+        if self.streaming:
+            shards = [os.path.basename(path) for path in list_shards(self.config.input_dir, self.config.input_shard_pattern)]
+            logger.info(f"Found {len(shards)} input shards in {self.config.input_dir}")
+            # A shard is not handed out again once all of its records were attempted
+            return self.leases.iter_work(
+                shards, lambda shard: iter_shard_records([os.path.join(self.config.input_dir, shard)]),
+                mark_done=True, on_wait=self.writer.flush
+            )
+        # Finished files are recognised by their output, so failed ones stay open to other nodes
+        return self.leases.iter_work(sorted(self.get_input_files()), lambda filename: [(filename, None)])
+    
+    def load_paper(self, filename: str, record: Optional[bytes] = None) -> Optional[Dict[str, Any]]:
+        """
+        Load a paper from a JSON file, or decode it from a streamed record.
         """
         input_path = os.path.join(self.config.input_dir, filename)
         
         try:
-            with open(input_path, 'r', encoding='utf-8') as f:
-                paper = json.load(f)
-            return paper
+            if record is None:
+                with open(input_path, 'rb') as f:
+                    record = f.read()
+                if self.manifest is not None:
+                    self.input_read(filename, RunManifest.hash_bytes(record))
+            
+            return self.codec.decode_paper(record)
         except Exception as e:
             logger.error(f"Error loading {filename}: {str(e)}")
             return None
@@ -37,25 +109,97 @@ class FileManager:
         """
         Checks if a file is already processed or not
         """
+        skip = self._should_skip(filename)
+        if skip and self.leases is not None:
+            self.leases.item_finished(filename, True)
+        return skip
+    
+    def _should_skip(self, filename: str) -> bool:
         # Skip if force regenerate is enabled
         if self.config.force_regenerate:
             return False
         
-        # Check if the output file exists and has a summary
+        if self.manifest is not None:
+            if self.manifest.status(filename) is not None:
+                return self.manifest.is_done(filename, self._input_path(filename))
+            
+            # Outputs written before the manifest existed are checked once and recorded
+            if not self.streaming and self._has_summary(filename):
+                self._record(filename, STATUS_DONE)
+                return True
+            return False
+        
+        return not self.streaming and self._has_summary(filename)
+    
+    def _has_summary(self, filename: str) -> bool:
+        # Check if the output file exists and has a real (non fallback) summary
         output_path = os.path.join(self.config.output_dir, filename)
         if os.path.exists(output_path):
             try:
-                with open(output_path, 'r', encoding='utf-8') as f:
-                    existing = json.load(f)
-                    if "summary" in existing:
+                with open(output_path, 'rb') as f:
+                    existing = self.codec.loads(f.read())
+                    if not is_fallback_summary(existing.get("summary")):
                         return True
             except Exception:
                 pass
         
         return False
     
+    def _input_path(self, filename: str) -> str:
+        # Streamed records have no input file to stat or hash
+        return "" if self.streaming else os.path.join(self.config.input_dir, filename)
+    
+    def _record(self, filename: str, status: str, signature: Optional[Tuple] = None) -> None:
+        if self.manifest is not None:
+            self.manifest.record(filename, self._input_path(filename), status, signature)
+    
+    def mark_started(self, filename: str) -> None:
+        if self.manifest is None:
+            return
+        # Stat before the paper is read and hash the bytes that are read (input_read), so
+        # an input rewritten mid-run is never recorded as done with contents it was not
+        # summarized from, at worst it is processed again
+        signature = (None, None, None)
+        try:
+            stat = os.stat(self._input_path(filename))
+            signature = (stat.st_size, stat.st_mtime_ns, None)
+        except OSError:
+            pass
+        with self._signatures_lock:
+            self._signatures[filename] = signature
+        self._record(filename, STATUS_IN_PROGRESS, signature)
+    
+    def input_read(self, filename: str, content_hash: str) -> None:
+        """
+        Complete the signature taken by mark_started with the hash of the bytes read for the paper.
+        """
+        with self._signatures_lock:
+            signature = self._signatures.get(filename)
+            if signature is not None:
+                self._signatures[filename] = signature[:2] + (content_hash,)
+    
+    def mark_finished(self, filename: str, summary: Dict[str, Any]) -> None:
+        """
+        Record a saved paper, fallback summaries stay eligible for a retry.
+        """
+        status = STATUS_FALLBACK if is_fallback_summary(summary) else STATUS_DONE
+        with self._signatures_lock:
+            signature = self._signatures.pop(filename, None)
+        self._record(filename, status, signature)
+        if self.leases is not None:
+            self.leases.item_finished(filename, status == STATUS_DONE)
+    
+    def mark_failed(self, filename: str) -> None:
+        with self._signatures_lock:
+            signature = self._signatures.pop(filename, None)
+        self._record(filename, STATUS_FAILED, signature)
+        if self.leases is not None:
+            self.leases.item_finished(filename, False)
+    
     def save_processed_paper(self, filename: str, paper: Dict[str, Any], summary: Dict[str, Any]) -> bool:
-
+        """
+        Write the output record and mark the input finished once it is on disk.
+        """
         output_path = os.path.join(self.config.output_dir, filename)
         
         try:
@@ -75,11 +219,29 @@ class FileManager:
                 "summary": summary
             }
 
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(output_obj, f, indent=2, ensure_ascii=False)
+            if self.writer is not None:
+                output_obj["id"] = filename
+                self.writer.write(output_obj, on_durable=lambda: self.mark_finished(filename, summary))
+                return True
+
+            # Write to a temporary file first so an interrupted run never leaves a partial output
+            tmp_path = f"{output_path}.tmp.{self.node_id}.{threading.get_ident()}"
+            with open(tmp_path, 'wb') as f:
+                f.write(self.codec.dumps(output_obj))
+            os.replace(tmp_path, output_path)
             
+            self.mark_finished(filename, summary)
             return True
             
         except Exception as e:
             logger.error(f"Error saving {filename}: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    def close(self) -> None:
+        """
+        Flush buffered output shards, then give up any leases still held.
+        """
+        if self.writer is not None:
+            self.writer.close()
+        if self.leases is not None:
+            self.leases.close()
@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from modules.logger import setup_logger
+
+logger = setup_logger("input_watcher")
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+# "closed" is a close after writing
+_CHANGE_EVENTS = ("created", "modified", "moved", "closed")
+
+
+def is_input_file(name: str) -> bool:
+    return name.endswith(".json")
+
+
+class _EventHandler(FileSystemEventHandler):
+
+    def __init__(self, watcher: "InputWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event) -> None:
+        if event.is_directory:
+            return
+        if event.event_type == "deleted":
+            self.watcher.forget(os.path.basename(event.src_path))
+            return
+        # Newer watchdog also reports opened and closed_no_write, the app's own reads would requeue every file
+        if event.event_type not in _CHANGE_EVENTS:
+            return
+        # Moves report the new name, which is how writers publish a finished file
+        path = getattr(event, "dest_path", None) or event.src_path
+        if os.path.dirname(os.path.abspath(path)) == self.watcher.directory:
+            self.watcher.touch(os.path.basename(path))
+
+
+class InputWatcher:
+    """
+    New and changed input files in a directory, handed out in micro-batches.
+
+    Uses watchdog (inotify on Linux) when it is installed and polls the directory
+    every poll_interval seconds otherwise. A file is only handed out once it has
+    not changed for debounce seconds, so files still being written are not read
+    half done. A batch goes out once every pending file has settled, when
+    batch_size files are ready, or when the oldest one has waited max_wait
+    seconds. Files already in the directory at start() are not reported.
+    """
+
+    def __init__(self, directory: str, backend: str = "auto", poll_interval: float = 2.0,
+                 debounce: float = 1.0, max_wait: float = 10.0, batch_size: int = 64):
+        self.directory = os.path.abspath(directory)
+        self.backend = self._resolve_backend(backend)
+        self.poll_interval = max(0.05, float(poll_interval))
+        self.debounce = max(0.0, float(debounce))
+        self.max_wait = max(self.debounce, float(max_wait))
+        self.batch_size = max(1, int(batch_size))
+
+        # name -> (first seen, last change), monotonic
+        self._pending: Dict[str, Tuple[float, float]] = {}
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._observer = None
+        self._last_scan = 0.0
+
+    @staticmethod
+    def _resolve_backend(backend: str) -> str:
+        if backend not in ("auto", "watchdog", "poll"):
+            raise ValueError(f"Unknown watch backend: {backend}")
+        if backend == "poll":
+            return backend
+        if Observer is None:
+            if backend == "watchdog":
+                logger.warning("watchdog is not installed, falling back to polling")
+            return "poll"
+        return "watchdog"
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if self.backend == "watchdog":
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.directory, recursive=False)
+            self._observer.start()
+        else:
+            self._snapshot = self._scan()
+            self._last_scan = time.monotonic()
+        logger.info(f"Watching {self.directory} ({self.backend})")
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def touch(self, name: str) -> None:
+        if not is_input_file(name):
+            return
+        now = time.monotonic()
+        with self._lock:
+            first_seen = self._pending.get(name, (now, now))[0]
+            self._pending[name] = (first_seen, now)
+
+    def forget(self, name: str) -> None:
+        with self._lock:
+            self._pending.pop(name, None)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not is_input_file(entry.name):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def _poll(self) -> None:
+        snapshot = self._scan()
+        for name, signature in snapshot.items():
+            if self._snapshot.get(name) != signature:
+                self.touch(name)
+        for name in self._snapshot.keys() - snapshot.keys():
+            self.forget(name)
+        self._snapshot = snapshot
+        self._last_scan = time.monotonic()
+
+    def _take_ready(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            ready = sorted((first_seen, name) for name, (first_seen, changed) in self._pending.items()
+                           if now - changed >= self.debounce)
+            if not ready:
+                return []
+            settled = len(ready) == len(self._pending)
+            if not (settled or len(ready) >= self.batch_size or now - ready[0][0] >= self.max_wait):
+                return []
+            batch = [name for _, name in ready[:self.batch_size]]
+            for name in batch:
+                del self._pending[name]
+        return batch
+
+    def next_batch(self, stop: threading.Event) -> List[str]:
+        """
+        Block until a batch is ready, an empty list once stop is set.
+        """
+        tick = min(self.poll_interval, max(0.05, self.debounce / 4))
+        while not stop.is_set():
+            if self.backend == "poll" and time.monotonic() - self._last_scan >= self.poll_interval:
+                self._poll()
+            batch = self._take_ready()
+            if batch:
+                return batch
+            stop.wait(tick)
+        return []
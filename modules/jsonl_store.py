@@ -0,0 +1,156 @@
+import os
+import glob
+import gzip
+import json
+import time
+import threading
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from modules.logger import setup_logger
+
+logger = setup_logger("jsonl_store")
+
+
+def open_shard(path: str) -> IO[bytes]:
+    """
+    Open a JSONL shard for binary reading, decompressing .gz and .zst files.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"Reading {path} requires the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def list_shards(input_dir: str, pattern: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(input_dir, pattern)))
+
+
+def iter_shard_records(paths: List[str]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yield (record_id, raw_line) for every non-empty line, record ids are "<shard>:<line>".
+    """
+    for path in paths:
+        shard = os.path.basename(path)
+        try:
+            with open_shard(path) as f:
+                # zstd readers are raw streams, wrap them so we can iterate lines
+                reader = _LineReader(f) if path.endswith(".zst") else f
+                for line_no, line in enumerate(reader, start=1):
+                    line = line.strip()
+                    if line:
+                        yield f"{shard}:{line_no}", line
+        except Exception as e:
+            logger.error(f"Error reading shard {path}: {str(e)}")
+
+
+class _LineReader:
+    """Iterate lines of a binary stream that only supports read()."""
+
+    def __init__(self, stream: IO[bytes], block_size: int = 1 << 20):
+        self.stream = stream
+        self.block_size = block_size
+
+    def __iter__(self) -> Iterator[bytes]:
+        pending = b""
+        while True:
+            block = self.stream.read(self.block_size)
+            if not block:
+                break
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop()
+            yield from lines
+        if pending:
+            yield pending
+
+
+class ShardedJsonlWriter:
+    """
+    Append records to rotating JSONL output shards.
+
+    Records are buffered and flushed (and optionally fsynced) every flush_every
+    records. Callbacks passed to write() run only once their record is on disk,
+    so callers can mark work as done without risking loss on a crash.
+    """
+
+    def __init__(self, output_dir: str, prefix: str = "part", max_records: int = 10000,
+                 flush_every: int = 100, fsync: bool = True,
+                 encode: Optional[Callable[[Dict[str, Any]], bytes]] = None):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.max_records = max(1, int(max_records))
+        self.flush_every = max(1, int(flush_every))
+        self.fsync = fsync
+        self.encode = encode or (lambda record: json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+        self._lock = threading.Lock()
+        self._file: Optional[IO[bytes]] = None
+        self._shard_records = 0
+        self._shard_index = 0
+        self._pending: List[Callable[[], None]] = []
+        self._unflushed = 0
+        self._run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+    def _open_next_shard(self) -> None:
+        self._shard_index += 1
+        path = os.path.join(self.output_dir, f"{self.prefix}-{self._run_id}-{self._shard_index:05d}.jsonl")
+        self._file = open(path, "ab", buffering=1 << 20)
+        self._shard_records = 0
+        logger.info(f"Writing output shard {path}")
+
+    def write(self, record: Dict[str, Any], on_durable: Optional[Callable[[], None]] = None) -> None:
+        line = self.encode(record) + b"\n"
+        callbacks: List[Callable[[], None]] = []
+
+        with self._lock:
+            if self._file is None:
+                self._open_next_shard()
+
+            self._file.write(line)
+            self._shard_records += 1
+            self._unflushed += 1
+            if on_durable is not None:
+                self._pending.append(on_durable)
+
+            if self._unflushed >= self.flush_every or self._shard_records >= self.max_records:
+                callbacks = self._flush_locked()
+            if self._shard_records >= self.max_records:
+                self._file.close()
+                self._file = None
+
+        self._run_callbacks(callbacks)
+
+    def _flush_locked(self) -> List[Callable[[], None]]:
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        self._unflushed = 0
+        callbacks, self._pending = self._pending, []
+        return callbacks
+
+    @staticmethod
+    def _run_callbacks(callbacks: List[Callable[[], None]]) -> None:
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Output durability callback failed: {e}")
+
+    def flush(self) -> None:
+        with self._lock:
+            callbacks = self._flush_locked()
+        self._run_callbacks(callbacks)
+
+    def close(self) -> None:
+        with self._lock:
+            callbacks = self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._run_callbacks(callbacks)
@@ -0,0 +1,184 @@
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# Text a model may write before the JSON, such as a code fence or a short preamble
+_PREFIX_MAX_CHARS = 200
+_TYPE_STARTS = {"string": '"', "array": "[", "object": "{"}
+_CLOSERS = {"}": "{", "]": "["}
+
+
+class StreamAbort(ValueError):
+    """Raised when a streamed response goes off-schema or runs over its length cap."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class JsonStreamValidator:
+    """
+    Checks a JSON summary while it streams in, without waiting for the end.
+
+    The summary objects are the root object, or each object in the root array
+    when array=True. Their keys must be in fields, each value must start with the
+    JSON type its field names (None accepts any type), and a single summary must
+    have every field. The response is complete once the root value closes, and
+    text is the JSON alone, without fences or anything after it.
+    """
+
+    def __init__(self, fields: Dict[str, Optional[str]], array: bool = False):
+        self.fields = fields
+        self.array = array
+        self.complete = False
+
+        self._parts: List[str] = []
+        self._prefix = ""
+        self._started = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_chars: Optional[List[str]] = None
+        self._key: Optional[str] = None
+        self._expect_value: Optional[str] = None
+        self._seen: set = set()
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, text: str) -> None:
+        if self.complete:
+            return
+        if not self._started:
+            self._prefix += text
+            starts = [i for i in (self._prefix.find("{"), self._prefix.find("[") if self.array else -1) if i >= 0]
+            if not starts:
+                if len(self._prefix) > _PREFIX_MAX_CHARS:
+                    raise StreamAbort("no_json", f"No JSON in the first {len(self._prefix)} characters")
+                return
+            self._started = True
+            text = self._prefix[min(starts):]
+
+        for position, char in enumerate(text):
+            self._step(char)
+            if self.complete:
+                text = text[:position + 1]
+                break
+        self._parts.append(text)
+
+    def _summary_level(self) -> bool:
+        # Only keys directly inside a summary object are checked
+        if self.array:
+            return len(self._stack) == 2 and self._stack[0] == "["
+        return len(self._stack) == 1
+
+    def _step(self, char: str) -> None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._key_chars is not None:
+                    self._end_key("".join(self._key_chars))
+                    self._key_chars = None
+                return
+            if self._key_chars is not None:
+                self._key_chars.append(char)
+            return
+
+        if char.isspace():
+            return
+
+        if self._expect_value is not None:
+            expected, self._expect_value = self._expect_value, None
+            if char != _TYPE_STARTS.get(expected, char):
+                raise StreamAbort("wrong_type", f"Value of {self._key!r} is not a JSON {expected}")
+
+        if char == '"':
+            self._in_string = True
+            self._key_chars = [] if self._expect_key else None
+            self._expect_key = False
+        elif char in "{[":
+            self._stack.append(char)
+            self._expect_key = char == "{" and self._summary_level()
+            if self._expect_key:
+                self._seen = set()
+        elif char in "}]":
+            if not self._stack or self._stack[-1] != _CLOSERS[char]:
+                raise StreamAbort("malformed", f"Unbalanced {char!r} in response")
+            if char == "}" and self._summary_level() and not self.array:
+                missing = [key for key in self.fields if key not in self._seen]
+                if missing:
+                    raise StreamAbort("missing_keys", f"Summary is missing {', '.join(missing)}")
+            self._stack.pop()
+            self._expect_key = False
+            self.complete = not self._stack
+        elif char == ",":
+            self._expect_key = self._stack[-1] == "{" and self._summary_level()
+        elif char == ":" and self._key is not None and self._summary_level():
+            self._expect_value = self.fields.get(self._key)
+
+    def _end_key(self, key: str) -> None:
+        if key not in self.fields:
+            raise StreamAbort("unknown_key", f"Unexpected key {key!r} in summary")
+        self._seen.add(key)
+        self._key = key
+
+
+class StreamReader:
+    """
+    Consumes the chunks of a streamed chat completion: validates the content as
+    it arrives, enforces the completion token cap and times the first token.
+    """
+
+    def __init__(self, validator: JsonStreamValidator, max_tokens: int, start: float):
+        self.validator = validator
+        self.max_tokens = int(max_tokens)
+        self.start = start
+        self.first_token: Optional[float] = None
+        self.usage: Any = None
+        self.deltas = 0
+        self.chars = 0
+
+    @property
+    def tokens(self) -> int:
+        # Providers mostly send one token per delta, the character estimate covers larger pieces
+        return max(self.deltas, self.chars // 4)
+
+    def feed(self, chunk: Any) -> bool:
+        """
+        Handle one chunk, True once the rest of the stream can be dropped.
+        """
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+        choices = getattr(chunk, "choices", None)
+        content = choices[0].delta.content if choices and choices[0].delta is not None else None
+
+        if content:
+            if self.first_token is None:
+                self.first_token = time.perf_counter() - self.start
+            self.deltas += 1
+            self.chars += len(content)
+            if self.tokens > self.max_tokens:
+                if self.validator.complete:
+                    return True
+                raise StreamAbort("length", f"Response passed {self.max_tokens} tokens")
+            self.validator.feed(content)
+
+        # Reading on after the JSON picks up the usage chunk, the cap stops a model that keeps writing
+        return self.validator.complete and self.usage is not None
+
+    def finish(self) -> str:
+        if not self.validator.complete:
+            raise StreamAbort("truncated", "Stream ended before the JSON was complete")
+        return self.validator.text
+
+    def usage_or_estimate(self) -> Any:
+        # Usage comes in the last chunk, which is not read when the stream is cut short
+        if self.usage is not None:
+            return self.usage
+        return SimpleNamespace(prompt_tokens=None, completion_tokens=self.tokens, total_tokens=None)
@@ -12,7 +12,8 @@ def setup_logger(name: str, log_file: Optional[str] = None, level=logging.INFO)
     
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     
-    file_handler = logging.FileHandler(log_file)
+    # The file is only opened on the first record, importing a module should not touch the disk
+    file_handler = logging.FileHandler(log_file, delay=True)
     file_handler.setFormatter(formatter)
     
     console_handler = logging.StreamHandler()
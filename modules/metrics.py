@@ -0,0 +1,403 @@
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.config import Config
+from modules.logger import setup_logger
+
+logger = setup_logger("metrics")
+
+PREFIX = "research_agent_"
+# Seconds, from sub-millisecond cache lookups up to slow LLM calls
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+# Completion tokens per second while streaming
+RATE_BUCKETS = (5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+TOKEN_BUCKETS = (128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192, 16384, 32768)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-th quantile, inf beyond the last bucket.
+        """
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target and self.count:
+                return bound
+        return float("inf")
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "papers", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str, papers: Tuple[str, ...]):
+        self.metrics = metrics
+        self.stage = stage
+        self.papers = papers
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics._end_span(self, time.perf_counter() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """
+    In-process metrics registry with optional per-paper traces.
+
+    Stage timings go to the research_agent_stage_seconds histogram, labelled by
+    stage. Counters, gauges and histograms take free-form labels, and collectors
+    registered with add_collector supply gauges (cache hit rates, queue depths)
+    read when metrics are exported. Exports are Prometheus text, written to a
+    file every interval seconds and/or served on /metrics. With a trace path,
+    every paper's spans are appended to it as one JSON line once it finishes.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_path: Optional[str] = None, file_path: Optional[str] = None,
+                 port: int = 0, interval: float = 15.0, host: str = "127.0.0.1"):
+        self.trace_path = trace_path
+        self.file_path = file_path
+        self.interval = max(1.0, float(interval))
+
+        self.counters: Dict[Key, float] = {}
+        self.gauges: Dict[Key, float] = {}
+        self.histograms: Dict[Key, Histogram] = {}
+        self.collectors: List[Callable[[], Dict[str, float]]] = []
+        self._started: Dict[str, float] = {}
+        self._traces: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._trace_lock = threading.Lock()
+
+        self._trace_file = None
+        if trace_path:
+            directory = os.path.dirname(trace_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._trace_file = open(trace_path, "a", encoding="utf-8")
+
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        if file_path:
+            self._writer = threading.Thread(target=self._write_loop, name="metrics-writer", daemon=True)
+            self._writer.start()
+
+        self._server: Optional[ThreadingHTTPServer] = None
+        if port:
+            # Loopback unless metrics_host says otherwise, the endpoint has no authentication
+            self._server = _MetricsServer((host, int(port)), self)
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Serving metrics on {host}:{self._server.server_address[1]}")
+
+    def inc(self, name: str, amount: float = 1, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = TIME_BUCKETS, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def add_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        """
+        Register a callable returning {gauge name: value}, read at every export.
+        """
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def counter(self, name: str, **labels: Any) -> float:
+        with self._lock:
+            return self.counters.get(_key(name, labels), 0)
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        with self._lock:
+            return self.histograms.get(_key(name, labels))
+
+    def span(self, stage: str, *papers: str) -> _Span:
+        """
+        Time a block as one call of stage, attributed to the traces of papers.
+        """
+        return _Span(self, stage, papers)
+
+    def _end_span(self, span: _Span, seconds: float) -> None:
+        self.observe("stage_seconds", seconds, stage=span.stage)
+        if self._trace_file is not None and span.papers:
+            entry = {"stage": span.stage, "start": round(span.start, 6), "seconds": round(seconds, 6)}
+            with self._trace_lock:
+                for paper in span.papers:
+                    self._traces.setdefault(paper, []).append(dict(entry))
+
+    def start_paper(self, paper: str) -> None:
+        self._started[paper] = time.perf_counter()
+
+    def finish_paper(self, paper: str, status: str) -> None:
+        """
+        Record a paper's end-to-end latency and outcome, and write its trace.
+        """
+        start = self._started.pop(paper, None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        self.observe("paper_seconds", seconds)
+        self.inc("papers_total", status=status)
+
+        if self._trace_file is not None:
+            with self._trace_lock:
+                spans = self._traces.pop(paper, [])
+                for entry in spans:
+                    entry["start"] = round(entry["start"] - start, 6)
+                line = json.dumps({"paper": paper, "status": status, "seconds": round(seconds, 6), "spans": spans})
+                self._trace_file.write(line + "\n")
+
+    def to_prometheus(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        gauges: Dict[Key, float] = {}
+        # A copy, collectors can be removed while the server thread exports
+        for collector in list(self.collectors):
+            try:
+                for name, value in collector().items():
+                    gauges[_key(name, {})] = float(value)
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+        with self._lock:
+            counters = dict(self.counters)
+            gauges.update(self.gauges)
+            histograms = {key: (h.buckets, list(h.counts), h.count, h.sum) for key, h in self.histograms.items()}
+
+        lines: List[str] = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            declare(name, "counter")
+            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), value in sorted(gauges.items()):
+            declare(name, "gauge")
+            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), (buckets, counts, count, total) in sorted(histograms.items()):
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Calls, total seconds and approximate p50/p95 per stage, for logging at the end of a run.
+        """
+        with self._lock:
+            stages = {dict(labels).get("stage"): h for (name, labels), h in self.histograms.items()
+                      if name == "stage_seconds"}
+            return {
+                stage: {"calls": h.count, "seconds": round(h.sum, 3),
+                        "p50_le": h.quantile(0.5), "p95_le": h.quantile(0.95)}
+                for stage, h in sorted(stages.items())
+            }
+
+    def write(self, path: Optional[str] = None) -> None:
+        """
+        Write the Prometheus text to path (file_path by default), replacing it atomically.
+        """
+        path = path or self.file_path
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        partial = f"{path}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(partial, path)
+
+    def _write_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except Exception as e:
+                logger.warning(f"Failed to write metrics to {self.file_path}: {e}")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+        try:
+            self.write()
+        except Exception as e:
+            logger.warning(f"Failed to write metrics to {self.file_path}: {e}")
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._trace_file is not None:
+            with self._trace_lock:
+                self._trace_file.close()
+                self._trace_file = None
+
+
+class NullMetrics(Metrics):
+    """
+    Metrics turned off: every call is a no-op and spans share one empty context manager.
+    """
+
+    enabled = False
+
+    def __init__(self):
+        self.collectors = []
+
+    def inc(self, name: str, amount: float = 1, **labels: Any) -> None:
+        pass
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        pass
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = TIME_BUCKETS, **labels: Any) -> None:
+        pass
+
+    def add_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        pass
+
+    def remove_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        pass
+
+    def counter(self, name: str, **labels: Any) -> float:
+        return 0
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        return None
+
+    def span(self, stage: str, *papers: str) -> _NullSpan:
+        return _NULL_SPAN
+
+    def start_paper(self, paper: str) -> None:
+        pass
+
+    def finish_paper(self, paper: str, status: str) -> None:
+        pass
+
+    def to_prometheus(self) -> str:
+        return ""
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        return {}
+
+    def write(self, path: Optional[str] = None) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    server: "_MetricsServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0].rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        payload = self.server.metrics.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], metrics: Metrics):
+        super().__init__(address, _MetricsHandler)
+        self.metrics = metrics
+
+
+def create_metrics(config: Config) -> Metrics:
+    """
+    Metrics as configured, or a no-op registry when metrics_enabled is off.
+    """
+    if not config.metrics_enabled:
+        return NullMetrics()
+    return Metrics(
+        trace_path=config.metrics_trace_path,
+        file_path=config.metrics_file,
+        port=config.metrics_port,
+        interval=config.metrics_interval,
+        host=config.metrics_host
+    )
@@ -0,0 +1,154 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.config import Config
+from modules.logger import setup_logger
+from modules.metrics import Metrics
+from modules.prompt_builder import SUMMARY_KEYS
+from modules.summarizer import Summarizer, create_summarizer
+
+logger = setup_logger("model_comparison")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile, 0 for no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def is_valid_summary(summary: Any) -> bool:
+    return isinstance(summary, dict) and all(summary.get(key) for key in SUMMARY_KEYS)
+
+
+class ModelComparison:
+    """
+    Summarize one sample of papers with several models side by side.
+
+    Papers come in already reduced to their representative chunks, so every
+    model sees the same prompts. Models run concurrently, each with its own
+    config copy, client and metrics, so a running app is not affected. The
+    summary cache is bypassed unless use_cache is set, so latency and cost are
+    real requests. Nothing is written to output_dir.
+    """
+
+    def __init__(self, config: Config, models: List[Dict[str, Any]], concurrency: int = 2, use_cache: bool = False):
+        self.config = config
+        self.models = models
+        self.concurrency = max(1, int(concurrency))
+        self.use_cache = use_cache
+
+    def model_config(self, model: Dict[str, Any]) -> Config:
+        overrides = dict(model.get("config") or {})
+        overrides.update(model_name=model["name"], rate_limit_pause=0, llm_batch_enabled=False, metrics_enabled=False)
+        if not self.use_cache:
+            overrides["cache_dir"] = None
+        return self.config.copy(**overrides)
+
+    def run(self, papers: List[Tuple[Dict[str, Any], List[str]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Results per model name for (paper_content, representative_chunks) pairs.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, len(self.models)), thread_name_prefix="compare") as executor:
+            futures = {model["name"]: executor.submit(self.evaluate, model, papers) for model in self.models}
+            return {name: future.result() for name, future in futures.items()}
+
+    def evaluate(self, model: Dict[str, Any], papers: List[Tuple[Dict[str, Any], List[str]]]) -> Dict[str, Any]:
+        metrics = Metrics()
+        summarizer = create_summarizer(self.model_config(model), metrics=metrics)
+        logger.info(f"Evaluating {model['name']} on {len(papers)} papers")
+        # Import openai and build the client before any request is timed
+        summarizer.client
+
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                outcomes = list(executor.map(lambda paper: self._summarize(summarizer, *paper), papers))
+        finally:
+            summarizer.close()
+        return self.report(model, metrics, outcomes, time.perf_counter() - start)
+
+    def _summarize(self, summarizer: Summarizer, paper_content: Dict[str, Any],
+                   representative_chunks: List[str]) -> Dict[str, Any]:
+        title = paper_content.get("title", "")
+        cache_key = summarizer.cache_key(paper_content, representative_chunks)
+        if summarizer.load_from_cache(cache_key):
+            return {"status": "cached"}
+
+        prompt = summarizer.build_messages(paper_content, representative_chunks)
+        start = time.perf_counter()
+        try:
+            response_text = summarizer.complete(prompt, title)
+        except Exception as e:
+            logger.error(f"{summarizer.config.model_name} failed on {title}: {str(e)}")
+            return {"status": "error"}
+        seconds = time.perf_counter() - start
+
+        try:
+            summary = summarizer.parse_response(response_text)
+        except Exception:
+            summary = None
+        valid = is_valid_summary(summary)
+        if valid:
+            summarizer.save_to_cache(cache_key, summary)
+
+        return {
+            "status": "valid" if valid else "invalid",
+            "seconds": seconds,
+            "prompt_tokens": prompt["tokens"]["total"],
+            "completion_chars": len(response_text or "")
+        }
+
+    def report(self, model: Dict[str, Any], metrics: Metrics, outcomes: List[Dict[str, Any]],
+               wall_seconds: float) -> Dict[str, Any]:
+        name = model["name"]
+        counts = {status: sum(1 for o in outcomes if o["status"] == status)
+                  for status in ("valid", "invalid", "error", "cached")}
+        answered = [o for o in outcomes if "seconds" in o]
+        latencies = [o["seconds"] for o in answered]
+        sent = len(outcomes) - counts["cached"]
+
+        # Provider usage when reported, otherwise the prompt estimate and about four characters per token
+        prompt_tokens = metrics.counter("llm_prompt_tokens_total", model=name) \
+            or sum(o["prompt_tokens"] for o in answered)
+        completion_tokens = metrics.counter("llm_completion_tokens_total", model=name) \
+            or sum(o["completion_chars"] for o in answered) // 4
+        requests = metrics.histogram("llm_request_seconds", model=name)
+        request_seconds = requests.sum if requests is not None else sum(latencies)
+        ttft = metrics.histogram("llm_ttft_seconds", model=name)
+        cost = (prompt_tokens * float(model.get("input_cost", 0)) +
+                completion_tokens * float(model.get("output_cost", 0))) / 1e6
+
+        return {
+            "description": model.get("description", name),
+            "papers": len(outcomes),
+            "valid": counts["valid"],
+            "invalid": counts["invalid"],
+            "errors": counts["error"],
+            "cached": counts["cached"],
+            "cache": "used" if self.use_cache else "bypassed",
+            "valid_rate": round(counts["valid"] / sent, 3) if sent else 0.0,
+            "p50_seconds": round(percentile(latencies, 0.50), 3),
+            "p95_seconds": round(percentile(latencies, 0.95), 3),
+            "p99_seconds": round(percentile(latencies, 0.99), 3),
+            "ttft_seconds": round(ttft.sum / ttft.count, 3) if ttft is not None and ttft.count else None,
+            "tokens_per_second": round(completion_tokens / request_seconds, 1) if request_seconds else 0.0,
+            "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": int(completion_tokens),
+            "cost_per_paper": round(cost / sent, 6) if sent else 0.0,
+            "wall_seconds": round(wall_seconds, 2)
+        }
+
+    @staticmethod
+    def recommend(results: Dict[str, Dict[str, Any]], min_valid_rate: float) -> Optional[str]:
+        """
+        The model with the lowest median latency among those at or above min_valid_rate.
+        """
+        acceptable = [(result["p50_seconds"], name) for name, result in results.items()
+                      if result["valid"] and result["valid_rate"] >= min_valid_rate]
+        return min(acceptable)[1] if acceptable else None
@@ -0,0 +1,188 @@
+import os
+import json
+import shutil
+import inspect
+import hashlib
+import tempfile
+from typing import Any, Dict, List
+
+import numpy as np
+
+from modules.logger import setup_logger
+
+logger = setup_logger("onnx_embedder")
+
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def export_onnx_model(model_name: str, model_dir: str, quantize: bool = True) -> str:
+    """
+    Export a sentence-transformers model to ONNX, optionally with dynamic int8 weights.
+
+    The transformer is exported on its own (token embeddings out), pooling and
+    normalization are read from the model and redone in NumPy. The result goes
+    to <model_dir>/<model hash>/ and is reused on later calls, returns that directory.
+    """
+    model_key = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16]
+    target = os.path.join(model_dir, model_key)
+    if not os.path.exists(os.path.join(target, "meta.json")):
+        _export(model_name, model_dir, model_key, target)
+
+    int8_path = os.path.join(target, "model.int8.onnx")
+    if quantize and not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"Quantizing {model_name} to int8")
+        partial = f"{int8_path}.{os.getpid()}.tmp"
+        quantize_dynamic(os.path.join(target, "model.onnx"), partial, weight_type=QuantType.QInt8)
+        os.replace(partial, int8_path)
+
+    return target
+
+
+def _pooling_mode(st_model) -> str:
+    pooling = next((module for module in st_model if type(module).__name__ == "Pooling"), None)
+    if pooling is None:
+        return "mean"
+    # sentence-transformers 6 keeps the mode as an attribute, older versions only have the getter
+    mode = getattr(pooling, "pooling_mode", None) or pooling.get_pooling_mode_str()
+    if mode not in ("mean", "cls", "max"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {mode}")
+    return mode
+
+
+def _export(model_name: str, model_dir: str, model_key: str, target: str) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    logger.info(f"Exporting {model_name} to ONNX in {target}")
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs)))[0]
+
+    example = tokenizer(["An example sentence to trace the model with."], padding=True, return_tensors="pt")
+    input_names = [name for name in _INPUT_NAMES if name in example]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["token_embeddings"]}
+
+    os.makedirs(model_dir, exist_ok=True)
+    # Built next to the target and renamed into place, so concurrent exports never see a partial model
+    staging = tempfile.mkdtemp(prefix=f".{model_key}-", dir=model_dir)
+    try:
+        fp32_path = os.path.join(staging, "model.onnx")
+        export_args = dict(input_names=input_names, output_names=["token_embeddings"],
+                           dynamic_axes=dynamic_axes, opset_version=14)
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            # The TorchScript exporter, newer torch defaults to dynamo which needs onnxscript
+            export_args["dynamo"] = False
+        with torch.no_grad():
+            torch.onnx.export(TokenEmbeddings(), tuple(example[name] for name in input_names), fp32_path,
+                              **export_args)
+
+        tokenizer.save_pretrained(staging)
+        meta = {
+            "model_name": model_name,
+            "dimension": st_model.get_sentence_embedding_dimension(),
+            "max_seq_length": st_model.max_seq_length,
+            "pad_token_id": tokenizer.pad_token_id or 0,
+            "pad_token": tokenizer.pad_token or "[PAD]",
+            "pooling": _pooling_mode(st_model),
+            "normalize": any(type(module).__name__ == "Normalize" for module in st_model),
+            "inputs": input_names
+        }
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another process finished the same export first
+            shutil.rmtree(staging, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+class OnnxEmbedder:
+    """
+    CPU embedding model running an exported sentence-transformers model with onnxruntime.
+
+    Mirrors the parts of the SentenceTransformer interface EmbeddingEngine uses
+    (encode and get_sentence_embedding_dimension). Only onnxruntime, tokenizers
+    and NumPy are needed once the model has been exported; the export itself
+    needs torch and sentence_transformers and runs once per model.
+    """
+
+    def __init__(self, model_name: str, model_dir: str = "onnx_models", quantize: bool = True,
+                 intra_op_threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.path = export_onnx_model(model_name, model_dir, quantize=quantize)
+
+        with open(os.path.join(self.path, "meta.json")) as f:
+            self.meta: Dict[str, Any] = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.meta["pad_token_id"], pad_token=self.meta["pad_token"])
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = int(intra_op_threads)
+        model_file = "model.int8.onnx" if quantize else "model.onnx"
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(self.path, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.inputs = [item.name for item in self.session.get_inputs()]
+        logger.info(f"Loaded ONNX model {model_name} ({model_file}, {intra_op_threads or 'default'} threads)")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.meta["dimension"])
+
+    def encode(self, sentences: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Embed sentences, batching them by length so little of each batch is padding.
+        """
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size=batch_size)[0]
+
+        embeddings = np.zeros((len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        for start in range(0, len(order), max(1, batch_size)):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([sentences[i] for i in batch])
+        return embeddings
+
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(sentences)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        tokens = self.session.run(None, {name: feeds[name] for name in self.inputs})[0]
+
+        pooling = self.meta["pooling"]
+        if pooling == "cls":
+            pooled = tokens[:, 0]
+        elif pooling == "max":
+            pooled = np.where(mask[:, :, None] > 0, tokens, -1e9).max(axis=1)
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (tokens * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+        if self.meta["normalize"]:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
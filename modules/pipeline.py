@@ -0,0 +1,309 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from modules.logger import setup_logger
+from modules.metrics import DEPTH_BUCKETS
+from modules.summarizer import is_fallback_summary
+
+logger = setup_logger("pipeline")
+
+# Marks the end of a stage's input
+_STOP = object()
+
+
+class WorkItem:
+    """State of one paper as it moves through the pipeline stages."""
+
+    __slots__ = ("filename", "record", "paper", "paper_content", "chunks", "representative_chunks", "signature",
+                 "summary")
+
+    def __init__(self, filename: str, record: Optional[bytes] = None):
+        self.filename = filename
+        self.record = record
+        self.paper: Optional[Dict[str, Any]] = None
+        self.paper_content: Optional[Dict[str, Any]] = None
+        self.chunks: List[str] = []
+        self.representative_chunks: List[str] = []
+        self.signature: Optional[np.ndarray] = None
+        self.summary: Optional[Dict[str, Any]] = None
+
+
+class StagedPipeline:
+    """
+    Producer/consumer version of ResearchSummarizerApp.process_file.
+
+    Each step runs in its own pool of threads, connected by bounded queues so a
+    slow stage (usually the LLM) applies backpressure instead of buffering papers:
+
+        readers -> preprocessors -> embedder (1) -> LLM workers -> writer (1)
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.config = app.config
+        self.metrics = app.metrics
+
+        queue_size = max(1, self.config.pipeline_queue_size)
+        self.input_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.preprocess_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.embed_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.llm_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.write_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.queue_names = {
+            self.input_queue: "input", self.preprocess_queue: "preprocess", self.embed_queue: "embed",
+            self.llm_queue: "llm", self.write_queue: "write"
+        }
+
+        self.successful = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._pbar: Optional[tqdm] = None
+
+    def run(self, work: Iterable[Tuple[str, Optional[bytes]]], total: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Process (filename, record) work units, returns (successful, failed) counts.
+        """
+        readers = self.config.pipeline_reader_workers
+        if self.app.process_pool is not None:
+            # Readers wait on the worker processes, so match their number
+            readers = max(readers, self.app.process_pool.workers)
+
+        stages = [
+            (self.input_queue, self.preprocess_queue, self._read, readers),
+            (self.preprocess_queue, self.embed_queue, self._preprocess, self.config.pipeline_preprocess_workers),
+            (self.embed_queue, self.llm_queue, None, 1),
+            (self.llm_queue, self.write_queue, self._summarize, self.config.pipeline_llm_workers),
+            (self.write_queue, None, self._write, 1),
+        ]
+
+        # Removed when the run ends, watch mode builds a pipeline per batch
+        self.metrics.add_collector(self._queue_gauges)
+        try:
+            with tqdm(total=total, desc="Processing papers") as pbar:
+                self._pbar = pbar
+
+                workers = []
+                try:
+                    for inbox, outbox, handler, count in stages:
+                        if handler is None:
+                            target, args = self._embed_worker, (inbox, outbox)
+                        else:
+                            target, args = self._stage_worker, (inbox, outbox, handler)
+                        threads = [
+                            threading.Thread(target=target, args=args, name=f"pipeline-{target.__name__}-{i}",
+                                             daemon=True)
+                            for i in range(max(1, count))
+                        ]
+                        for thread in threads:
+                            thread.start()
+                        workers.append((threads, outbox))
+
+                    # The feeder blocks on the bounded input queue, so only a window of papers is in flight
+                    for filename, record in work:
+                        self.input_queue.put(WorkItem(filename, record))
+                finally:
+                    # Shut the stages down in order, once a stage has drained tell the next one to stop.
+                    # Also when the work iterator raises, so no stage is left waiting on its queue
+                    if workers:
+                        self._stop(self.input_queue, len(workers[0][0]))
+                    for index, (threads, outbox) in enumerate(workers):
+                        for thread in threads:
+                            thread.join()
+                        if outbox is not None and index + 1 < len(workers):
+                            self._stop(outbox, len(workers[index + 1][0]))
+        finally:
+            self.metrics.remove_collector(self._queue_gauges)
+            self._pbar = None
+        return self.successful, self.failed
+
+    def _queue_gauges(self) -> Dict[str, float]:
+        return {f"pipeline_queue_{name}_depth": inbox.qsize() for inbox, name in self.queue_names.items()}
+
+    def _sample_depth(self, inbox: "queue.Queue") -> None:
+        if self.metrics.enabled:
+            self.metrics.observe("pipeline_queue_depth", inbox.qsize(), buckets=DEPTH_BUCKETS,
+                                 queue=self.queue_names[inbox])
+
+    @staticmethod
+    def _stop(inbox: "queue.Queue", count: int) -> None:
+        for _ in range(count):
+            inbox.put(_STOP)
+
+    def _finish(self, item: WorkItem, success: bool) -> None:
+        # Marking a paper failed writes the manifest and releases its lease, an error there
+        # must not take down the stage thread, run() would wait on it forever
+        try:
+            if not success:
+                self.app.file_manager.mark_failed(item.filename)
+                self.metrics.finish_paper(item.filename, "failed")
+            else:
+                self.metrics.finish_paper(item.filename, "fallback" if is_fallback_summary(item.summary) else "ok")
+        except Exception as e:
+            logger.error(f"Error finishing {item.filename}: {str(e)}")
+
+        with self._lock:
+            if success:
+                self.successful += 1
+            else:
+                self.failed += 1
+            if self._pbar is not None:
+                self._pbar.update(1)
+
+    def _stage_worker(self, inbox: "queue.Queue", outbox: Optional["queue.Queue"],
+                      handler: Callable[[WorkItem], Optional[bool]]) -> None:
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            self._sample_depth(inbox)
+
+            try:
+                result = handler(item)
+            except Exception as e:
+                logger.error(f"Error processing {item.filename}: {str(e)}")
+                result = False
+
+            # None hands the item to the next stage, a bool finishes it here
+            try:
+                if result is None and outbox is not None:
+                    outbox.put(item)
+                else:
+                    self._finish(item, bool(result))
+            except Exception as e:
+                logger.error(f"Error processing {item.filename}: {str(e)}")
+
+    def _read(self, item: WorkItem) -> Optional[bool]:
+        if self.app.file_manager.should_skip_file(item.filename):
+            logger.info(f"Skipping {item.filename} - already processed")
+            return True
+
+        self.app.file_manager.mark_started(item.filename)
+        self.metrics.start_paper(item.filename)
+        if self.app.process_pool is not None:
+            # Load, clean and chunk all happen in a worker process
+            with self.metrics.span("load", item.filename):
+                loaded = self.app.process_pool.prepare(item.filename, item.record)
+            item.record = None
+            if loaded is None:
+                return False
+            item.paper, item.paper_content, item.chunks = loaded
+            return None
+
+        with self.metrics.span("load", item.filename):
+            item.paper = self.app.file_manager.load_paper(item.filename, item.record)
+        item.record = None
+        if not item.paper:
+            logger.warning(f"Failed to load {item.filename}")
+            return False
+        return None
+
+    def _preprocess(self, item: WorkItem) -> Optional[bool]:
+        if item.paper_content is None:
+            with self.metrics.span("clean_chunk", item.filename):
+                prepared = self.app.prepare_paper(item.filename, item.paper)
+            if prepared is None:
+                return False
+            item.paper_content, item.chunks = prepared
+        with self.metrics.span("dedup", item.filename):
+            item.signature, item.summary = self.app.find_duplicate(item.filename, item.paper_content)
+        if item.summary is not None:
+            item.chunks = []
+        return None
+
+    def _embed_worker(self, inbox: "queue.Queue", outbox: "queue.Queue") -> None:
+        stopping = False
+        while not stopping:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            self._sample_depth(inbox)
+
+            # Take whatever else is already waiting so several papers share one encode call
+            items = [item]
+            total_chunks = len(item.chunks)
+            while total_chunks < self.config.embedding_batch_size:
+                try:
+                    item = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                items.append(item)
+                total_chunks += len(item.chunks)
+
+            # Near-duplicates already have a summary and go straight through
+            for item in items:
+                if item.summary is not None:
+                    outbox.put(item)
+            items = [item for item in items if item.summary is None]
+            if not items:
+                continue
+
+            filenames = [item.filename for item in items]
+            try:
+                with self.metrics.span("embed", *filenames):
+                    embeddings = self.app.embedding_engine.embed_chunks(
+                        [chunk for item in items for chunk in item.chunks]
+                    )
+            except Exception as e:
+                for item in items:
+                    logger.error(f"Error processing {item.filename}: {str(e)}")
+                    self._finish(item, False)
+                continue
+
+            indexed = []
+            embeddings_list = []
+            offset = 0
+            for item in items:
+                item_embeddings = np.asarray(embeddings[offset:offset + len(item.chunks)])
+                offset += len(item.chunks)
+                # An index that fails to open or write fails the paper, as in threaded mode
+                try:
+                    with self.metrics.span("index", item.filename):
+                        self.app.index_chunks(item.filename, item.paper_content, item.chunks, item_embeddings)
+                except Exception as e:
+                    logger.error(f"Error processing {item.filename}: {str(e)}")
+                    self._finish(item, False)
+                    continue
+                indexed.append(item)
+                embeddings_list.append(item_embeddings)
+            items = indexed
+            if not items:
+                continue
+            filenames = [item.filename for item in items]
+
+            try:
+                with self.metrics.span("select", *filenames):
+                    selections = self.app.select_chunks_batch([item.chunks for item in items], embeddings_list)
+            except Exception as e:
+                for item in items:
+                    logger.error(f"Error processing {item.filename}: {str(e)}")
+                    self._finish(item, False)
+                continue
+
+            for item, representative_chunks in zip(items, selections):
+                item.representative_chunks = representative_chunks
+                outbox.put(item)
+
+    def _summarize(self, item: WorkItem) -> Optional[bool]:
+        if item.summary is None:
+            with self.metrics.span("summarize", item.filename):
+                item.summary = self.app.summarizer.generate_summary(item.paper_content, item.representative_chunks)
+            self.app.remember_summary(item.filename, item.signature, item.summary)
+        # Drop what the writer does not need
+        item.chunks = []
+        item.representative_chunks = []
+        return None
+
+    def _write(self, item: WorkItem) -> Optional[bool]:
+        with self.metrics.span("save", item.filename):
+            saved = self.app.file_manager.save_processed_paper(item.filename, item.paper, item.summary)
+        if not saved:
+            return False
+        logger.info(f"Successfully processed {item.filename}")
+        return True
@@ -0,0 +1,198 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from modules.config import Config
+from modules.logger import setup_logger
+from modules.run_manifest import RunManifest
+
+logger = setup_logger("process_pool")
+
+# Inline bytes/array, or a (kind, block name, shape, dtype) handle to a shared memory block
+Payload = Union[bytes, np.ndarray, Tuple[str, str, Tuple[int, ...], str]]
+
+# Per-process state of a pool worker, set up by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _export(data: Union[bytes, np.ndarray], threshold: int) -> Payload:
+    """
+    Hand bytes or an array to the parent, through a shared memory block when it is large.
+    """
+    size = data.nbytes if isinstance(data, np.ndarray) else len(data)
+    if size < threshold or size == 0:
+        return data
+
+    block = shared_memory.SharedMemory(create=True, size=size)
+    if isinstance(data, np.ndarray):
+        np.ndarray(data.shape, dtype=data.dtype, buffer=block.buf)[:] = data
+        handle = ("array", block.name, data.shape, data.dtype.str)
+    else:
+        block.buf[:size] = data
+        handle = ("bytes", block.name, (size,), "")
+    block.close()
+    # The parent unlinks the block once it has copied it out
+    resource_tracker.unregister(block._name, "shared_memory")
+    return handle
+
+
+def _import(payload: Payload) -> Union[bytes, np.ndarray]:
+    if not isinstance(payload, tuple):
+        return payload
+
+    kind, name, shape, dtype = payload
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        if kind == "array":
+            return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf).copy()
+        return bytes(block.buf[:shape[0]])
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _init_worker(config: Config) -> None:
+    # Only the text stages are set up here, the embedding model loads on the first encode task
+    from modules.codec import JsonCodec
+    from modules.text_processor import TextProcessor
+
+    _worker["config"] = config
+    _worker["codec"] = JsonCodec(config.json_backend)
+    _worker["text_processor"] = TextProcessor(
+        chunk_size=config.chunk_size,
+        chunk_overlap=config.chunk_overlap,
+        splitter=config.text_splitter,
+        length_unit=config.chunk_length_unit
+    )
+
+
+def _prepare_task(filename: str, record: Optional[bytes]) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], Payload, Payload, Optional[str]]]:
+    """
+    Load, clean and chunk one paper in a worker.
+
+    Returns (paper, paper_content with full_text blanked, full_text as UTF-8, chunk offsets,
+    hash of the file read for the run manifest), or None if the paper cannot be loaded or
+    has too little text.
+    """
+    config = _worker["config"]
+    text_processor = _worker["text_processor"]
+
+    content_hash = None
+    try:
+        if record is None:
+            with open(os.path.join(config.input_dir, filename), "rb") as f:
+                record = f.read()
+            if config.use_run_manifest:
+                content_hash = RunManifest.hash_bytes(record)
+        paper = _worker["codec"].decode_paper(record)
+    except Exception as e:
+        logger.error(f"Error loading {filename}: {str(e)}")
+        return None
+
+    paper_content = text_processor.extract_paper_content(paper)
+    full_text = paper_content.get("full_text", "")
+    if not full_text or len(full_text) < 100:
+        logger.warning(f"Skipping {filename} - insufficient text content")
+        return None
+
+    offsets = np.asarray(text_processor.chunk_offsets(full_text), dtype=np.int64).reshape(-1, 2)
+    logger.info(f"Split text into {len(offsets)} chunks")
+
+    # The text goes back separately, possibly through shared memory
+    paper_content["full_text"] = ""
+    threshold = config.process_pool_shm_threshold
+    return (paper, paper_content, _export(full_text.encode("utf-8"), threshold), _export(offsets, threshold),
+            content_hash)
+
+
+def _encode_task(texts: List[str]) -> Payload:
+    model = _worker.get("embedding_model")
+    if model is None:
+        from modules.embedding_engine import load_embedding_model
+
+        config = _worker["config"]
+        # Several model copies on one machine should not each use every core
+        threads = max(1, (os.cpu_count() or 1) // max(1, config.process_pool_workers))
+        if config.embedding_backend != "onnx":
+            try:
+                import torch
+                torch.set_num_threads(threads)
+            except ImportError:
+                pass
+
+        model = _worker["embedding_model"] = load_embedding_model(config, threads=threads)
+
+    embeddings = model.encode(
+        texts,
+        batch_size=_worker["config"].embedding_batch_size,
+        show_progress_bar=False,
+        convert_to_numpy=True
+    )
+    return _export(np.asarray(embeddings, dtype=np.float32), _worker["config"].process_pool_shm_threshold)
+
+
+class PreprocessPool:
+    """
+    Process pool for the CPU-bound steps: JSON decoding, text cleaning, chunking and,
+    when process_pool_embedding is set, encoding chunks with one model per worker.
+
+    Full texts, chunk offsets and embeddings above process_pool_shm_threshold bytes
+    come back through shared memory blocks rather than being pickled through the
+    result pipe. Chunks are rebuilt in the parent by slicing the full text.
+    """
+
+    def __init__(self, config: Config, on_read: Optional[Callable[[str, str], None]] = None):
+        self.config = config
+        # Called with (filename, content hash) for inputs a worker read from disk
+        self.on_read = on_read
+        self.workers = max(1, int(config.process_pool_workers))
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Started on first use and again after close(), like the embedding batcher
+        with self._lock:
+            if self.executor is None:
+                context = multiprocessing.get_context(self.config.process_pool_start_method)
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.config,)
+                )
+                logger.info(f"Started process pool with {self.workers} workers "
+                            f"({self.config.process_pool_start_method})")
+            return self.executor
+
+    def prepare(self, filename: str, record: Optional[bytes] = None) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], List[str]]]:
+        """
+        Load and prepare a paper in a worker, returns (paper, paper_content, chunks) or None.
+        """
+        result = self._get_executor().submit(_prepare_task, filename, record).result()
+        if result is None:
+            return None
+
+        paper, paper_content, text_payload, offsets_payload, content_hash = result
+        if content_hash is not None and self.on_read is not None:
+            self.on_read(filename, content_hash)
+        full_text = _import(text_payload).decode("utf-8")
+        offsets = _import(offsets_payload)
+        paper_content["full_text"] = full_text
+        return paper, paper_content, [full_text[start:end] for start, end in offsets.tolist()]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts with the embedding model of a worker process.
+        """
+        return _import(self._get_executor().submit(_encode_task, texts).result())
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
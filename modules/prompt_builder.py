@@ -0,0 +1,193 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.chunker import token_length_function
+
+_ROLE = ("You are a skilled science communicator creating summaries of research papers that are "
+         "adaptable for readers with different levels of expertise.")
+
+_STRUCTURE = """Create an adaptable summary with the following structure:
+
+1. "headline": A compelling, clear title that captures the essence of the research
+
+2. "tldr": A one-sentence summary that anyone can understand
+
+3. "context": Brief background explaining why this research matters in the real world
+
+4. "methodology": A clear explanation of the methods and approach used by the researchers
+
+5. "key_points": 3-5 bullet points highlighting the main findings and implications
+
+6. "accessible_explanation": A 2-3 paragraph explanation that a general audience can understand, using analogies or examples when helpful
+
+7. "significance": The broader impact of this work and why it represents an advance
+
+8. "questions_raised": 2-3 thought-provoking questions this research raises
+
+"""
+
+_STYLE = """Your summary should be:
+- Factually accurate (don't add details not present in the paper)
+- Engaging for different audience types (general readers, students, researchers)
+- Written with clarity and a human touch
+- Free of unnecessary jargon, but precise about key concepts
+
+"""
+
+SUMMARY_KEYS = ("headline", "tldr", "context", "methodology", "key_points", "accessible_explanation",
+                "significance", "questions_raised")
+_LIST_KEYS = ("key_points", "questions_raised")
+
+# Structured-output schema for one summary, strict mode needs every key required
+SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        key: {"type": "array", "items": {"type": "string"}} if key in _LIST_KEYS else {"type": "string"}
+        for key in SUMMARY_KEYS
+    },
+    "required": list(SUMMARY_KEYS),
+    "additionalProperties": False
+}
+
+# Identical for every request, so providers that cache prompt prefixes can reuse it
+SYSTEM_PROMPT = (
+    _ROLE + " For the research paper the user sends, create a summary that is engaging, accurate, and "
+    "layered in complexity.\n\nThe user message gives the paper's title, abstract and category, followed by "
+    "key representative excerpts from the full paper.\n\n" + _STRUCTURE
+    + "Format your response as a JSON object with these keys.\n\n" + _STYLE
+    + "Return ONLY the JSON object, with no additional text."
+)
+
+BATCH_SYSTEM_PROMPT = (
+    _ROLE + " The user sends several research papers, each starting with a line \"### Paper <id>\". For each "
+    "paper create a summary that is engaging, accurate, and layered in complexity.\n\nEach paper gives its "
+    "title, abstract and category, followed by key representative excerpts from the full paper.\n\n" + _STRUCTURE
+    + "Format your response as a JSON array with one object per paper, in the order given. Each object has "
+    "a \"paper_id\" key holding the paper's id, plus the keys above.\n\n" + _STYLE
+    + "Return ONLY the JSON array, with no additional text."
+)
+
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9-]{2,}")
+STOPWORDS = frozenset(
+    "the and for with that this from are was were been have has had not but our their its into than then "
+    "which when where while these those such also can may using used use via each more most other over "
+    "between both through under about after before they them there here what who how all any one two".split()
+)
+
+
+class PromptBuilder:
+    """
+    Packs a paper into chat messages that fit an input token budget.
+
+    The instructions are a fixed system message. The user message holds the
+    title, the abstract (capped at abstract_max_tokens) and as many representative
+    chunks as the remaining budget allows. Chunks are admitted in order of how many
+    title and abstract terms they share, the last one admitted may be truncated,
+    and the admitted chunks are shown in document order.
+    """
+
+    def __init__(self, token_budget: int = 2000, abstract_max_tokens: int = 400, min_chunk_tokens: int = 64,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        self.token_budget = int(token_budget)
+        self.abstract_max_tokens = int(abstract_max_tokens)
+        self.min_chunk_tokens = int(min_chunk_tokens)
+        self.count_tokens = count_tokens or token_length_function()
+        self.system_tokens = self.count_tokens(SYSTEM_PROMPT)
+        self.batch_system_tokens = self.count_tokens(BATCH_SYSTEM_PROMPT)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Longest prefix of text, cut at a space, that fits in max_tokens.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+
+        # No token is longer than 16 characters in practice, which bounds the search
+        low, high = 0, min(len(text), max_tokens * 16)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        cut = text.rfind(" ", 0, low)
+        return text[:cut if cut > 0 else low].rstrip()
+
+    @staticmethod
+    def rank_chunks(paper_content: Dict[str, Any], chunks: List[str]) -> List[int]:
+        """
+        Chunk indices, most important first: by distinct title/abstract terms shared, ties in document order.
+        """
+        reference = f"{paper_content.get('title', '')} {paper_content.get('abstract', '')}".lower()
+        terms = set(WORD_PATTERN.findall(reference)) - STOPWORDS
+        scores = [len(terms.intersection(WORD_PATTERN.findall(chunk.lower()))) for chunk in chunks]
+        return sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+
+    def build(self, paper_content: Dict[str, Any], representative_chunks: List[str]) -> Dict[str, Any]:
+        """
+        Returns {"messages": [...], "tokens": {...}} with the token counts of each part.
+        """
+        title = self.truncate(str(paper_content.get("title", "")), 64)
+        header = f"Paper Information:\n- Title: {title}\n- Category: {paper_content.get('category', '')}\n- Abstract: "
+        excerpts_header = "\n\nKey Representative Excerpts from the Full Paper:"
+
+        remaining = self.token_budget - self.system_tokens - self.count_tokens(header + excerpts_header)
+        abstract = self.truncate(str(paper_content.get("abstract", "")), min(self.abstract_max_tokens, remaining))
+        abstract_tokens = self.count_tokens(abstract)
+        remaining -= abstract_tokens
+
+        admitted: Dict[int, str] = {}
+        for index in self.rank_chunks(paper_content, representative_chunks):
+            # Each excerpt also costs its "Chunk n:" label and separators
+            available = remaining - 8
+            if available < self.min_chunk_tokens:
+                break
+            chunk = self.truncate(representative_chunks[index], available)
+            admitted[index] = chunk
+            remaining -= self.count_tokens(chunk) + 8
+
+        excerpts = "".join(f"\n\nChunk {n + 1}: {admitted[index]}" for n, index in enumerate(sorted(admitted)))
+        user = header + abstract + excerpts_header + excerpts
+        user_tokens = self.count_tokens(user)
+
+        return {
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user}
+            ],
+            "tokens": {
+                "system": self.system_tokens,
+                "user": user_tokens,
+                "abstract": abstract_tokens,
+                "total": self.system_tokens + user_tokens,
+                "chunks_used": len(admitted),
+                "chunks_given": len(representative_chunks)
+            }
+        }
+
+    @staticmethod
+    def paper_header(paper_id: str) -> str:
+        return f"### Paper {paper_id}\n"
+
+    def build_batch(self, papers: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        One request for several papers, from (paper id, single-paper prompt from build) pairs.
+        """
+        user = "\n\n".join(self.paper_header(paper_id) + prompt["messages"][1]["content"] for paper_id, prompt in papers)
+        user_tokens = self.count_tokens(user)
+        return {
+            "messages": [
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": user}
+            ],
+            "tokens": {
+                "system": self.batch_system_tokens,
+                "user": user_tokens,
+                "total": self.batch_system_tokens + user_tokens,
+                "papers": len(papers),
+                "chunks_used": sum(prompt["tokens"]["chunks_used"] for _, prompt in papers),
+                "chunks_given": sum(prompt["tokens"]["chunks_given"] for _, prompt in papers)
+            }
+        }
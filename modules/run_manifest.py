@@ -0,0 +1,139 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+from modules.logger import setup_logger
+
+logger = setup_logger("run_manifest")
+
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_DONE = "done"
+STATUS_FALLBACK = "fallback"
+STATUS_FAILED = "failed"
+
+
+class RunManifest:
+    """
+    Ledger of every input seen by the pipeline and the outcome of its last attempt.
+
+    Rows hold the input's size, mtime and content hash, so skip decisions are a
+    dictionary lookup plus one stat call instead of re-reading the output tree.
+    Only "done" inputs are skipped, so failed, fallback and interrupted
+    ("in_progress") papers are picked up again by the next run.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS inputs ("
+            "name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, content_hash TEXT, "
+            "status TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+
+        # (size, mtime_ns, content_hash, status) per input, loaded once
+        self.entries: Dict[str, Tuple[int, int, Optional[str], str]] = {
+            name: (size, mtime_ns, content_hash, status)
+            for name, size, mtime_ns, content_hash, status in self.db.execute(
+                "SELECT name, size, mtime_ns, content_hash, status FROM inputs"
+            )
+        }
+        logger.info(f"Loaded run manifest with {len(self.entries)} entries from {path}")
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def status(self, name: str) -> Optional[str]:
+        entry = self.entries.get(name)
+        return entry[3] if entry else None
+
+    def is_done(self, name: str, path: str) -> bool:
+        """
+        True if the input was completed and has not changed since.
+        """
+        entry = self.entries.get(name)
+        if entry is None or entry[3] != STATUS_DONE:
+            return False
+
+        if not path:
+            # Streamed inputs have no file of their own, the record is all we have
+            return True
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Gone or unreadable, it cannot be shown to be unchanged
+            return False
+
+        size, mtime_ns, content_hash, status = entry
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime_ns == mtime_ns:
+            return True
+
+        # Touched but maybe not modified, compare content before reprocessing
+        if content_hash and self.hash_file(path) == content_hash:
+            self._write(name, stat.st_size, stat.st_mtime_ns, content_hash, STATUS_DONE)
+            return True
+        return False
+
+    def signature(self, path: str) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+        """
+        (size, mtime_ns, content hash) of an input as it is now, Nones when there is no file to read.
+        """
+        try:
+            stat = os.stat(path)
+            return stat.st_size, stat.st_mtime_ns, self.hash_file(path)
+        except OSError:
+            return None, None, None
+
+    def record(self, name: str, path: str, status: str,
+               signature: Optional[Tuple[Optional[int], Optional[int], Optional[str]]] = None) -> None:
+        """
+        Journal the latest status of an input, with the signature taken when it was read if given.
+        """
+        size, mtime_ns, content_hash = signature if signature is not None else self.signature(path)
+        self._write(name, size, mtime_ns, content_hash, status)
+
+    def _write(self, name: str, size: Optional[int], mtime_ns: Optional[int],
+               content_hash: Optional[str], status: str) -> None:
+        with self._lock:
+            try:
+                with self.db:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO inputs (name, size, mtime_ns, content_hash, status, updated) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (name, size, mtime_ns, content_hash, status, time.time())
+                    )
+                self.entries[name] = (size, mtime_ns, content_hash, status)
+            except Exception as e:
+                logger.warning(f"Failed to update run manifest for {name}: {e}")
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for entry in self.entries.values():
+                counts[entry[3]] = counts.get(entry[3], 0) + 1
+            return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,264 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from modules.logger import setup_logger
+from modules.metrics import Metrics
+
+logger = setup_logger("service")
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+
+class Overloaded(Exception):
+    """Raised when an endpoint's queue is full, answered with a 503."""
+
+
+class _Lane:
+    """
+    Requests of one kind: at most concurrency running and queue_size waiting, the rest are shed.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int):
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.queue_size = max(0, int(queue_size))
+        self.running = 0
+        self.waiting = 0
+        # Created on the serving loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def run(self, executor: ThreadPoolExecutor, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._semaphore.locked() and self.waiting >= self.queue_size:
+            raise Overloaded(f"{self.name} queue is full")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"running": self.running, "waiting": self.waiting,
+                "concurrency": self.concurrency, "queue_size": self.queue_size}
+
+
+class SummaryService:
+    """
+    Local HTTP API over a ResearchSummarizerApp.
+
+        POST /summarize  a paper as in input_dir       -> {"summary": {...}}
+        POST /embed      {"chunks": [...]}             -> {"embeddings": [[...]], "dimension": n}
+        POST /select     {"chunks": [...], "num_chunks": 5, "embeddings": optional}
+                                                       -> {"chunks": [...]}
+        GET  /health     lane queue depths, 503 while shutting down
+        GET  /metrics    Prometheus text
+
+    Each endpoint runs its work on worker threads, at most its concurrency at a
+    time with up to service_queue_size requests waiting. Past that, requests get
+    an immediate 503 with Retry-After rather than piling up. Embeddings of
+    concurrent requests go through the engine's EmbeddingBatcher, so they share
+    encode calls. Summaries use the summary cache and dedup index but write no
+    outputs.
+    """
+
+    def __init__(self, app: Any, host: Optional[str] = None, port: Optional[int] = None):
+        if web is None:
+            raise ImportError("The HTTP service requires the aiohttp package")
+        self.app = app
+        self.config = app.config
+        self.codec = app.file_manager.codec
+        self.host = host or self.config.service_host
+        self.port = self.config.service_port if port is None else int(port)
+
+        # Service metrics go to the app's registry, or one of their own when metrics are off
+        self.metrics = app.metrics if app.metrics.enabled else Metrics()
+        self.lanes = {
+            "summarize": _Lane("summarize", self.config.service_summarize_concurrency, self.config.service_queue_size),
+            "embed": _Lane("embed", self.config.service_embed_concurrency, self.config.service_queue_size),
+            "select": _Lane("select", self.config.service_embed_concurrency, self.config.service_queue_size),
+        }
+        self.metrics.add_collector(self._lane_gauges)
+        self.executor = ThreadPoolExecutor(
+            max_workers=sum(lane.concurrency for lane in self.lanes.values()), thread_name_prefix="service"
+        )
+
+        self.draining = False
+        self.ready = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._started = time.monotonic()
+
+    def _lane_gauges(self) -> Dict[str, float]:
+        gauges = {}
+        for name, lane in self.lanes.items():
+            gauges[f"service_{name}_running"] = lane.running
+            gauges[f"service_{name}_waiting"] = lane.waiting
+        return gauges
+
+    def build(self) -> "web.Application":
+        @web.middleware
+        async def observe(request: "web.Request", handler: Callable) -> "web.StreamResponse":
+            return await self._observe(request, handler)
+
+        application = web.Application(
+            client_max_size=int(self.config.service_max_request_mb * 1024 * 1024),
+            middlewares=[observe]
+        )
+        application.add_routes([
+            web.post("/summarize", self._summarize),
+            web.post("/embed", self._embed),
+            web.post("/select", self._select),
+            web.get("/health", self._health),
+            web.get("/metrics", self._metrics),
+        ])
+        return application
+
+    def _response(self, body: bytes, status: int = 200) -> "web.Response":
+        return web.Response(body=body, status=status, content_type="application/json")
+
+    def _error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> "web.Response":
+        return web.Response(body=self.codec.dumps({"error": message}, compact=True), status=status,
+                            content_type="application/json", headers=headers)
+
+    async def _observe(self, request: "web.Request", handler: Callable) -> "web.StreamResponse":
+        route = request.path.strip("/") or "root"
+        start = time.perf_counter()
+        try:
+            response = await handler(request)
+        except Overloaded as e:
+            self.metrics.inc("service_shed_total", route=route)
+            response = self._error(503, str(e), {"Retry-After": "1"})
+        except ValueError as e:
+            response = self._error(400, str(e))
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error handling {request.method} {request.path}: {str(e)}")
+            response = self._error(500, "internal error")
+        self.metrics.inc("service_requests_total", route=route, status=response.status)
+        self.metrics.observe("service_request_seconds", time.perf_counter() - start, route=route)
+        return response
+
+    async def _call(self, lane: str, fn: Callable[..., Any], *args: Any) -> bytes:
+        if self.draining:
+            raise Overloaded("shutting down")
+        # Encoding happens on the worker too, large embedding arrays would stall the loop
+        return await self.lanes[lane].run(self.executor, lambda: self.codec.dumps(fn(*args), compact=True))
+
+    async def _json_body(self, request: "web.Request") -> Dict[str, Any]:
+        body = self.codec.loads(await request.read())
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    @staticmethod
+    def _chunks(body: Dict[str, Any]) -> List[str]:
+        chunks = body.get("chunks")
+        if not isinstance(chunks, list) or not all(isinstance(chunk, str) for chunk in chunks):
+            raise ValueError("chunks must be a list of strings")
+        return chunks
+
+    async def _summarize(self, request: "web.Request") -> "web.Response":
+        paper = self.codec.decode_paper(await request.read())
+        return self._response(await self._call("summarize", self._summarize_paper, paper))
+
+    def _summarize_paper(self, paper: Dict[str, Any]) -> Dict[str, Any]:
+        summary = self.app.summarize_paper(paper)
+        if summary is None:
+            raise ValueError("Paper has too little text to summarize")
+        return {"summary": summary}
+
+    async def _embed(self, request: "web.Request") -> "web.Response":
+        chunks = self._chunks(await self._json_body(request))
+        return self._response(await self._call("embed", self._embed_chunks, chunks))
+
+    def _embed_chunks(self, chunks: List[str]) -> Dict[str, Any]:
+        embeddings = self.app.embedding_engine.embed_chunks(chunks)
+        return {"embeddings": embeddings.tolist(), "dimension": self.app.embedding_engine.dimension}
+
+    async def _select(self, request: "web.Request") -> "web.Response":
+        body = await self._json_body(request)
+        chunks = self._chunks(body)
+        num_chunks = body.get("num_chunks", 5)
+        # bool is an int subclass, true would otherwise select one chunk
+        if not isinstance(num_chunks, int) or isinstance(num_chunks, bool) or num_chunks < 1:
+            raise ValueError("num_chunks must be a positive integer")
+        return self._response(await self._call("select", self._select_chunks, chunks, body.get("embeddings"), num_chunks))
+
+    def _select_chunks(self, chunks: List[str], embeddings: Optional[List[List[float]]], num_chunks: int) -> Dict[str, Any]:
+        if embeddings is None:
+            embeddings = self.app.embedding_engine.embed_chunks(chunks)
+        elif len(embeddings) != len(chunks):
+            raise ValueError("embeddings must have one row per chunk")
+        selected = self.app.embedding_engine.get_representative_chunks(
+            chunks, np.asarray(embeddings, dtype=np.float32), num_chunks=num_chunks
+        )
+        return {"chunks": selected}
+
+    async def _health(self, request: "web.Request") -> "web.Response":
+        body = {
+            "status": "draining" if self.draining else "ok",
+            "uptime_seconds": round(time.monotonic() - self._started, 1),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()}
+        }
+        return self._response(self.codec.dumps(body, compact=True), status=503 if self.draining else 200)
+
+    async def _metrics(self, request: "web.Request") -> "web.Response":
+        return web.Response(text=self.metrics.to_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def serve(self) -> None:
+        """
+        Serve until shutdown() is called, then finish the requests in flight and close the app.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+
+        # Load the models before accepting requests, so the first callers do not pay for it
+        await self._loop.run_in_executor(self.executor, self.app.warm_up)
+
+        runner = web.AppRunner(self.build(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        self.port = runner.addresses[0][1]
+        logger.info(f"Serving on http://{self.host}:{self.port}")
+        self.ready.set()
+
+        try:
+            await self._stop.wait()
+        finally:
+            self.draining = True
+            logger.info("Shutting down once the requests in flight are answered")
+            await runner.cleanup()
+            await self._loop.run_in_executor(None, self.close)
+
+    def shutdown(self) -> None:
+        """
+        Ask serve() to stop, safe to call from any thread.
+        """
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        self.app.embedding_engine.close()
+        self.app.summarizer.close()
+        if self.app.process_pool is not None:
+            self.app.process_pool.close()
+        self.metrics.close()
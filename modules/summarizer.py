@@ -1,161 +1,341 @@
 import time
-import json
-import hashlib
-from typing import Dict, List, Any, Optional
-from openai import OpenAI
+import threading
+from typing import Dict, List, Any, Optional, Tuple
 
 from modules.config import Config
+from modules.codec import JsonCodec
 from modules.logger import setup_logger
+from modules.llm_stream import JsonStreamValidator, StreamAbort, StreamReader
+from modules.metrics import RATE_BUCKETS, TOKEN_BUCKETS, Metrics, NullMetrics
+from modules.prompt_builder import SUMMARY_SCHEMA, PromptBuilder
+from modules.summary_batcher import SummaryBatcher
+from modules.summary_cache import SummaryCache
 
 # Setup logger
 logger = setup_logger("summarizer")
 
+FALLBACK_TEXT = "Error generating summary."
+
+# JSON type of each summary key, checked while a response streams in
+SUMMARY_FIELDS = {key: spec["type"] for key, spec in SUMMARY_SCHEMA["properties"].items()}
+
+
+def is_fallback_summary(summary: Optional[Dict[str, Any]]) -> bool:
+    """
+    True for the placeholder returned when the LLM call failed.
+    """
+    return not summary or summary.get("tldr") == FALLBACK_TEXT
+
+
+def response_format(kind: str) -> Optional[Dict[str, Any]]:
+    """
+    The response_format request option for config.llm_response_format.
+    """
+    if kind == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": "paper_summary", "strict": True, "schema": SUMMARY_SCHEMA}}
+    if kind == "json_object":
+        return {"type": "json_object"}
+    return None
+
 class Summarizer:
     """Generator for paper summaries using LLMs."""
     
-    def __init__(self, config: Config):
+    # Bump whenever the prompt layout changes so cached summaries are not reused
+    PROMPT_VERSION = "2"
+    
+    def __init__(self, config: Config, metrics: Optional[Metrics] = None):
         self.config = config
+        self.metrics = metrics or NullMetrics()
         
-        # Initialize Open Router client
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=config.api_key,
-        )
+        # Open Router client, created on the first request since importing openai is slow
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._prompt_builder: Optional[PromptBuilder] = None
+        # Cleared if the provider rejects it
+        self._response_format = response_format(config.llm_response_format)
+        
+        self.codec = JsonCodec(config.json_backend, compact=config.json_compact)
+        
+        self.cache = None
+        if config.cache_dir:
+            self.cache = SummaryCache(
+                config.cache_dir,
+                max_entries=config.summary_cache_max_entries,
+                max_age_days=config.summary_cache_max_age_days,
+                codec=self.codec
+            )
+        
+        # Groups short papers into shared requests, see SummaryBatcher
+        self.batcher = None
+        if config.llm_batch_enabled:
+            self.batcher = SummaryBatcher(
+                self,
+                max_papers=config.llm_batch_max_papers,
+                token_budget=config.llm_batch_token_budget,
+                max_paper_tokens=config.llm_batch_max_paper_tokens,
+                max_output_tokens=config.llm_batch_max_output_tokens,
+                expected_completion_tokens=config.llm_expected_completion_tokens,
+                max_wait=config.llm_batch_max_wait
+            )
         
         logger.info(f"Initialized summarizer with model: {config.model_name}")
     
-    def get_cache_path(self, paper_id: str) -> Optional[str]:
-        if not self.config.cache_dir:
-            return None
-            
-        return f"{self.config.cache_dir}/{paper_id}.json"
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(
+                        base_url=self.config.api_base_url,
+                        api_key=self.config.api_key,
+                    )
+        return self._client
+    
+    def cache_key(self, paper_content: Dict[str, Any], representative_chunks: List[str]) -> str:
+        return SummaryCache.make_key(
+            paper_content.get('abstract', ""),
+            representative_chunks,
+            self.config.model_name,
+            self.config.temperature,
+            f"{self.PROMPT_VERSION}:{self.config.prompt_token_budget}:{self.config.prompt_abstract_max_tokens}"
+        )
     
-    def load_from_cache(self, cache_path: str) -> Optional[Dict[str, Any]]:
+    def load_from_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """
         Load generated summary from cache if available.
         """
-        if not cache_path or self.config.force_regenerate:
+        if self.cache is None or self.config.force_regenerate:
             return None
             
-        try:
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            logger.debug(f"No cache found at {cache_path}")
-            return None
-        except Exception as e:
-            logger.warning(f"Failed to load from cache {cache_path}: {e}")
-            return None
+        summary = self.cache.get(cache_key)
+        self.metrics.inc("summary_cache_lookups_total", result="hit" if summary else "miss")
+        return summary
     
-    def save_to_cache(self, cache_path: str, content: Dict[str, Any]) -> bool:
+    def save_to_cache(self, cache_key: str, content: Dict[str, Any]) -> bool:
         """
         Save generated summary to cache.
         """
-        if not cache_path or not self.config.cache_dir:
+        if self.cache is None:
             return False
             
-        try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(content, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception as e:
-            logger.warning(f"Failed to save to cache {cache_path}: {e}")
+        return self.cache.put(cache_key, content, model=self.config.model_name)
+        
+    @property
+    def prompt_builder(self) -> PromptBuilder:
+        # Built on first use, loading a tokenizer is not needed for fully cached runs
+        if self._prompt_builder is None:
+            self._prompt_builder = PromptBuilder(
+                token_budget=self.config.prompt_token_budget,
+                abstract_max_tokens=self.config.prompt_abstract_max_tokens
+            )
+        return self._prompt_builder
+
+    def build_messages(self, paper_content: Dict[str, Any], representative_chunks: List[str]) -> Dict[str, Any]:
+        """
+        Chat messages for a paper within the prompt token budget, with their token counts.
+        """
+        prompt = self.prompt_builder.build(paper_content, representative_chunks)
+        tokens = prompt["tokens"]
+        self.metrics.observe("prompt_tokens", tokens["total"], buckets=TOKEN_BUCKETS)
+        if tokens["chunks_used"] < tokens["chunks_given"]:
+            self.metrics.inc("prompt_chunks_dropped_total", tokens["chunks_given"] - tokens["chunks_used"])
+        return prompt
+
+    def parse_response(self, response_text: str) -> Dict[str, Any]:
+        """
+        Extract the JSON summary from a model response, raises ValueError if it is not valid JSON.
+        """
+        json_str = response_text.strip()
+        
+        if "```json" in json_str:
+            json_str = json_str.split("```json")[1].split("```")[0].strip()
+        elif "```" in json_str:
+            json_str = json_str.split("```")[1].split("```")[0].strip()
+        
+        return self.codec.loads(json_str)
+
+    def record_response(self, usage: Any, seconds: float, title: str, tokens: Dict[str, int],
+                        first_token: Optional[float] = None) -> None:
+        """
+        Count a completed LLM request with its latency and token usage, and log the token counts.
+        Streamed requests also record time to first token and completion tokens per second.
+        """
+        model = self.config.model_name
+        self.metrics.inc("llm_requests_total", model=model)
+        self.metrics.observe("llm_request_seconds", seconds, model=model)
+
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        self.metrics.inc("llm_prompt_tokens_total", prompt_tokens, model=model)
+        self.metrics.inc("llm_completion_tokens_total", completion_tokens, model=model)
+
+        timing = f"in {seconds:.2f}s"
+        if first_token is not None:
+            rate = completion_tokens / max(seconds - first_token, 1e-6)
+            self.metrics.observe("llm_ttft_seconds", first_token, model=model)
+            if completion_tokens:
+                self.metrics.observe("llm_tokens_per_second", rate, buckets=RATE_BUCKETS, model=model)
+            timing += f" (first token {first_token:.2f}s, {rate:.1f} tokens/s)"
+
+        logger.info(f"Tokens for {title}: {prompt_tokens or '?'} prompt (estimated {tokens['total']}, "
+                    f"{tokens['chunks_used']}/{tokens['chunks_given']} chunks), "
+                    f"{completion_tokens or '?'} completion {timing}")
+
+    def request_options(self, prompt: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Keyword arguments for chat.completions.create.
+        """
+        options = {
+            "model": self.config.model_name,
+            "temperature": self.config.temperature,
+            "messages": prompt["messages"]
+        }
+        # Strict schemas need an object at the root, so batches go without one
+        if self._response_format is not None and "papers" not in prompt["tokens"]:
+            options["response_format"] = self._response_format
+        if self.config.llm_stream:
+            options["stream"] = True
+            options["stream_options"] = {"include_usage": True}
+        return options
+
+    def response_format_rejected(self, error: Exception, options: Dict[str, Any]) -> bool:
+        """
+        True when a request failed because the provider does not support response_format, which is then dropped.
+        """
+        if "response_format" not in options or getattr(error, "status_code", None) != 400:
             return False
+        logger.warning(f"Provider rejected response_format, sending requests without it: {str(error)}")
+        self._response_format = None
+        return True
+
+    def stream_reader(self, prompt: Dict[str, Any], start: float) -> StreamReader:
+        papers = prompt["tokens"].get("papers")
+        fields = dict(SUMMARY_FIELDS, paper_id=None) if papers else SUMMARY_FIELDS
+        return StreamReader(
+            JsonStreamValidator(fields, array=bool(papers)),
+            self.config.llm_stream_max_tokens * (papers or 1),
+            start
+        )
+
+    def fallback_summary(self, paper_content: Dict[str, Any]) -> Dict[str, Any]:
+        self.metrics.inc("summary_fallbacks_total", model=self.config.model_name)
+        return {
+            "headline": paper_content['title'],
+            "tldr": FALLBACK_TEXT,
+            "context": FALLBACK_TEXT,
+            "methodology": FALLBACK_TEXT,
+            "key_points": [FALLBACK_TEXT],
+            "accessible_explanation": FALLBACK_TEXT,
+            "significance": FALLBACK_TEXT,
+            "questions_raised": [FALLBACK_TEXT]
+        }
         
     def generate_summary(self, paper_content: Dict[str, Any], representative_chunks: List[str]) -> Dict[str, Any]:
-        # use the title for the hash
-        paper_id = hashlib.md5(paper_content['title'].encode()).hexdigest()
-        
         # Check cache first if present
-        cache_path = self.get_cache_path(paper_id)
-        cached_summary = self.load_from_cache(cache_path)
+        cache_key = self.cache_key(paper_content, representative_chunks)
+        cached_summary = self.load_from_cache(cache_key)
         
         if cached_summary:
             logger.info(f"Using cached summary for {paper_content['title']}")
             return cached_summary
         
-        chunks_text = "\n\n".join([f"Chunk {i+1}: {chunk}" for i, chunk in enumerate(representative_chunks)])
-        
-        prompt = f"""
-        You are a skilled science communicator creating summaries of research papers that are 
-        adaptable for readers with different levels of expertise. Create a summary of the following 
-        research paper that is engaging, accurate, and layered in complexity.
-        
-        Paper Information:
-        - Title: {paper_content['title']}
-        - Abstract: {paper_content['abstract']}
-        - Category: {paper_content['category']}
-        
-        Key Representative Excerpts from the Full Paper:
-        {chunks_text}
-        
-        Create an adaptable summary with the following structure:
-        
-        1. "headline": A compelling, clear title that captures the essence of the research
+        if self.cache is None:
+            return self._generate(paper_content, representative_chunks, cache_key)
         
-        2. "tldr": A one-sentence summary that anyone can understand
-        
-        3. "context": Brief background explaining why this research matters in the real world
-        
-        4. "methodology": A clear explanation of the methods and approach used by the researchers
-        
-        5. "key_points": 3-5 bullet points highlighting the main findings and implications
-        
-        6. "accessible_explanation": A 2-3 paragraph explanation that a general audience can understand, 
-           using analogies or examples when helpful
-        
-        7. "significance": The broader impact of this work and why it represents an advance
-        
-        8. "questions_raised": 2-3 thought-provoking questions this research raises
+        # Concurrent requests for the same summary share one LLM call
+        return self.cache.single_flight(
+            cache_key, lambda: self._generate(paper_content, representative_chunks, cache_key)
+        )
+    
+    def _generate(self, paper_content: Dict[str, Any], representative_chunks: List[str], cache_key: str) -> Dict[str, Any]:
+        # Another caller may have filled the cache while we waited to lead
+        cached_summary = self.load_from_cache(cache_key)
+        if cached_summary:
+            return cached_summary
         
-        Format your response as a JSON object with these keys.
+        prompt = self.build_messages(paper_content, representative_chunks)
         
-        Your summary should be:
-        - Factually accurate (don't add details not present in the paper)
-        - Engaging for different audience types (general readers, students, researchers)
-        - Written with clarity and a human touch
-        - Free of unnecessary jargon, but precise about key concepts
-        
-        Return ONLY the JSON object, with no additional text.
-        """
+        if self.batcher is not None and self.batcher.accepts(prompt):
+            summary = self.batcher.submit(paper_content['title'], prompt).result()
+            if summary is not None:
+                self.save_to_cache(cache_key, summary)
+                return summary
+            # Not answered in a batch, re-issue on its own
         
         try:
             logger.info(f"Generating summary for {paper_content['title']} using {self.config.model_name}")
             
-            response = self.client.chat.completions.create(
-                model=self.config.model_name,
-                temperature=self.config.temperature,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            response_text = response.choices[0].message.content
+            response_text = self.complete(prompt, paper_content['title'])
             
-            json_str = response_text.strip()
+            summary = self.parse_response(response_text)
             
-            if "```json" in json_str:
-                json_str = json_str.split("```json")[1].split("```")[0].strip()
-            elif "```" in json_str:
-                json_str = json_str.split("```")[1].split("```")[0].strip()
-            
-            summary = json.loads(json_str)
-            
-            if cache_path:
-                self.save_to_cache(cache_path, summary)
-                
-            time.sleep(self.config.rate_limit_pause)
+            self.save_to_cache(cache_key, summary)
                 
             return summary
             
         except Exception as e:
-            #logger.error(f"Error generating summary: {str(e)}")
+            logger.error(f"Error generating summary for {paper_content['title']}: {str(e)}")
             # Return fallback summary
-            return {
-                "headline": paper_content['title'],
-                "tldr": "Error generating summary.",
-                "context": "Error generating summary.",
-                "methodology": "Error generating summary.",
-                "key_points": ["Error generating summary."],
-                "accessible_explanation": "Error generating summary.",
-                "significance": "Error generating summary.",
-                "questions_raised": ["Error generating summary."]
-            }
\ No newline at end of file
+            return self.fallback_summary(paper_content)
+    
+    def complete(self, prompt: Dict[str, Any], title: str) -> str:
+        """
+        Send a prompt from build_messages or build_batch and return the response text.
+        Streamed responses that go off-schema are cut off and retried up to llm_stream_retries times.
+        """
+        aborts = 0
+        while True:
+            options = self.request_options(prompt)
+            start = time.perf_counter()
+            try:
+                response_text, usage, first_token = self._request(prompt, options, start)
+            except StreamAbort as e:
+                self.metrics.inc("llm_stream_aborts_total", model=self.config.model_name, reason=e.reason)
+                aborts += 1
+                if aborts > self.config.llm_stream_retries:
+                    raise
+                logger.warning(f"Aborted streamed response for {title} ({str(e)}), retrying")
+                continue
+            except Exception as e:
+                if self.response_format_rejected(e, options):
+                    continue
+                raise
+            
+            self.record_response(usage, time.perf_counter() - start, title, prompt["tokens"], first_token)
+            time.sleep(self.config.rate_limit_pause)
+            return response_text
+    
+    def _request(self, prompt: Dict[str, Any], options: Dict[str, Any], start: float) -> Tuple[str, Any, Optional[float]]:
+        """
+        Response text, usage and seconds to the first token (None unless streaming).
+        """
+        response = self.client.chat.completions.create(**options)
+        if not options.get("stream"):
+            return response.choices[0].message.content, getattr(response, "usage", None), None
+        
+        reader = self.stream_reader(prompt, start)
+        try:
+            for chunk in response:
+                if reader.feed(chunk):
+                    break
+        finally:
+            # Closing early stops the provider generating the rest
+            response.close()
+        return reader.finish(), reader.usage_or_estimate(), reader.first_token
+    
+    def close(self) -> None:
+        """
+        Send any papers still waiting for a batch.
+        """
+        if self.batcher is not None:
+            self.batcher.close()
+
+def create_summarizer(config: Config, metrics: Optional[Metrics] = None) -> Summarizer:
+    """
+    Build the summarizer backend selected by config.llm_backend.
+    """
+    if config.llm_backend == "async":
+        from modules.async_summarizer import AsyncSummarizer
+        return AsyncSummarizer(config, metrics=metrics)
+    return Summarizer(config, metrics=metrics)
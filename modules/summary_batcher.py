@@ -0,0 +1,195 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from modules.logger import setup_logger
+from modules.metrics import DEPTH_BUCKETS
+from modules.prompt_builder import SUMMARY_KEYS
+
+logger = setup_logger("summary_batcher")
+
+# "### Paper <id>" line and the blank line between papers
+_PAPER_OVERHEAD_TOKENS = 8
+
+
+class _SummaryRequest:
+    __slots__ = ("title", "prompt", "future")
+
+    def __init__(self, title: str, prompt: Dict[str, Any]):
+        self.title = title
+        self.prompt = prompt
+        self.future: Future = Future()
+
+
+class SummaryBatcher:
+    """
+    Group short papers from concurrent callers into one chat completion.
+
+    Requests are collected for up to max_wait seconds. A batch closes when the
+    next paper would push the request over token_budget input tokens, or when
+    it holds max_papers papers. It also closes when the expected output
+    (expected_completion_tokens per paper) would pass max_output_tokens. The
+    model answers with a JSON array keyed by paper id. Each entry is validated
+    on its own. A paper whose entry is missing or malformed resolves to None,
+    and the caller then summarizes it with a request of its own.
+
+    Batches can only be as large as the number of papers waiting at once, so
+    this pays off with several LLM workers.
+    """
+
+    def __init__(self, summarizer, max_papers: int = 8, token_budget: int = 6000, max_paper_tokens: int = 1200,
+                 max_output_tokens: int = 4096, expected_completion_tokens: int = 1024, max_wait: float = 0.5):
+        self.summarizer = summarizer
+        self.token_budget = int(token_budget)
+        self.max_paper_tokens = int(max_paper_tokens)
+        self.max_wait = max(0.0, float(max_wait))
+        # The answer for every paper in the batch has to fit in one completion
+        self.max_papers = max(1, min(int(max_papers), int(max_output_tokens) // max(1, int(expected_completion_tokens))))
+
+        self._queue: "queue.Queue[Optional[_SummaryRequest]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def accepts(self, prompt: Dict[str, Any]) -> bool:
+        """
+        Whether a paper's prompt is short enough to share a request.
+        """
+        return prompt["tokens"]["user"] <= self.max_paper_tokens
+
+    def start(self) -> None:
+        with self._lock:
+            if not self._closed:
+                self._start_worker()
+
+    def _start_worker(self) -> None:
+        # Callers hold self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="summary-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, title: str, prompt: Dict[str, Any]) -> Future:
+        """
+        Queue a paper's prompt, the future resolves to its summary or None if the batch did not produce one.
+        """
+        request = _SummaryRequest(title, prompt)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SummaryBatcher is closed")
+            # Under the same lock as the put, a close() finishing in between would leave it without a worker
+            self._start_worker()
+            self._queue.put(request)
+        return request.future
+
+    def close(self) -> None:
+        """
+        Stop the worker once the queued papers are sent. A later submit starts a new one.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+
+        if thread is not None:
+            thread.join()
+
+        with self._lock:
+            self._thread = None
+            self._closed = False
+
+    def _fits(self, pending: List[_SummaryRequest], tokens: int, request: _SummaryRequest) -> bool:
+        if len(pending) >= self.max_papers:
+            return False
+        return tokens + request.prompt["tokens"]["user"] + _PAPER_OVERHEAD_TOKENS <= self.token_budget
+
+    def _run(self) -> None:
+        system_tokens = self.summarizer.prompt_builder.batch_system_tokens
+        carry: Optional[_SummaryRequest] = None
+        stopping = False
+
+        while not stopping or carry is not None:
+            request = carry if carry is not None else self._queue.get()
+            carry = None
+            if request is None:
+                break
+
+            pending = [request]
+            tokens = system_tokens + request.prompt["tokens"]["user"] + _PAPER_OVERHEAD_TOKENS
+            deadline = time.monotonic() + self.max_wait
+
+            while not stopping and len(pending) < self.max_papers:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        request = self._queue.get(timeout=remaining)
+                    else:
+                        request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if request is None:
+                    stopping = True
+                    break
+                if not self._fits(pending, tokens, request):
+                    # Starts the next batch
+                    carry = request
+                    break
+
+                pending.append(request)
+                tokens += request.prompt["tokens"]["user"] + _PAPER_OVERHEAD_TOKENS
+
+            self._send(pending)
+
+    def _send(self, pending: List[_SummaryRequest]) -> None:
+        if len(pending) == 1:
+            # Nothing to share the request with, the caller sends it as a normal prompt
+            pending[0].future.set_result(None)
+            return
+
+        summarizer = self.summarizer
+        ids = [str(i + 1) for i in range(len(pending))]
+        prompt = summarizer.prompt_builder.build_batch(list(zip(ids, (request.prompt for request in pending))))
+        summarizer.metrics.observe("llm_batch_papers", len(pending), buckets=DEPTH_BUCKETS)
+
+        try:
+            response_text = summarizer.complete(prompt, f"a batch of {len(pending)} papers")
+            entries = self.parse_entries(summarizer, response_text)
+        except Exception as e:
+            logger.error(f"Batched request for {len(pending)} papers failed: {str(e)}")
+            entries = {}
+
+        missing = 0
+        for paper_id, request in zip(ids, pending):
+            summary = entries.get(paper_id)
+            if summary is None:
+                missing += 1
+            request.future.set_result(summary)
+
+        if missing:
+            logger.warning(f"{missing} of {len(pending)} batched summaries missing or malformed, re-issuing singly")
+            summarizer.metrics.inc("llm_batch_reissued_total", missing)
+
+    @staticmethod
+    def parse_entries(summarizer, response_text: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Valid summaries from a batched response, by paper id. Entries that are not
+        objects, have no id, or lack any summary key are left out.
+        """
+        parsed = summarizer.parse_response(response_text)
+        if isinstance(parsed, dict):
+            # Some models wrap the array in an object
+            parsed = next((value for value in parsed.values() if isinstance(value, list)), [])
+
+        entries = {}
+        for entry in parsed if isinstance(parsed, list) else []:
+            if not isinstance(entry, dict) or "paper_id" not in entry:
+                continue
+            summary = {key: value for key, value in entry.items() if key != "paper_id"}
+            if all(summary.get(key) for key in SUMMARY_KEYS):
+                entries[str(entry["paper_id"]).strip()] = summary
+        return entries
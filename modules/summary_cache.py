@@ -0,0 +1,146 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from modules.codec import JsonCodec
+from modules.logger import setup_logger
+
+logger = setup_logger("summary_cache")
+
+
+class SummaryCache:
+    """
+    Summary store backed by a single SQLite database in WAL mode.
+
+    Entries are keyed by a hash of the prompt inputs (abstract, representative
+    chunks, model, temperature and prompt version), so a changed model or prompt
+    never returns a stale summary. Oldest-accessed entries are evicted once the
+    store grows past max_entries.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 50000, max_age_days: float = 0,
+                 codec: Optional[JsonCodec] = None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.codec = codec or JsonCodec()
+        self.path = os.path.join(cache_dir, "summaries.sqlite3")
+        self.max_entries = int(max_entries)
+        self.max_age = float(max_age_days) * 86400
+
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._puts_since_evict = 0
+
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, model TEXT, summary TEXT NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS summaries_last_access ON summaries(last_access)")
+        self.evict()
+
+    @staticmethod
+    def make_key(abstract: str, chunks: List[str], model: str, temperature: float, prompt_version: str) -> str:
+        digest = hashlib.sha256()
+        for part in (prompt_version, model, repr(float(temperature)), abstract or ""):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        for chunk in chunks:
+            digest.update(chunk.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            try:
+                row = self.db.execute("SELECT summary, created FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if self.max_age > 0 and row[1] < time.time() - self.max_age:
+                    return None
+                with self.db:
+                    self.db.execute("UPDATE summaries SET last_access = ? WHERE key = ?", (time.time(), key))
+                return self.codec.loads(row[0])
+            except Exception as e:
+                logger.warning(f"Failed to load summary {key} from cache: {e}")
+                return None
+
+    def put(self, key: str, summary: Dict[str, Any], model: str = "") -> bool:
+        with self._lock:
+            try:
+                now = time.time()
+                with self.db:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO summaries (key, model, summary, created, last_access) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, model, self.codec.dumps(summary, compact=True), now, now)
+                    )
+                self._puts_since_evict += 1
+            except Exception as e:
+                logger.warning(f"Failed to save summary {key} to cache: {e}")
+                return False
+
+        # Trimming is a full index scan, so only do it every so often
+        if self._puts_since_evict >= 100:
+            self.evict()
+        return True
+
+    def evict(self) -> int:
+        """
+        Drop expired entries and trim the store to max_entries, returns the number removed.
+        """
+        removed = 0
+        with self._lock:
+            self._puts_since_evict = 0
+            with self.db:
+                if self.max_age > 0:
+                    removed += self.db.execute(
+                        "DELETE FROM summaries WHERE created < ?", (time.time() - self.max_age,)
+                    ).rowcount
+                if self.max_entries > 0:
+                    (count,) = self.db.execute("SELECT COUNT(*) FROM summaries").fetchone()
+                    if count > self.max_entries:
+                        removed += self.db.execute(
+                            "DELETE FROM summaries WHERE key IN ("
+                            "SELECT key FROM summaries ORDER BY last_access LIMIT ?)",
+                            (count - self.max_entries,)
+                        ).rowcount
+
+        if removed:
+            logger.info(f"Evicted {removed} summaries from cache")
+        return removed
+
+    def single_flight(self, key: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run compute once per key, concurrent callers for the same key wait for that result.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = compute()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
@@ -1,21 +1,63 @@
 import re
-from typing import Dict, List, Any
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import Dict, Iterator, List, Any, Tuple
 
+from modules.chunker import OffsetChunker
 from modules.logger import setup_logger
 
 logger = setup_logger("text_processor")
 
+# Everything but alphanumerics and the kept punctuation counts as noise (whitespace included).
+# A run of noise becomes one space; lone spaces between words never match, so clean text
+# passes through without a substitution per word.
+NOISE_PATTERN = re.compile(r' [^\w.,!?()-:;"\'%]+|[^\w .,!?()-:;"\'%][^\w.,!?()-:;"\'%]*')
+KEPT_PATTERN = re.compile(r'[\w.,!?()-:;"\'%]')
+
+
+def strip_escapes(text: str) -> str:
+    """
+    Replace literal \\n, \\r and \\t escape sequences with spaces.
+    """
+    if "\\" in text:
+        text = text.replace("\\n", " ").replace("\\r", " ").replace("\\t", " ")
+    return text
+
+
+def load_langchain_splitter():
+    """
+    Import langchain's RecursiveCharacterTextSplitter from wherever the installed version keeps it.
+    """
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter
+
 class TextProcessor:
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 splitter: str = "native", length_unit: str = "chars"):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
+        self.splitter = splitter
+        
+        if splitter == "langchain":
+            RecursiveCharacterTextSplitter = load_langchain_splitter()
+            if length_unit == "tokens":
+                self.text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap
+                )
+            else:
+                self.text_splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap
+                )
+        else:
+            self.text_splitter = OffsetChunker(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_unit=length_unit
+            )
     
     def clean_text(self, text: str) -> str:
         """
@@ -24,16 +66,33 @@ class TextProcessor:
         if not text or not isinstance(text, str):
             return ""
         
-        # remove escape sequences
-        text = text.replace("\\n", " ").replace("\\r", " ").replace("\\t", " ")
-        
-        # alphanumeric, spaces, punctuation
-        cleaned = re.sub(r'[^\w\s.,!?()-:;"\'%]', ' ', text)
-        
-        # extra whitespace
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+        return NOISE_PATTERN.sub(" ", strip_escapes(text)).strip()
+    
+    def _body_parts(self, data: Dict[str, Any]) -> Iterator[Any]:
+        """
+        Raw content and section texts of a paper, in the order they go into full_text.
+        """
+        if 'content' in data and isinstance(data['content'], str):
+            yield data['content']
+            
+        if 'sections' in data and isinstance(data['sections'], list):
+            for section in data['sections']:
+                if isinstance(section, dict) and 'text' in section:
+                    yield section['text']
+                elif isinstance(section, str):
+                    yield section
+    
+    def _clean_join(self, parts: List[Any]) -> str:
+        """
+        Same result as joining the cleaned parts with spaces.
+        """
+        texts = [strip_escapes(part) if part and isinstance(part, str) else "" for part in parts]
         
-        return cleaned
+        # Cleaning the joined text in one pass matches unless a part cleans to nothing,
+        # which leaves a double space in the per-part join
+        if all(KEPT_PATTERN.search(text) for text in texts):
+            return NOISE_PATTERN.sub(" ", " ".join(texts)).strip()
+        return " ".join(NOISE_PATTERN.sub(" ", text).strip() for text in texts)
     
     def extract_paper_content(self, paper: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -52,23 +111,14 @@ class TextProcessor:
         else:
             extracted['abstract'] = ""
 
-        full_text_parts = []
-        
-        if extracted['abstract']:
-            full_text_parts.append(extracted['abstract'])
+        body_parts = list(self._body_parts(paper['data'])) if 'data' in paper else []
         
-        if 'data' in paper:
-            if 'content' in paper['data'] and isinstance(paper['data']['content'], str):
-                full_text_parts.append(self.clean_text(paper['data']['content']))
-                
-            if 'sections' in paper['data'] and isinstance(paper['data']['sections'], list):
-                for section in paper['data']['sections']:
-                    if isinstance(section, dict) and 'text' in section:
-                        full_text_parts.append(self.clean_text(section['text']))
-                    elif isinstance(section, str):
-                        full_text_parts.append(self.clean_text(section))
-        
-        extracted['full_text'] = " ".join(full_text_parts)
+        if not body_parts:
+            extracted['full_text'] = extracted['abstract']
+        elif extracted['abstract']:
+            extracted['full_text'] = extracted['abstract'] + " " + self._clean_join(body_parts)
+        else:
+            extracted['full_text'] = self._clean_join(body_parts)
         
         if extracted['full_text'] == extracted['abstract']:
             logger.warning(f"Only abstract found for paper: {extracted['title']}")
@@ -95,6 +145,31 @@ class TextProcessor:
         
         return extracted
     
+    def extract_batch(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Extract content from a batch of papers.
+        """
+        return [self.extract_paper_content(paper) for paper in papers]
+    
+    def chunk_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Split paper text into (start, end) offsets of its chunks.
+        """
+        if not text or len(text.strip()) < 100:  # Arbitrary minimum length
+            return [(0, len(text))] if text else []
+        
+        if self.splitter == "langchain":
+            # langchain only returns strings, locate them in the text (chunks are in order)
+            offsets = []
+            position = 0
+            for chunk in self.text_splitter.split_text(text):
+                start = text.find(chunk, position)
+                offsets.append((start, start + len(chunk)))
+                position = start + 1
+            return offsets
+        
+        return self.text_splitter.split_offsets(text)
+    
     def chunk_paper(self, text: str) -> List[str]:
         """
         Split paper text into chunks for embedding and similarity search
@@ -103,9 +178,16 @@ class TextProcessor:
             return [text] if text else []
         
         # Split into chunks
-        chunks = self.text_splitter.split_text(text)
+        chunks = [text[start:end] for start, end in self.chunk_offsets(text)]
         
         # Log chunking statistics
         logger.info(f"Split text into {len(chunks)} chunks")
         
-        return chunks
\ No newline at end of file
+        return chunks
+
+
+def extract_papers(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Module-level batch extraction so a process pool can pickle it, e.g. executor.map(extract_papers, batches).
+    """
+    return TextProcessor().extract_batch(papers)
@@ -0,0 +1,415 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from modules.logger import setup_logger
+
+logger = setup_logger("vector_index")
+
+INDEX_TYPES = ("ivfpq", "hnsw", "flat")
+_BLOCK_ROWS = 65536
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """
+    Corpus-wide nearest-neighbour index over chunk embeddings, kept on disk.
+
+    Embeddings are L2-normalized and appended as float16 rows to vectors.f16,
+    the row number being the chunk id, and chunks.sqlite3 maps each id to its
+    paper, position and text. The FAISS index (IVF-PQ by default, or HNSW/flat)
+    is written to index.faiss and opened memory-mapped for searching, it is
+    only read into memory once papers are added. IVF-PQ needs training data,
+    so until train_size vectors exist, and while it trains on a background
+    thread after that, searches scan the vectors file block by block instead.
+    Chunks of re-processed papers stay in the files as dead rows
+    until rebuild() compacts them.
+    """
+
+    def __init__(self, index_dir: str, model_name: str, dim: int, index_type: str = "ivfpq",
+                 nlist: int = 1024, pq_m: int = 48, hnsw_m: int = 32, nprobe: int = 16,
+                 train_size: int = 50000, save_every: int = 1000):
+        import faiss
+
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type: {index_type}")
+
+        self.faiss = faiss
+        self.model_name = model_name
+        self.dim = int(dim)
+        self.index_type = index_type
+        self.nlist = int(nlist)
+        self.pq_m = int(pq_m)
+        self.hnsw_m = int(hnsw_m)
+        self.nprobe = int(nprobe)
+        self.train_size = max(256, int(train_size))
+        self.save_every = int(save_every)
+
+        # One store per model, like the embedding cache
+        model_key = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16]
+        self.store_dir = os.path.join(index_dir, model_key)
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.store_dir, "vectors.f16")
+        self.index_path = os.path.join(self.store_dir, "index.faiss")
+
+        self._lock = threading.Lock()
+        self._row_bytes = self.dim * 2
+        self._matrix_cache: Optional[np.memmap] = None
+        self._papers_since_save = 0
+        # IVF-PQ training runs off the lock, rebuild() bumps the generation to drop a stale result
+        self._trainer: Optional[threading.Thread] = None
+        self._generation = 0
+
+        self.db = sqlite3.connect(os.path.join(self.store_dir, "chunks.sqlite3"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, paper_id TEXT NOT NULL, chunk_no INTEGER NOT NULL, text TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_paper ON chunks(paper_id)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS papers (paper_id TEXT PRIMARY KEY, title TEXT, updated REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+        self.rows = self._open_vectors()
+
+        # The index is loaded lazily: memory-mapped for searches, into memory for adds
+        self.index = None
+        self._writable = False
+        self._dirty = False
+        self.indexed_upto = self._open_index_state()
+
+    def _meta(self, name: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: Any) -> None:
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def _open_vectors(self) -> int:
+        layout = f"{self.model_name}|{self.dim}|float16"
+        if self._meta("layout") not in (None, layout):
+            logger.info(f"Vector index layout changed, resetting {self.store_dir}")
+            with self.db:
+                self.db.execute("DELETE FROM chunks")
+                self.db.execute("DELETE FROM papers")
+                self.db.execute("DELETE FROM meta")
+            for path in (self.vectors_path, self.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        with self.db:
+            self._set_meta("layout", layout)
+
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, "wb").close()
+
+        # Drop a partially written trailing row left by a crash
+        size = os.path.getsize(self.vectors_path)
+        if size % self._row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(size - size % self._row_bytes)
+        return size // self._row_bytes
+
+    def _open_index_state(self) -> int:
+        if self._meta("index_type") != self.index_type or not os.path.exists(self.index_path):
+            # A different index type (or a missing file) is rebuilt from the vectors file
+            if os.path.exists(self.index_path):
+                logger.info(f"Vector index type changed to {self.index_type}, it will be rebuilt")
+                os.remove(self.index_path)
+            with self.db:
+                self._set_meta("index_type", self.index_type)
+                self._set_meta("indexed_upto", 0)
+            return 0
+        return min(int(self._meta("indexed_upto") or 0), self.rows)
+
+    def _matrix(self) -> Optional[np.memmap]:
+        if self.rows == 0:
+            return None
+        if self._matrix_cache is None or self._matrix_cache.shape[0] != self.rows:
+            self._matrix_cache = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(self.rows, self.dim))
+        return self._matrix_cache
+
+    def _load_index(self, writable: bool) -> None:
+        if self.index is not None and (self._writable or not writable):
+            return
+        if not os.path.exists(self.index_path):
+            return
+        if writable:
+            self.index = self.faiss.read_index(self.index_path)
+        else:
+            try:
+                self.index = self.faiss.read_index(self.index_path, self.faiss.IO_FLAG_MMAP)
+            except RuntimeError:
+                # Not every index type can be memory-mapped
+                self.index = self.faiss.read_index(self.index_path)
+        self._writable = writable
+        if hasattr(self.index, "nprobe"):
+            self.index.nprobe = self.nprobe
+
+    def _create_index(self, rows: int):
+        faiss = self.faiss
+        if self.index_type == "hnsw":
+            return faiss.IndexIDMap(faiss.IndexHNSWFlat(self.dim, self.hnsw_m))
+        if self.index_type == "flat":
+            return faiss.IndexIDMap(faiss.IndexFlatL2(self.dim))
+
+        sample = self._training_sample(rows)
+        # k-means wants ~39 points per list; PQ sub-vectors must divide the dimension
+        nlist = max(1, min(self.nlist, len(sample) // 39))
+        m = max(d for d in range(1, min(self.pq_m, self.dim) + 1) if self.dim % d == 0)
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(self.dim), self.dim, nlist, m, 8)
+        logger.info(f"Training IVF-PQ index ({nlist} lists, {m} sub-quantizers) on {len(sample)} vectors")
+        index.train(sample)
+        index.nprobe = self.nprobe
+        return index
+
+    def _vectors(self, rows: int) -> np.memmap:
+        # A map of its own, the background trainer must not share _matrix_cache with locked callers
+        return np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+
+    def _training_sample(self, rows: int) -> np.ndarray:
+        rng = np.random.RandomState(0)
+        count = min(self.train_size, rows)
+        ids = np.sort(rng.choice(rows, size=count, replace=False))
+        return np.asarray(self._vectors(rows)[ids], dtype=np.float32)
+
+    @staticmethod
+    def _add_rows(index, matrix: np.ndarray, start: int, end: int) -> None:
+        for block in range(start, end, _BLOCK_ROWS):
+            block_end = min(block + _BLOCK_ROWS, end)
+            index.add_with_ids(np.asarray(matrix[block:block_end], dtype=np.float32),
+                               np.arange(block, block_end, dtype=np.int64))
+
+    def _index_pending(self, background: bool = True) -> None:
+        """
+        Add vector rows not yet in the FAISS index, creating it when possible.
+
+        IVF-PQ is trained on a background thread unless background is off, as in rebuild().
+        """
+        if self.indexed_upto >= self.rows:
+            return
+
+        self._load_index(writable=True)
+        if self.index is None:
+            if self.index_type == "ivfpq":
+                if self.rows < self.train_size:
+                    return  # scanned directly until there is enough to train on
+                if background:
+                    if self._trainer is None:
+                        self._start_training()
+                    return
+            self.index = self._create_index(self.rows)
+            self._writable = True
+            self.indexed_upto = 0
+
+        self._add_rows(self.index, self._matrix(), self.indexed_upto, self.rows)
+        self.indexed_upto = self.rows
+        self._dirty = True
+
+    def _start_training(self) -> None:
+        self._trainer = threading.Thread(target=self._train, args=(self.rows, self._generation),
+                                         name="vector-index-train", daemon=True)
+        self._trainer.start()
+
+    def _train(self, rows: int, generation: int) -> None:
+        # Training and adding the rows it saw happen off the lock, the index is not in use yet
+        try:
+            index = self._create_index(rows)
+            self._add_rows(index, self._vectors(rows), 0, rows)
+        except Exception as e:
+            logger.error(f"Failed to train vector index: {e}")
+            index = None
+
+        with self._lock:
+            self._trainer = None
+            if index is None or generation != self._generation:
+                return
+            try:
+                self.index = index
+                self._writable = True
+                self.indexed_upto = rows
+                self._dirty = True
+                # Rows added while it trained
+                self._index_pending()
+            except Exception as e:
+                logger.error(f"Failed to index vectors after training: {e}")
+
+    def add_paper(self, paper_id: str, title: str, chunks: List[str], embeddings: np.ndarray) -> bool:
+        """
+        Index the chunks of a processed paper, replacing any chunks indexed for it before.
+        """
+        if not chunks or len(embeddings) != len(chunks):
+            return False
+
+        vectors = _normalize(embeddings).astype(np.float16)
+        with self._lock:
+            try:
+                first = self.rows
+                with open(self.vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                self.rows += len(vectors)
+
+                with self.db:
+                    self.db.execute("DELETE FROM chunks WHERE paper_id = ?", (paper_id,))
+                    self.db.executemany(
+                        "INSERT INTO chunks (id, paper_id, chunk_no, text) VALUES (?, ?, ?, ?)",
+                        [(first + i, paper_id, i, chunk) for i, chunk in enumerate(chunks)]
+                    )
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO papers (paper_id, title, updated) VALUES (?, ?, ?)",
+                        (paper_id, title, time.time())
+                    )
+
+                self._index_pending()
+                self._papers_since_save += 1
+                if self.save_every > 0 and self._papers_since_save >= self.save_every:
+                    self._save_locked()
+                return True
+            except Exception as e:
+                logger.error(f"Failed to add {paper_id} to vector index: {e}")
+                return False
+
+    def search(self, vector: np.ndarray, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find the k chunks nearest to an embedding, best first, with their paper and cosine score.
+        """
+        query = _normalize(np.asarray(vector).reshape(1, -1))
+        fetch = max(k * 4, k + 16)  # over-fetch since dead rows are dropped below
+
+        with self._lock:
+            candidates: List[Tuple[float, int]] = []
+
+            self._load_index(writable=False)
+            if self.index is not None and self.index.ntotal > 0:
+                distances, ids = self.index.search(query, fetch)
+                candidates.extend((float(d), int(i)) for d, i in zip(distances[0], ids[0]) if i >= 0)
+
+            # Rows the index does not cover yet are scanned exactly
+            matrix = self._matrix()
+            for start in range(self.indexed_upto, self.rows, _BLOCK_ROWS):
+                end = min(start + _BLOCK_ROWS, self.rows)
+                distances = 2.0 - 2.0 * (np.asarray(matrix[start:end], dtype=np.float32) @ query[0])
+                top = np.argsort(distances, kind="stable")[:fetch]
+                candidates.extend((float(distances[i]), start + int(i)) for i in top)
+
+            candidates.sort()
+            ids = [chunk_id for _, chunk_id in candidates]
+            rows = {}
+            for offset in range(0, len(ids), 500):
+                batch = ids[offset:offset + 500]
+                rows.update((row[0], row[1:]) for row in self.db.execute(
+                    "SELECT c.id, c.paper_id, c.chunk_no, c.text, p.title FROM chunks c "
+                    f"LEFT JOIN papers p ON p.paper_id = c.paper_id WHERE c.id IN ({','.join('?' * len(batch))})",
+                    batch
+                ))
+
+        results = []
+        seen = set()
+        for distance, chunk_id in candidates:
+            if chunk_id not in rows or chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            paper_id, chunk_no, text, title = rows[chunk_id]
+            results.append({
+                "paper_id": paper_id,
+                "title": title,
+                "chunk_no": chunk_no,
+                "score": round(1.0 - distance / 2.0, 4),
+                "text": text
+            })
+            if len(results) >= k:
+                break
+        return results
+
+    def _save_locked(self) -> None:
+        self._papers_since_save = 0
+        if self.index is None or not self._dirty:
+            return
+
+        temp_path = f"{self.index_path}.tmp"
+        self.faiss.write_index(self.index, temp_path)
+        os.replace(temp_path, self.index_path)
+        with self.db:
+            self._set_meta("indexed_upto", self.indexed_upto)
+        self._dirty = False
+
+    def save(self) -> None:
+        with self._lock:
+            try:
+                self._save_locked()
+            except Exception as e:
+                logger.error(f"Failed to save vector index: {e}")
+
+    def rebuild(self, compact: bool = True) -> Dict[str, int]:
+        """
+        Recreate the FAISS index from the vectors file, first dropping dead rows if compact is set.
+        """
+        with self._lock:
+            # A background training still running trained on the old rows
+            self._generation += 1
+            removed = 0
+            if compact:
+                removed = self._compact_locked()
+
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            self.index = None
+            self._writable = False
+            self.indexed_upto = 0
+            with self.db:
+                self._set_meta("indexed_upto", 0)
+
+            self._index_pending(background=False)
+            self._save_locked()
+            logger.info(f"Rebuilt vector index: {self.rows} chunks, {removed} dead rows removed")
+            return {"chunks": self.rows, "removed": removed}
+
+    def _compact_locked(self) -> int:
+        live = [chunk_id for (chunk_id,) in self.db.execute("SELECT id FROM chunks ORDER BY id")]
+        removed = self.rows - len(live)
+        if removed == 0:
+            return 0
+
+        matrix = self._matrix()
+        temp_path = f"{self.vectors_path}.tmp"
+        with open(temp_path, "wb") as f:
+            for offset in range(0, len(live), _BLOCK_ROWS):
+                f.write(np.asarray(matrix[live[offset:offset + _BLOCK_ROWS]], dtype=np.float16).tobytes())
+
+        # New ids never exceed old ones, so renumbering in ascending order cannot collide
+        with self.db:
+            self.db.executemany(
+                "UPDATE chunks SET id = ? WHERE id = ?",
+                [(new_id, old_id) for new_id, old_id in enumerate(live) if new_id != old_id]
+            )
+            self.db.execute("DELETE FROM papers WHERE paper_id NOT IN (SELECT DISTINCT paper_id FROM chunks)")
+
+        self._matrix_cache = None
+        os.replace(temp_path, self.vectors_path)
+        self.rows = len(live)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            chunks = self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            papers = self.db.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+        return {"papers": papers, "chunks": chunks, "dead_rows": self.rows - chunks, "indexed": self.indexed_upto}
+
+    def close(self) -> None:
+        # Let a running training finish, so the next run does not start over
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join()
+        self.save()
+        with self._lock:
+            self.db.close()
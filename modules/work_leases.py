@@ -0,0 +1,257 @@
+import os
+import json
+import uuid
+import socket
+import hashlib
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from modules.logger import setup_logger
+
+logger = setup_logger("work_leases")
+
+
+def default_node_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkLeases:
+    """
+    Lease files that let several nodes sharing a filesystem split one corpus.
+
+    A node claims a work unit (an input file or shard) by creating
+    <lease_dir>/<unit hash>.lease with O_EXCL. While it works, a heartbeat
+    thread touches the file's mtime every heartbeat_interval seconds. A lease
+    whose mtime is older than ttl belongs to a dead node. Another node reclaims
+    it by renaming it away, which only one node can do. If the owner renewed the
+    lease in the meantime, it is linked back.
+
+    A unit's lease is released once all of its items have finished. With
+    mark_done, a .done marker is then left so no node claims the unit again.
+    Once its own pass is over, a node waits for units leased by other nodes and
+    takes over any whose lease expires. It tries each unit at most once.
+    Lease age is measured against the mtime of a freshly created file, so the
+    filesystem's clock is used rather than each node's own.
+    """
+
+    def __init__(self, lease_dir: str, node_id: Optional[str] = None, ttl: float = 120.0,
+                 heartbeat_interval: float = 30.0, poll_interval: float = 10.0):
+        os.makedirs(lease_dir, exist_ok=True)
+        self.lease_dir = lease_dir
+        self.node_id = node_id or default_node_id()
+        self.ttl = float(ttl)
+        self.heartbeat_interval = max(0.1, min(float(heartbeat_interval), self.ttl / 3))
+        self.poll_interval = max(0.1, float(poll_interval))
+
+        self.held: Dict[str, str] = {}
+        self.reclaimed = 0
+        self.lost = 0
+        self._attempted: Set[str] = set()
+        self._unit_of: Dict[str, str] = {}
+        self._pending: Dict[str, int] = {}
+        self._failed: Set[str] = set()
+        self._exhausted: Set[str] = set()
+        self._mark_done: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+        self._heartbeat.start()
+        logger.info(f"Node {self.node_id} using leases in {lease_dir} (ttl {self.ttl:g}s)")
+
+    def _path(self, unit: str, suffix: str = ".lease") -> str:
+        return os.path.join(self.lease_dir, hashlib.sha1(unit.encode("utf-8")).hexdigest()[:24] + suffix)
+
+    def is_done(self, unit: str) -> bool:
+        return os.path.exists(self._path(unit, ".done"))
+
+    def claim(self, unit: str) -> bool:
+        """
+        Take the lease on unit, reclaiming it if it expired. False if another node holds it.
+        """
+        path = self._path(unit)
+        token = uuid.uuid4().hex
+        payload = json.dumps({"unit": unit, "node": self.node_id, "token": token}).encode("utf-8")
+
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._reclaim(path, unit):
+                    return False
+                continue
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            with self._lock:
+                self.held[unit] = token
+            return True
+        return False
+
+    def _reclaim(self, path: str, unit: str) -> bool:
+        try:
+            if self._age(path) < self.ttl:
+                return False
+        except FileNotFoundError:
+            # Released since, try to create it again
+            return True
+
+        stale = f"{path}.{self.node_id}.stale"
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return True
+
+        try:
+            if self._age(stale) < self.ttl:
+                # The owner renewed it after we looked, put it back unless someone already took the unit
+                try:
+                    os.link(stale, path)
+                except FileExistsError:
+                    pass
+                return False
+            logger.warning(f"Reclaiming expired lease on {unit}")
+            with self._lock:
+                self.reclaimed += 1
+            return True
+        finally:
+            os.unlink(stale)
+
+    @staticmethod
+    def _age(path: str) -> float:
+        return max(0.0, _now(os.path.dirname(path)) - os.stat(path).st_mtime)
+
+    def release(self, unit: str, done: bool = False) -> None:
+        """
+        Give up the lease, leaving a .done marker first if the unit is finished for good.
+        """
+        with self._lock:
+            token = self.held.pop(unit, None)
+        if token is None:
+            return
+
+        if done:
+            with open(self._path(unit, ".done"), "w") as f:
+                f.write(self.node_id)
+        path = self._path(unit)
+        if self._owns(path, token):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _owns(path: str, token: str) -> bool:
+        try:
+            with open(path, "rb") as f:
+                return json.loads(f.read() or b"{}").get("token") == token
+        except (OSError, ValueError):
+            return False
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._lock:
+                held = list(self.held.items())
+            for unit, token in held:
+                path = self._path(unit)
+                if self._owns(path, token):
+                    try:
+                        os.utime(path)
+                        continue
+                    except OSError:
+                        pass
+                with self._lock:
+                    # Released while we looked is not a loss
+                    if self.held.get(unit) != token:
+                        continue
+                    del self.held[unit]
+                    self.lost += 1
+                logger.warning(f"Lost the lease on {unit} to another node")
+
+    def iter_work(self, units: List[str], expand: Callable[[str], Iterable[Tuple[str, Optional[bytes]]]],
+                  mark_done: bool = False,
+                  on_wait: Optional[Callable[[], None]] = None) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """
+        Claim units one at a time and yield their (item id, record) pairs from expand.
+
+        Report each item's outcome with item_finished. The unit is released once
+        every item has finished. Nodes start at different offsets in units to
+        avoid contending for the same ones. on_wait runs before every wait for
+        other nodes, to finish items that are only reported on a flush.
+        """
+        offset = int(hashlib.sha1(self.node_id.encode("utf-8")).hexdigest(), 16) % max(1, len(units))
+        remaining = units[offset:] + units[:offset]
+
+        while remaining and not self._stop.is_set():
+            waiting = []
+            for unit in remaining:
+                if unit in self._attempted or self.is_done(unit):
+                    continue
+                if not self.claim(unit):
+                    waiting.append(unit)
+                    continue
+
+                self._attempted.add(unit)
+                with self._lock:
+                    self._pending[unit] = 0
+                    self._mark_done[unit] = mark_done
+                for item_id, record in expand(unit):
+                    with self._lock:
+                        self._unit_of[item_id] = unit
+                        self._pending[unit] += 1
+                    yield item_id, record
+                with self._lock:
+                    self._exhausted.add(unit)
+                self._maybe_release(unit)
+
+            remaining = waiting
+            if remaining:
+                # Otherwise two nodes waiting on each other's unflushed units never release them
+                if on_wait is not None:
+                    on_wait()
+                logger.info(f"Waiting on {len(remaining)} units leased by other nodes")
+                self._stop.wait(self.poll_interval)
+
+    def item_finished(self, item_id: str, ok: bool) -> None:
+        with self._lock:
+            unit = self._unit_of.pop(item_id, None)
+            if unit is None:
+                return
+            self._pending[unit] -= 1
+            if not ok:
+                self._failed.add(unit)
+        self._maybe_release(unit)
+
+    def _maybe_release(self, unit: str) -> None:
+        with self._lock:
+            if unit not in self._exhausted or self._pending.get(unit):
+                return
+            self._exhausted.discard(unit)
+            self._pending.pop(unit, None)
+            failed = unit in self._failed
+            self._failed.discard(unit)
+            mark_done = self._mark_done.pop(unit, False)
+        self.release(unit, done=mark_done)
+        if failed:
+            logger.info(f"Released {unit} with failed items")
+
+    def close(self) -> None:
+        """
+        Stop the heartbeat and release every lease still held.
+        """
+        self._stop.set()
+        self._heartbeat.join()
+        with self._lock:
+            units = list(self.held)
+        for unit in units:
+            self.release(unit)
+
+
+def _now(directory: str) -> float:
+    # mtime of a file touched just now, the filesystem's idea of the current time
+    probe = os.path.join(directory, f".clock.{default_node_id()}.{threading.get_ident()}")
+    with open(probe, "w"):
+        pass
+    try:
+        return os.stat(probe).st_mtime
+    finally:
+        os.unlink(probe)